@@ -1,22 +1,39 @@
-import sqlite3
-from typing import TYPE_CHECKING, Generic
+from functools import cached_property, partial
+from typing import TYPE_CHECKING, Any, Generic
 
 from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware
 from langchain.agents.middleware.types import ResponseT
 from langchain.chat_models import init_chat_model
-from langgraph.checkpoint.sqlite import SqliteSaver
+from langchain.messages import SystemMessage
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.constants import TAG_NOSTREAM
 from langgraph.typing import ContextT
 
+from .cache import get_response_cache
+from .cascade import default_gate
+from .checkpoints import get_checkpointer
 from .config import get_settings
-from .middleware import LoggingMiddleware
+from .constants import LLMModel
+from .fake_llm import fake_chat_model
+from .http_clients import api_key_fingerprint, get_http_clients
+from .metrics import get_metrics
+from .middleware import (
+    CascadeMiddleware,
+    ContextBudgetMiddleware,
+    LoggingMiddleware,
+    MetricsMiddleware,
+    ResponseCacheMiddleware,
+    SchedulerMiddleware,
+)
+from .scheduler import get_scheduler
 from .state import AgentSessionState
 
 if TYPE_CHECKING:
     from langchain.agents.middleware.types import _InputAgentState, _OutputAgentState
     from langgraph.graph.state import CompiledStateGraph
 
-    from .constants import LLMModel
-
 
 class AgentSession(Generic[ResponseT, ContextT]):
     agent: "CompiledStateGraph[AgentSessionState[ResponseT], ContextT, _InputAgentState, _OutputAgentState[ResponseT]]"
@@ -29,12 +46,92 @@ class AgentSession(Generic[ResponseT, ContextT]):
         model: "LLMModel",
         temperature: float = 0.7,
         max_tokens: int | None = None,
+        fast_model: "LLMModel | None" = None,
     ) -> None:
-        llm = init_chat_model(model=model, temperature=temperature, max_tokens=max_tokens, api_key=api_key)
-        self.agent = create_agent(  # type: ignore[assignment]
-            llm,
-            system_prompt=system_prompt,
-            middleware=[LoggingMiddleware()],
-            state_schema=AgentSessionState,
-            checkpointer=SqliteSaver(sqlite3.connect(self.settings.CHECKPOINT_STORAGE_PATH, check_same_thread=False)),
+        self.model = LLMModel(model).value
+        self.fast_model = LLMModel(fast_model).value if fast_model is not None else None
+        llm = self._chat_model(self.model, temperature, max_tokens, api_key)
+        middleware: list[AgentMiddleware[Any, Any]] = [LoggingMiddleware()]
+        if self.settings.CONTEXT_MAX_TOKENS is not None:
+            middleware.append(
+                ContextBudgetMiddleware(
+                    max_tokens=self.settings.CONTEXT_MAX_TOKENS,
+                    keep_turns=self.settings.CONTEXT_KEEP_TURNS,
+                    summary_max_tokens=self.settings.CONTEXT_SUMMARY_MAX_TOKENS,
+                    reserved_tokens=count_tokens_approximately([SystemMessage(system_prompt)]),
+                )
+            )
+        if self.fast_model is not None:
+            middleware.append(
+                CascadeMiddleware(
+                    # Tagged nostream: only the reply that is kept reaches a streaming caller
+                    self._chat_model(self.fast_model, temperature, max_tokens, api_key, tags=[TAG_NOSTREAM]),
+                    model=self.model,
+                    gate=default_gate(self.settings.CASCADE_MIN_CHARS),
+                    registry=get_metrics() if self.settings.METRICS_ENABLED else None,
+                )
+            )
+        if self.settings.METRICS_ENABLED:
+            middleware.append(MetricsMiddleware(get_metrics(), model=self.model))
+        if self.settings.RESPONSE_CACHE_ENABLED:
+            middleware.append(
+                ResponseCacheMiddleware(
+                    get_response_cache(),
+                    model=self.model,
+                    temperature=temperature,
+                    allow_nonzero_temperature=self.settings.RESPONSE_CACHE_ALLOW_NONZERO_TEMPERATURE,
+                )
+            )
+        if self.settings.SCHEDULER_ENABLED:
+            middleware.append(
+                SchedulerMiddleware(
+                    {
+                        name: get_scheduler().limiter(name, api_key_fingerprint(api_key))
+                        for name in (self.model, self.fast_model)
+                        if name is not None
+                    },
+                    model=self.model,
+                    max_retries=self.settings.SCHEDULER_MAX_RETRIES,
+                    backoff_seconds=self.settings.SCHEDULER_BACKOFF_SECONDS,
+                    max_backoff_seconds=self.settings.SCHEDULER_MAX_BACKOFF_SECONDS,
+                    registry=get_metrics() if self.settings.METRICS_ENABLED else None,
+                )
+            )
+        self._build = partial(
+            create_agent, llm, system_prompt=system_prompt, middleware=middleware, state_schema=AgentSessionState
+        )
+        self.agent = self._build(  # type: ignore[assignment]
+            checkpointer=get_checkpointer(self.settings.CHECKPOINT_STORAGE_PATH)
+        )
+
+    def _chat_model(
+        self, model: str, temperature: float, max_tokens: int | None, api_key: str, tags: list[str] | None = None
+    ) -> BaseChatModel:
+        if self.settings.LLM_BACKEND == "fake":
+            llm = fake_chat_model(model)
+            llm.tags = tags
+            return llm
+        clients: dict[str, Any] = {}
+        if self.settings.HTTP_SHARED_CLIENTS:
+            http_client, http_async_client = get_http_clients().acquire(
+                self, "openai", self.settings.OPENAI_BASE_URL, api_key
+            )
+            clients = {"http_client": http_client, "http_async_client": http_async_client}
+        return init_chat_model(
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            api_key=api_key,
+            base_url=self.settings.OPENAI_BASE_URL,
+            # The scheduler owns retries, the client's own would retry behind its back
+            max_retries=0 if self.settings.SCHEDULER_ENABLED else None,
+            tags=tags,
+            **clients,
         )
+
+    @cached_property
+    def staging_agent(
+        self,
+    ) -> "CompiledStateGraph[AgentSessionState[ResponseT], ContextT, _InputAgentState, _OutputAgentState[ResponseT]]":
+        # The same graph without a checkpointer, for speculative runs that are only written to the thread on demand
+        return self._build()  # type: ignore[return-value]
@@ -0,0 +1,284 @@
+import argparse
+import json
+from typing import Any, AsyncIterator
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.exceptions import HTTPException
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from .config import get_settings
+from .constants import Agent, LLMModel
+from .exceptions import ManualOrchestratorException, SessionConflictException
+from .http_clients import api_key_fingerprint
+from .orchestrator import ManualOrchestrator
+from .prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+from .runtime import aiter_on_shared_loop, on_shared_loop
+from .sessions import AgentSpec, SessionRecord, get_session_store
+
+# Headless counterpart of app/main.py. Workers keep no session state of their own: every request loads the
+# session from the checkpoint database, rebuilds an orchestrator around the pooled agents and saves it back.
+# A request that changed the session since it was read, or that finds another one talking to it, gets a 409.
+
+_SYSTEM_PROMPTS = {Agent.GENERATOR.value: GENERATOR_SYSTEM_PROMPT, Agent.CRITIC.value: CRITIC_SYSTEM_PROMPT}
+
+
+def _api_key(request: Request) -> str:
+    scheme, _, api_key = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not api_key.strip():
+        raise HTTPException(401, "Send the OpenAI API key as 'Authorization: Bearer <key>'")
+    return api_key.strip()
+
+
+async def _body(request: Request) -> dict[str, Any]:
+    try:
+        body = await request.json() if await request.body() else {}
+    except json.JSONDecodeError:
+        raise HTTPException(422, "The request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(422, "The request body must be a JSON object")
+    return body
+
+
+def _field(body: dict[str, Any], name: str) -> str:
+    value = body.get(name)
+    if not isinstance(value, str) or not value.strip():
+        raise HTTPException(422, f"'{name}' must be a non-empty string")
+    return value
+
+
+def _model(value: Any, name: str) -> str:
+    try:
+        return LLMModel(value).value
+    except ValueError:
+        raise HTTPException(422, f"'{name}' must be one of {', '.join(m.value for m in LLMModel)}")
+
+
+def _temperature(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 2:
+        raise HTTPException(422, "'temperature' must be a number between 0 and 2")
+    return float(value)
+
+
+def _agent(value: Any) -> str:
+    try:
+        return Agent(value).value
+    except ValueError:
+        raise HTTPException(422, f"'agent' must be one of {', '.join(a.value for a in Agent)}")
+
+
+async def _load(request: Request) -> tuple[SessionRecord, str]:
+    api_key = _api_key(request)
+    record = await on_shared_loop(get_session_store().aget(request.path_params["session_id"]))
+    if record is None:
+        raise HTTPException(404, "Session not found")
+    if record.api_key_fingerprint != api_key_fingerprint(api_key):
+        raise HTTPException(403, "The API key does not match the one the session was created with")
+    return record, api_key
+
+
+def _orchestrator(record: SessionRecord, api_key: str) -> ManualOrchestrator:
+    # Compiles graphs on a pool miss, so it runs in the thread pool
+    orchestrator = ManualOrchestrator()
+    orchestrator.set_llm_api_key(api_key)
+    if record.main_task is not None:
+        orchestrator.set_main_task(record.main_task)
+    for name, spec in record.agents.items():
+        orchestrator.add_agent(
+            name,
+            _SYSTEM_PROMPTS[name],
+            LLMModel(spec.model),
+            LLMModel(spec.fast_model) if spec.fast_model else None,
+            record.temperature,
+        )
+    if record.draft is not None:
+        orchestrator.drafts[record.agents[Agent.GENERATOR.value].thread_id] = record.draft
+    orchestrator.last_revision = record.last_revision
+    return orchestrator
+
+
+def _view(record: SessionRecord) -> dict[str, Any]:
+    return {
+        "session_id": record.session_id,
+        "main_task": record.main_task,
+        "agents": {name: {"model": spec.model, "fast_model": spec.fast_model} for name, spec in record.agents.items()},
+        "temperature": record.temperature,
+        "current_agent": record.current_agent,
+        "last_agent": record.last_agent,
+        "last_reply": record.last_reply,
+        "created_at": record.created_at,
+        "updated_at": record.updated_at,
+    }
+
+
+def _sse(event: str, data: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _streams(request: Request) -> bool:
+    return request.query_params.get("stream") in ("1", "true") or "text/event-stream" in request.headers.get(
+        "accept", ""
+    )
+
+
+async def _save(record: SessionRecord) -> None:
+    try:
+        await on_shared_loop(get_session_store().asave(record))
+    except SessionConflictException as e:
+        raise HTTPException(409, str(e))
+
+
+async def create_session(request: Request) -> Response:
+    api_key = _api_key(request)
+    body = await _body(request)
+    default, fast_model = LLMModel.GPT_4_1.value, body.get("critic_fast_model")
+    record = SessionRecord(
+        api_key_fingerprint=api_key_fingerprint(api_key),
+        agents={
+            Agent.GENERATOR.value: AgentSpec(model=_model(body.get("generator_model", default), "generator_model")),
+            Agent.CRITIC.value: AgentSpec(
+                model=_model(body.get("critic_model", default), "critic_model"),
+                fast_model=_model(fast_model, "critic_fast_model") if fast_model is not None else None,
+            ),
+        },
+        main_task=_field(body, "main_task") if "main_task" in body else None,
+        temperature=_temperature(body.get("temperature", 0.7)),
+    )
+    await on_shared_loop(get_session_store().asave(record))
+    return JSONResponse(_view(record), status_code=201)
+
+
+async def get_session(request: Request) -> Response:
+    record, _ = await _load(request)
+    return JSONResponse(_view(record))
+
+
+async def delete_session(request: Request) -> Response:
+    # The conversation's checkpoints stay until `prune_checkpoints` expires them
+    record, _ = await _load(request)
+    await on_shared_loop(get_session_store().adelete(record.session_id))
+    return Response(status_code=204)
+
+
+async def set_task(request: Request) -> Response:
+    record, _ = await _load(request)
+    record.main_task = _field(await _body(request), "main_task")
+    await _save(record)
+    return JSONResponse(_view(record))
+
+
+async def talk(request: Request) -> Response:
+    record, api_key = await _load(request)
+    body = await _body(request)
+    agent_name = _agent(body.get("agent", record.current_agent))
+    return await _reply(request, record, api_key, agent_name, _field(body, "input"), None)
+
+
+async def redirect(request: Request) -> Response:
+    # Forwards the latest reply to the other agent, like the UI's redirect button
+    record, api_key = await _load(request)
+    if record.last_agent is None or record.last_reply is None:
+        raise HTTPException(409, "Nothing to redirect yet")
+    next_agent = Agent.CRITIC.value if record.last_agent == Agent.GENERATOR.value else Agent.GENERATOR.value
+    return await _reply(request, record, api_key, next_agent, record.last_reply, record.last_agent)
+
+
+async def _reply(
+    request: Request, record: SessionRecord, api_key: str, agent_name: str, input_text: str, context_from: str | None
+) -> Response:
+    if record.main_task is None:
+        raise HTTPException(409, "Set the main task first")
+    store = get_session_store()
+    try:
+        orchestrator = await run_in_threadpool(_orchestrator, record, api_key)
+    except ManualOrchestratorException as e:
+        raise HTTPException(400, str(e))
+    thread_id = record.agents[agent_name].thread_id
+
+    async def lease() -> None:
+        # Held until the reply is saved, so no other worker runs a turn on these threads meanwhile
+        await on_shared_loop(store.alease(record, get_settings().API_SESSION_LEASE_SECONDS))
+
+    async def finish(reply: str) -> None:
+        record.current_agent = record.last_agent = agent_name
+        record.last_reply = reply
+        if agent_name == Agent.GENERATOR.value:
+            record.draft = orchestrator.drafts.get(thread_id, reply)
+        record.last_revision = orchestrator.last_revision
+        await _save(record)
+
+    if not _streams(request):
+        try:
+            await lease()
+        except SessionConflictException as e:
+            raise HTTPException(409, str(e))
+        try:
+            reply = await on_shared_loop(orchestrator.atalk_to(agent_name, input_text, thread_id, context_from))
+            await finish(reply)
+        except ManualOrchestratorException as e:
+            raise HTTPException(400, str(e))
+        finally:
+            await on_shared_loop(store.arelease(record))
+        return JSONResponse({"agent": agent_name, "reply": reply})
+
+    async def events() -> AsyncIterator[str]:
+        # The lease is taken once the body is being sent, so a client that went away before then never holds it
+        try:
+            await lease()
+        except SessionConflictException as e:
+            yield _sse("error", {"error": str(e)})
+            return
+        chunks: list[str] = []
+        try:
+            async for chunk in aiter_on_shared_loop(
+                orchestrator.astream_to(agent_name, input_text, thread_id, context_from)
+            ):
+                chunks.append(chunk)
+                yield _sse("token", {"text": chunk})
+            await finish("".join(chunks))
+        except ManualOrchestratorException as e:
+            yield _sse("error", {"error": str(e)})
+            return
+        except HTTPException as e:
+            yield _sse("error", {"error": e.detail})
+            return
+        finally:
+            await on_shared_loop(store.arelease(record))
+        yield _sse("done", {"agent": agent_name, "reply": record.last_reply})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+async def _http_error(request: Request, exc: Exception) -> Response:
+    assert isinstance(exc, HTTPException)
+    return JSONResponse({"error": exc.detail}, status_code=exc.status_code)
+
+
+app = Starlette(
+    routes=[
+        Route("/sessions", create_session, methods=["POST"]),
+        Route("/sessions/{session_id}", get_session, methods=["GET"]),
+        Route("/sessions/{session_id}", delete_session, methods=["DELETE"]),
+        Route("/sessions/{session_id}/task", set_task, methods=["PUT"]),
+        Route("/sessions/{session_id}/talk", talk, methods=["POST"]),
+        Route("/sessions/{session_id}/redirect", redirect, methods=["POST"]),
+    ],
+    exception_handlers={HTTPException: _http_error},
+)
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the orchestrator over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1, help="worker processes, all sharing the checkpoint database")
+    args = parser.parse_args()
+    uvicorn.run("app.api:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
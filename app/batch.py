@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, TextIO
+
+from langchain_core.exceptions import LangChainException
+from openai import OpenAIError
+
+from .constants import Agent, LLMModel
+from .exceptions import ManualOrchestratorException
+from .orchestrator import ManualOrchestrator
+from .prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+from .refinement import RefinementTrace
+from .runtime import run_sync
+
+# Runs a JSONL backlog of main tasks through the generator/critic loop, one output line per finished task. The
+# output file is the progress record: a rerun skips the tasks it already holds, and the thread ids of a task are
+# derived from the run id, so a task that was cut short resumes from the turns its threads already store.
+
+
+@dataclass
+class BatchTask:
+    id: str
+    main_task: str
+    generator_model: LLMModel
+    critic_model: LLMModel
+    max_rounds: int
+    token_budget: int | None = None
+    convergence_threshold: float = 0.95
+
+
+@dataclass
+class BatchReport:
+    completed: int = 0
+    failed: int = 0
+    skipped: int = 0
+    tokens: int = 0
+    cost: float = 0.0
+    elapsed: float = 0.0
+    # Turns that were already stored by an earlier run and not redone
+    resumed_turns: int = 0
+    task_seconds: list[float] = field(default_factory=list)
+
+
+def _count(value: Any, name: str) -> int:
+    # A fractional or boolean count is a typo in the task file, not something to round
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(f"{name} must be a whole number, got {value!r}")
+    if (count := int(value)) < 1:
+        raise ValueError(f"{name} must be at least 1, got {value!r}")
+    return count
+
+
+def _threshold(value: Any) -> float:
+    if isinstance(value, bool) or not 0 < (threshold := float(value)) <= 1:
+        raise ValueError(f"convergence_threshold must be in (0, 1], got {value!r}")
+    return threshold
+
+
+def read_tasks(path: str, defaults: argparse.Namespace) -> list[BatchTask]:
+    tasks: list[BatchTask] = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                data = json.loads(line)
+                if not isinstance(data, dict):
+                    raise TypeError("not a JSON object")
+                if not isinstance(main_task := data["main_task"], str) or not main_task.strip():
+                    raise ValueError("main_task must be a non-empty string")
+                token_budget = data.get("token_budget", defaults.token_budget)
+                tasks.append(
+                    BatchTask(
+                        id=str(data.get("id", line_number)),
+                        main_task=main_task,
+                        generator_model=LLMModel(data.get("generator_model", defaults.generator_model)),
+                        critic_model=LLMModel(data.get("critic_model", defaults.critic_model)),
+                        max_rounds=_count(data.get("max_rounds", defaults.max_rounds), "max_rounds"),
+                        token_budget=None if token_budget is None else _count(token_budget, "token_budget"),
+                        convergence_threshold=_threshold(
+                            data.get("convergence_threshold", defaults.convergence_threshold)
+                        ),
+                    )
+                )
+            except (ValueError, KeyError, TypeError) as e:
+                raise ValueError(f"{path}:{line_number}: invalid task ({e!r})") from e
+    if len({task.id for task in tasks}) != len(tasks):
+        raise ValueError(f"{path}: task ids are not unique")
+    return tasks
+
+
+def completed_ids(path: str) -> set[str]:
+    # Failed tasks are retried; a line cut off by a crash is ignored
+    done: set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if not isinstance(record, dict) or "error" in record or (task_id := record.get("id")) is None:
+                continue
+            done.add(str(task_id))
+    return done
+
+
+def thread_ids(run_id: str, task_id: str) -> dict[str, str]:
+    return {name: str(uuid.uuid5(uuid.NAMESPACE_URL, f"{run_id}/{task_id}/{name.value}")) for name in Agent}
+
+
+def task_cost(task: BatchTask, trace: RefinementTrace, prices: dict[str, float]) -> float:
+    # `prices` are blended USD per million tokens by model name
+    models = {Agent.GENERATOR: task.generator_model.value, Agent.CRITIC: task.critic_model.value}
+    return sum(turn.tokens * prices.get(models[Agent(turn.agent_name)], 0.0) for turn in trace.turns) / 1e6
+
+
+class BatchRunner:
+    def __init__(
+        self,
+        api_key: str,
+        output: TextIO,
+        run_id: str,
+        concurrency: int,
+        prices: dict[str, float] | None = None,
+    ) -> None:
+        self.api_key = api_key
+        self.output = output
+        self.run_id = run_id
+        self.concurrency = concurrency
+        self.prices = prices or {}
+        self.report = BatchReport()
+
+    def _orchestrator(self, task: BatchTask) -> ManualOrchestrator:
+        orchestrator = ManualOrchestrator()
+        # Resuming rebuilds turns from the stored replies, which in revision mode hold edits, not drafts
+        orchestrator.revision_mode = False
+        orchestrator.set_llm_api_key(self.api_key)
+        orchestrator.add_agent(Agent.GENERATOR, GENERATOR_SYSTEM_PROMPT, task.generator_model)
+        orchestrator.add_agent(Agent.CRITIC, CRITIC_SYSTEM_PROMPT, task.critic_model)
+        return orchestrator
+
+    async def arun(self, tasks: list[BatchTask], skip: set[str] | None = None) -> BatchReport:
+        skip = skip or set()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = time.perf_counter()
+
+        async def run(task: BatchTask) -> None:
+            async with semaphore:
+                await self._arun_task(task)
+
+        pending = [task for task in tasks if task.id not in skip]
+        self.report.skipped += len(tasks) - len(pending)
+        await asyncio.gather(*(run(task) for task in pending))
+        self.report.elapsed += time.perf_counter() - started
+        return self.report
+
+    async def _arun_task(self, task: BatchTask) -> None:
+        started = time.perf_counter()
+        record: dict[str, Any] = {"id": task.id}
+        try:
+            # Building the agents may compile graphs and open the checkpointer, which block
+            orchestrator = await asyncio.to_thread(self._orchestrator, task)
+            trace = await orchestrator.arefine(
+                task.main_task,
+                max_rounds=task.max_rounds,
+                token_budget=task.token_budget,
+                convergence_threshold=task.convergence_threshold,
+                thread_ids=thread_ids(self.run_id, task.id),
+                resume=True,
+            )
+        except (ManualOrchestratorException, LangChainException, OpenAIError, sqlite3.Error) as e:
+            # One task failing doesn't stop the batch; it is retried on the next run
+            self.report.failed += 1
+            self._write({**record, "error": str(e) or type(e).__name__})
+            return
+        elapsed = time.perf_counter() - started
+        resumed = trace.resumed_turns
+        cost = task_cost(task, trace, self.prices)
+        self.report.completed += 1
+        self.report.tokens += trace.tokens
+        self.report.cost += cost
+        self.report.resumed_turns += resumed
+        self.report.task_seconds.append(elapsed)
+        self._write(
+            {
+                **record,
+                "final_draft": trace.final_draft,
+                "stop_reason": trace.stop_reason.value,
+                "rounds": trace.turns[-1].round if trace.turns else 0,
+                "tokens": trace.tokens,
+                "cost_usd": round(cost, 6),
+                "elapsed": round(elapsed, 3),
+                "resumed_turns": resumed,
+                "thread_ids": trace.thread_ids,
+            }
+        )
+
+    def _write(self, record: dict[str, Any]) -> None:
+        # Every task finishes on the shared loop's thread, so lines never interleave
+        self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+
+def _end_last_line(path: str) -> None:
+    # A line cut off by a crash gets finished, so that the next record starts on its own
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+    with open(path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+def _price(value: str) -> tuple[str, float]:
+    model, _, price = value.partition("=")
+    return LLMModel(model).value, float(price)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run a JSONL file of main tasks through the generator and critic.")
+    parser.add_argument("tasks", help='JSONL, one {"main_task": ...} per line; see the README for optional fields')
+    parser.add_argument("output", help="JSONL results, appended to; rerun with the same file to resume")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--generator-model", default=LLMModel.GPT_4_1.value, choices=[m.value for m in LLMModel])
+    parser.add_argument("--critic-model", default=LLMModel.GPT_4_1.value, choices=[m.value for m in LLMModel])
+    parser.add_argument("--max-rounds", type=int, default=3)
+    parser.add_argument("--token-budget", type=int, default=None)
+    parser.add_argument("--convergence-threshold", type=float, default=0.95)
+    parser.add_argument("--run-id", help="names the tasks' threads, defaults to the output path")
+    parser.add_argument(
+        "--price", type=_price, action="append", default=[], help="MODEL=USD per million tokens, repeatable"
+    )
+    args = parser.parse_args()
+
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        parser.error("Set OPENAI_API_KEY (any value with LLM_BACKEND=fake)")
+    tasks = read_tasks(args.tasks, args)
+    _end_last_line(args.output)
+    with open(args.output, "a", encoding="utf-8") as output:
+        runner = BatchRunner(
+            api_key,
+            output,
+            run_id=args.run_id or os.path.abspath(args.output),
+            concurrency=args.concurrency,
+            prices=dict(args.price),
+        )
+        report = run_sync(runner.arun(tasks, skip=completed_ids(args.output)))
+
+    print(
+        f"{report.completed} completed, {report.failed} failed, {report.skipped} already done, "
+        f"{report.resumed_turns} turns resumed"
+    )
+    if report.completed:
+        print(
+            f"  {report.elapsed:.1f} s, {report.completed / report.elapsed * 60:.1f} tasks/min, "
+            f"{sum(report.task_seconds) / report.completed:.1f} s/task"
+        )
+        print(f"  {report.tokens} tokens ({report.tokens / report.completed:.0f}/task)", end="")
+        print(f", ${report.cost:.4f} (${report.cost / report.completed:.4f}/task)" if args.price else "")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import hashlib
+import importlib.util
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from langchain_core.messages import BaseMessage
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# Message bodies are split into chunks at blank lines and headings, and each long chunk is stored once, compressed,
+# under its digest. A draft quoted in the critic's prompt, the main task repeated in every prompt and the whole
+# history that every checkpoint re-serializes then cost a digest per chunk instead of the text.
+BLOBS_TABLE = """
+CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+    digest TEXT PRIMARY KEY,
+    codec TEXT NOT NULL,
+    data BLOB NOT NULL,
+    touched_at REAL NOT NULL
+)
+"""
+
+STORE_BLOBS = (
+    "INSERT INTO checkpoint_blobs (digest, codec, data, touched_at) VALUES (?, ?, ?, ?) "
+    "ON CONFLICT (digest) DO UPDATE SET touched_at = excluded.touched_at"
+)
+
+# Content block a message body is replaced with: its chunks, either inline text or {"blob": digest}, joined by "\n"
+BLOB_CONTENT_TYPE = "blob_chunks"
+_DIGEST_REF = re.compile(rb"blob.{1,4}?([0-9a-f]{32})", re.DOTALL)
+
+# A process re-touches a blob it writes at most this often; unreferenced blobs are only deleted once they have not
+# been touched for longer than the grace period, which covers a writer that skipped the touch
+TOUCH_INTERVAL_SECONDS = 3600
+GC_GRACE_SECONDS = 2 * TOUCH_INTERVAL_SECONDS
+
+
+# Blobs a reader fetched for the value being deserialized, which the cache may already have evicted again
+_preloaded: ContextVar[dict[str, str] | None] = ContextVar("preloaded_blobs", default=None)
+
+
+class MissingBlobs(KeyError):
+    # Raised while deserializing, for blobs that are not in memory: the saver fetches them and reads again
+    def __init__(self, digests: set[str]) -> None:
+        super().__init__(f"Checkpoint blobs are not loaded: {', '.join(sorted(digests))}")
+        self.digests = digests
+
+
+def _digest(text: str) -> str:
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+
+def split_chunks(text: str) -> list[str]:
+    # Chunk boundaries depend only on the lines around them, so a draft quoted after a heading in another prompt
+    # is cut into the same chunks as the draft itself
+    chunks: list[str] = []
+    lines: list[str] = []
+    for line in text.split("\n"):
+        if not line.strip():
+            if lines:
+                chunks.append("\n".join(lines))
+                lines = []
+            chunks.append(line)
+            continue
+        lines.append(line)
+        if line.lstrip().startswith("#"):
+            chunks.append("\n".join(lines))
+            lines = []
+    if lines:
+        chunks.append("\n".join(lines))
+    return chunks
+
+
+class BlobSerializer(SerializerProtocol):
+    # Wraps langgraph's serializer. It never queries the database itself, since it runs on the event loop: the
+    # saver writes the blobs `dumps_packed` returns in the transaction that writes the checkpoint, and fetches the
+    # ones a read is missing through its own connection before deserializing again (see `MissingBlobs`).
+
+    def __init__(
+        self,
+        min_chars: int,
+        cache_max_chars: int,
+        codec: str | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.min_chars = min_chars
+        self.cache_max_chars = cache_max_chars
+        self.codec = codec or ("zstd" if importlib.util.find_spec("zstandard") else "zlib")
+        self.inner = JsonPlusSerializer()
+        self._clock = clock
+        self._texts: OrderedDict[str, str] = OrderedDict()
+        self._cached_chars = 0
+        self._touched: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        # Nothing would write the blobs, so messages stay inline
+        return self.inner.dumps_typed(obj)
+
+    def dumps_packed(self, obj: Any) -> tuple[str, bytes, dict[str, str]]:
+        blobs: dict[str, str] = {}
+        value = _map_messages(obj, lambda message: self._pack(message, blobs))
+        return *self.inner.dumps_typed(value), blobs
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        value = self.inner.loads_typed(data)
+        digests: set[str] = set()
+        _map_messages(value, lambda message: _collect(message, digests))
+        if not digests:
+            return value
+        texts = self._load(digests)
+        return _map_messages(value, lambda message: _unpack(message, texts))
+
+    def blob_rows(self, blobs: dict[str, str]) -> list[tuple[str, str, bytes, float]]:
+        # Rows for `STORE_BLOBS`; blobs this process wrote or touched recently are left out
+        now = self._clock()
+        with self._lock:
+            return [
+                (digest, self.codec, _compress(text, self.codec), now)
+                for digest, text in blobs.items()
+                if now - self._touched.get(digest, float("-inf")) >= TOUCH_INTERVAL_SECONDS
+            ]
+
+    def stored(self, blobs: dict[str, str], rows: list[tuple[str, str, bytes, float]]) -> None:
+        # Once the transaction that wrote `rows` has committed
+        with self._lock:
+            for digest, _, _, touched_at in rows:
+                self._touched[digest] = touched_at
+            for digest, text in blobs.items():
+                if digest in self._touched:
+                    self._touched.move_to_end(digest)
+                self._cache(digest, text)
+            while len(self._touched) > 100_000:
+                self._touched.popitem(last=False)
+
+    def _pack(self, message: BaseMessage, blobs: dict[str, str]) -> BaseMessage:
+        if not isinstance(message.content, str) or len(message.content) < self.min_chars:
+            return message
+        chunks: list[str | dict[str, str]] = []
+        for chunk in split_chunks(message.content):
+            if len(chunk) < self.min_chars:
+                # Neighbouring inline chunks merge, since the parts are joined with "\n" anyway
+                if chunks and isinstance(chunks[-1], str):
+                    chunks[-1] += "\n" + chunk
+                else:
+                    chunks.append(chunk)
+            else:
+                digest = _digest(chunk)
+                blobs[digest] = chunk
+                chunks.append({"blob": digest})
+        return message.model_copy(update={"content": [{"type": BLOB_CONTENT_TYPE, "chunks": chunks}]})
+
+    @contextmanager
+    def preloaded(self, texts: dict[str, str]) -> Iterator[None]:
+        # Deserializing within this block also takes blobs from `texts`
+        token = _preloaded.set(texts)
+        try:
+            yield
+        finally:
+            _preloaded.reset(token)
+
+    def loaded(self, rows: Iterable[tuple[str, str, bytes]]) -> dict[str, str]:
+        # Rows of (digest, codec, data) the saver fetched from checkpoint_blobs
+        texts = {digest: _decompress(data, codec) for digest, codec, data in rows}
+        with self._lock:
+            for digest, text in texts.items():
+                self._cache(digest, text)
+        return texts
+
+    def _load(self, digests: set[str]) -> dict[str, str]:
+        preloaded = _preloaded.get() or {}
+        texts = {}
+        with self._lock:
+            for digest in digests:
+                if digest in self._texts:
+                    self._texts.move_to_end(digest)
+                    texts[digest] = self._texts[digest]
+                elif digest in preloaded:
+                    texts[digest] = preloaded[digest]
+        if missing := digests - texts.keys():
+            raise MissingBlobs(missing)
+        return texts
+
+    def _cache(self, digest: str, text: str) -> None:
+        self._cached_chars -= len(self._texts.pop(digest, ""))
+        self._texts[digest] = text
+        self._cached_chars += len(text)
+        while self._cached_chars > self.cache_max_chars and len(self._texts) > 1:
+            self._cached_chars -= len(self._texts.popitem(last=False)[1])
+
+
+def _map_messages(value: Any, fn: Callable[[BaseMessage], BaseMessage]) -> Any:
+    # Copies the containers on the way to every message, so the checkpoint the graph keeps working on is untouched
+    if isinstance(value, BaseMessage):
+        return fn(value)
+    if isinstance(value, dict):
+        return {key: _map_messages(item, fn) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_map_messages(item, fn) for item in value]
+    if isinstance(value, tuple) and not hasattr(value, "_fields"):
+        return tuple(_map_messages(item, fn) for item in value)
+    return value
+
+
+def _blob_chunks(message: BaseMessage) -> list[Any] | None:
+    content = message.content
+    if isinstance(content, list) and len(content) == 1 and isinstance(block := content[0], dict):
+        return block["chunks"] if block.get("type") == BLOB_CONTENT_TYPE else None
+    return None
+
+
+def _collect(message: BaseMessage, digests: set[str]) -> BaseMessage:
+    for chunk in _blob_chunks(message) or []:
+        if isinstance(chunk, dict):
+            digests.add(chunk["blob"])
+    return message
+
+
+def _unpack(message: BaseMessage, texts: dict[str, str]) -> BaseMessage:
+    if (chunks := _blob_chunks(message)) is None:
+        return message
+    content = "\n".join(chunk if isinstance(chunk, str) else texts[chunk["blob"]] for chunk in chunks)
+    return message.model_copy(update={"content": content})
+
+
+def _compress(text: str, codec: str) -> bytes:
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compress(text.encode())
+    return zlib.compress(text.encode())
+
+
+def _decompress(data: bytes, codec: str) -> str:
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    return zlib.decompress(data).decode()
+
+
+def referenced_digests(serialized: Iterable[bytes]) -> set[str]:
+    # Scans serialized checkpoints and writes for blob references without deserializing them. It can match more
+    # than is referenced, which only keeps a blob alive for longer.
+    digests: set[str] = set()
+    for data in serialized:
+        digests.update(match.decode() for match in _DIGEST_REF.findall(data or b""))
+    return digests
+
+
+def collect_blobs(conn: sqlite3.Connection, now: float | None = None) -> int:
+    # Run inside the transaction that pruned the checkpoints, so that no checkpoint lands between the scan and the
+    # delete. Writers that reuse a blob without writing it have touched it within the grace period.
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "checkpoint_blobs" not in tables:
+        return 0
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+    live = referenced_digests(
+        data
+        for query in ("SELECT checkpoint FROM checkpoints", "SELECT value FROM writes")
+        for (data,) in conn.execute(query)
+    )
+    cutoff = (now if now is not None else time.time()) - GC_GRACE_SECONDS
+    candidates = [
+        digest
+        for (digest,) in conn.execute("SELECT digest FROM checkpoint_blobs WHERE touched_at < ?", (cutoff,))
+        if digest not in live
+    ]
+    conn.executemany("DELETE FROM checkpoint_blobs WHERE digest = ?", [(digest,) for digest in candidates])
+    return len(candidates)
@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Sequence
+
+from langchain.messages import AIMessage
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from .config import get_settings
+
+EXPIRY_INTERVAL_SECONDS = 60
+
+
+def cache_key(model: str, temperature: float, system_prompt: str | None, messages: Sequence[BaseMessage]) -> str:
+    # Only what reaches the provider matters: ids, metadata and whitespace differences don't change the answer
+    normalized = [(message.type, " ".join(message.text.split())) for message in messages]
+    payload = json.dumps([model, temperature, " ".join((system_prompt or "").split()), normalized])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    bypassed: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResponseCache:
+    # Two tiers: a small in-memory LRU in front of a size-bounded sqlite table. Entries expire after `ttl_seconds`
+    # in both tiers; the disk tier evicts least recently read entries once it grows past `max_bytes`. The async
+    # methods serve memory hits inline and do the disk I/O in a worker thread, off the shared event loop.
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        max_bytes: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.stats = CacheStats()
+        self._clock = clock
+        self._memory: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+        # Reads only record their time here; it is written with the next put, which is when eviction needs it
+        self._accessed: dict[str, float] = {}
+        self._expired_at = float("-inf")
+        self._disk_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        # Kept up to date by this process and recounted before evicting, since other processes share the file
+        self._disk_bytes = self._count_disk_bytes()
+
+    def get(self, key: str) -> AIMessage | None:
+        now = self._clock()
+        with self._lock:
+            value = self._get_from_memory(key, now)
+        if value is None:
+            value = self._load(key, now)
+        return self._count(key, now, value)
+
+    async def aget(self, key: str) -> AIMessage | None:
+        now = self._clock()
+        with self._lock:
+            value = self._get_from_memory(key, now)
+        if value is None:
+            value = await asyncio.to_thread(self._load, key, now)
+        return self._count(key, now, value)
+
+    def put(self, key: str, message: AIMessage) -> None:
+        value, now = self._remember(key, message)
+        self._store(key, value, now)
+
+    async def aput(self, key: str, message: AIMessage) -> None:
+        value, now = self._remember(key, message)
+        await asyncio.to_thread(self._store, key, value, now)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._accessed.clear()
+            self.stats = CacheStats()
+        with self._disk_lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._disk_bytes = 0
+
+    def disk_usage(self) -> int:
+        with self._disk_lock:
+            return self._count_disk_bytes()
+
+    def _count(self, key: str, now: float, value: bytes | None) -> AIMessage | None:
+        with self._lock:
+            if value is None:
+                self.stats.misses += 1
+                return None
+            self.stats.hits += 1
+            self._accessed[key] = now
+        message = messages_from_dict([json.loads(value)])[0]
+        # No usage_metadata: a replayed answer costs no tokens
+        return AIMessage(
+            content=message.content, response_metadata={**message.response_metadata, "response_cache": "hit"}
+        )
+
+    def _remember(self, key: str, message: AIMessage) -> tuple[bytes, float]:
+        # Stored without an id so that a cached reply can be appended to a thread more than once
+        value = json.dumps(message_to_dict(message.model_copy(update={"id": None}))).encode()
+        now = self._clock()
+        with self._lock:
+            self._put_in_memory(key, now, value)
+        return value, now
+
+    def _get_from_memory(self, key: str, now: float) -> bytes | None:
+        if key not in self._memory:
+            return None
+        created_at, value = self._memory[key]
+        if now - created_at > self.ttl_seconds:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return value
+
+    def _put_in_memory(self, key: str, created_at: float, value: bytes) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: str, now: float) -> bytes | None:
+        with self._disk_lock:
+            row = self._conn.execute(
+                "SELECT created_at, value FROM responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+        if row is None:
+            return None
+        with self._lock:
+            self._put_in_memory(key, row[0], row[1])
+        return row[1]
+
+    def _store(self, key: str, value: bytes, now: float) -> None:
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+        with self._disk_lock:
+            self._conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", [(at, k) for k, at in accessed.items()]
+            )
+            replaced = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value), now, now),
+            )
+            self._disk_bytes += len(value) - (replaced[0] if replaced else 0)
+            self._evict_from_disk(now)
+            self._conn.commit()
+
+    def _count_disk_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict_from_disk(self, now: float) -> None:
+        # Expired entries are swept at most once per EXPIRY_INTERVAL_SECONDS; reads skip them meanwhile
+        if now - self._expired_at >= EXPIRY_INTERVAL_SECONDS:
+            self._expired_at = now
+            expired = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ? RETURNING size", (now - self.ttl_seconds,)
+            ).fetchall()
+            self._disk_bytes -= sum(size for (size,) in expired)
+        if self._disk_bytes <= self.max_bytes:
+            return
+        self._disk_bytes = self._count_disk_bytes()
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall():
+            if self._disk_bytes <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            with self._lock:
+                self._memory.pop(key, None)
+            self._disk_bytes -= size
+
+
+@lru_cache
+def get_response_cache() -> ResponseCache:
+    settings = get_settings()
+    return ResponseCache(
+        path=settings.RESPONSE_CACHE_PATH,
+        max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes=settings.RESPONSE_CACHE_MAX_BYTES,
+        ttl_seconds=settings.RESPONSE_CACHE_TTL_SECONDS,
+    )
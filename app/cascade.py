@@ -0,0 +1,46 @@
+import re
+from enum import Enum
+from typing import Callable
+
+from langchain.messages import AIMessage
+
+
+class CascadeTier(str, Enum):
+    FAST = "fast"
+    STRONG = "strong"
+
+
+# Returns why a fast-tier reply is not good enough, or None to keep it
+EscalationGate = Callable[[AIMessage], str | None]
+
+# The critic's "Step 0" sanity check failing, and refusals: cases the stronger model should judge for itself. Both
+# open the reply; a critique that calls a passage ambiguous or asks to clarify a point further down is routine.
+_FLAGGED = re.compile(
+    r"\b(main task|request|task|context text|goals?|instructions?)\b[^.?!\n]{0,60}?"
+    r"\b(is|are|seems?|appears?|looks?)( to be)?( (somewhat|rather|quite|too|very))? "
+    r"(contradictory|nonsensical|ambiguous|unclear|conflicting|in conflict)\b"
+    r"|\b(could|can|would) you (please )?clarify\b"
+    r"|\b(before (I|we) (proceed|continue|go on)|I need (some |more |further )?clarification)\b"
+    r"|\bI (can(no|')t|am unable to|'m unable to) (help|assist|comply)\b",
+    re.IGNORECASE,
+)
+# The first paragraph, up to this many characters
+_OPENING_CHARS = 400
+
+
+def escalation_reason(message: AIMessage, min_chars: int = 200) -> str | None:
+    # Local and free, so every fast reply can be checked
+    if message.response_metadata.get("finish_reason") == "length":
+        return "truncated"
+    if message.tool_calls:
+        return None
+    text = message.text.strip()
+    if len(text) < min_chars:
+        return "too_short"
+    if _FLAGGED.search(text.split("\n\n", 1)[0][:_OPENING_CHARS]):
+        return "flagged"
+    return None
+
+
+def default_gate(min_chars: int) -> EscalationGate:
+    return lambda message: escalation_reason(message, min_chars)
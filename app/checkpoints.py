@@ -0,0 +1,539 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import Any, TypeVar, cast
+from uuid import UUID, uuid4
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint import base
+from langgraph.checkpoint.base import Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from .blobs import BLOBS_TABLE, STORE_BLOBS, BlobSerializer, MissingBlobs, collect_blobs
+from .config import get_settings
+from .runtime import run_sync
+
+T = TypeVar("T")
+
+# 100-ns intervals between the UUID epoch (1582-10-15) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+# Set on a fork's checkpoint whose messages start with the ones at the fork point: it holds the number of messages
+# shared with the parent, and the checkpoint stores only the rest
+_FORK_PREFIX = "fork_prefix"
+
+_FORKS_TABLE = """
+CREATE TABLE IF NOT EXISTS forks (
+    thread_id TEXT PRIMARY KEY,
+    parent_thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    parent_checkpoint_id TEXT NOT NULL,
+    created_at REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class ForkInfo:
+    thread_id: str
+    parent_thread_id: str
+    parent_checkpoint_id: str
+    created_at: float
+
+
+class ForkingSqliteSaver(AsyncSqliteSaver):
+    # Adds copy-on-write forks: a fork is one row pointing at a checkpoint of its parent thread. Reads of the fork
+    # fall through to the parent until the fork has checkpoints of its own, so forking costs the same whatever the
+    # length of the history. The fork's own checkpoints store the messages after the fork point and take the
+    # shared ones from the parent, so what a fork stores grows with how far it diverged, not with the history.
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        # Before the base tables: once `is_setup` is set, readers expect the forks table to be there
+        async with self.lock:
+            await self.conn.execute(_FORKS_TABLE)
+            if isinstance(self.serde, BlobSerializer):
+                await self.conn.execute(BLOBS_TABLE)
+            await self.conn.commit()
+        await super().setup()
+
+    async def afork(
+        self,
+        thread_id: str,
+        checkpoint_id: str | None = None,
+        new_thread_id: str | None = None,
+        checkpoint_ns: str = "",
+    ) -> str:
+        config: RunnableConfig = {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}}
+        if checkpoint_id is not None:
+            config["configurable"]["checkpoint_id"] = checkpoint_id
+        if (fork_point := await self.aget_tuple(config)) is None:
+            raise ValueError(f"Thread {thread_id} has no checkpoint {checkpoint_id or ''} to fork from".rstrip())
+        new_thread_id = new_thread_id or str(uuid4())
+        async with self.lock:
+            await self.conn.execute(
+                "INSERT INTO forks (thread_id, parent_thread_id, checkpoint_ns, parent_checkpoint_id, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    new_thread_id,
+                    thread_id,
+                    checkpoint_ns,
+                    fork_point.config["configurable"]["checkpoint_id"],
+                    time.time(),
+                ),
+            )
+            await self.conn.commit()
+        return new_thread_id
+
+    async def alist_forks(self, thread_id: str | None = None) -> list[ForkInfo]:
+        await self.setup()
+        query = "SELECT thread_id, parent_thread_id, parent_checkpoint_id, created_at FROM forks"
+        params: tuple[str, ...] = ()
+        if thread_id is not None:
+            query, params = query + " WHERE parent_thread_id = ?", (thread_id,)
+        async with self.lock, self.conn.execute(query + " ORDER BY created_at", params) as cur:
+            return [ForkInfo(*row) async for row in cur]
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: dict[str, Any],
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        messages = checkpoint["channel_values"].get("messages")
+        if isinstance(messages, list) and (fork := await self._get_fork(thread_id)) is not None:
+            shared = await self._fork_point_messages(fork, config["configurable"].get("checkpoint_ns", ""))
+            if shared and _starts_with(messages, shared):
+                channel_values = {**checkpoint["channel_values"], "messages": messages[len(shared) :]}
+                checkpoint = cast(
+                    Checkpoint, {**checkpoint, "channel_values": channel_values, _FORK_PREFIX: len(shared)}
+                )
+        # The base class's insert, with the message blobs written in the same transaction
+        await self.setup()
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized, blobs = self._dumps(checkpoint)
+        serialized_metadata = json.dumps(base.get_checkpoint_metadata(config, metadata), ensure_ascii=False)
+        row = (
+            thread_id,
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            type_,
+            serialized,
+            serialized_metadata.encode("utf-8", "ignore"),
+        )
+        await self._awrite(
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [row],
+            blobs,
+        )
+        return {
+            "configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.setup()
+        configurable = config["configurable"]
+        verb = "REPLACE" if all(channel in base.WRITES_IDX_MAP for channel, _ in writes) else "IGNORE"
+        rows, blobs = [], {}
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized, value_blobs = self._dumps(value)
+            blobs.update(value_blobs)
+            rows.append(
+                (
+                    str(configurable["thread_id"]),
+                    str(configurable["checkpoint_ns"]),
+                    str(configurable["checkpoint_id"]),
+                    task_id,
+                    base.WRITES_IDX_MAP.get(channel, idx),
+                    channel,
+                    type_,
+                    serialized,
+                )
+            )
+        await self._awrite(
+            f"INSERT OR {verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, "
+            "value) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+            blobs,
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> CheckpointTuple | None:
+        base_get_tuple = super().aget_tuple
+        if (checkpoint := await self._aread(lambda: base_get_tuple(config))) is not None:
+            return await self._with_shared_messages(checkpoint)
+        thread_id = str(config["configurable"]["thread_id"])
+        if (fork := await self._get_fork(thread_id)) is None:
+            return None
+        checkpoint_id = config["configurable"].get("checkpoint_id") or fork.parent_checkpoint_id
+        if checkpoint_id > fork.parent_checkpoint_id:
+            return None
+        parent_config: RunnableConfig = {
+            "configurable": {
+                **config["configurable"],
+                "thread_id": fork.parent_thread_id,
+                "checkpoint_id": checkpoint_id,
+            }
+        }
+        if (checkpoint := await self.aget_tuple(parent_config)) is None:
+            return None
+        # Pending writes at the fork point belong to the parent's continuation, not to the fork
+        pending_writes = [] if checkpoint_id == fork.parent_checkpoint_id else checkpoint.pending_writes
+        return checkpoint._replace(
+            config=_on_thread(checkpoint.config, thread_id),
+            parent_config=checkpoint.parent_config and _on_thread(checkpoint.parent_config, thread_id),
+            pending_writes=pending_writes,
+        )
+
+    async def alist(
+        self,
+        config: RunnableConfig | None,
+        *,
+        filter: dict[str, Any] | None = None,
+        before: RunnableConfig | None = None,
+        limit: int | None = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        # Collected first: the base class holds the saver's lock while it iterates
+        base_list = super().alist
+        own = await self._aread(lambda: _collected(base_list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in own:
+            yield await self._with_shared_messages(checkpoint)
+        listed = len(own)
+        if config is None or (limit is not None and listed >= limit):
+            return
+        thread_id = str(config["configurable"]["thread_id"])
+        if (fork := await self._get_fork(thread_id)) is None:
+            return
+        parent_config: RunnableConfig = {"configurable": {**config["configurable"], "thread_id": fork.parent_thread_id}}
+        async for checkpoint in self.alist(parent_config, filter=filter, before=before):
+            if checkpoint.config["configurable"]["checkpoint_id"] > fork.parent_checkpoint_id:
+                continue
+            yield checkpoint._replace(
+                config=_on_thread(checkpoint.config, thread_id),
+                parent_config=checkpoint.parent_config and _on_thread(checkpoint.parent_config, thread_id),
+            )
+            listed += 1
+            if limit is not None and listed >= limit:
+                return
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        # Forks of this thread that have no checkpoints of their own become unreachable; `prune_checkpoints` drops
+        # them. The ones that do are rewritten in full first, since their checkpoints take messages from this thread.
+        for fork in await self.alist_forks(str(thread_id)):
+            await self._store_in_full(fork.thread_id)
+        await super().adelete_thread(thread_id)
+        async with self.lock:
+            await self.conn.execute("DELETE FROM forks WHERE thread_id = ?", (str(thread_id),))
+            await self.conn.commit()
+
+    async def _get_fork(self, thread_id: str) -> ForkInfo | None:
+        await self.setup()
+        async with (
+            self.lock,
+            self.conn.execute(
+                "SELECT thread_id, parent_thread_id, parent_checkpoint_id, created_at FROM forks WHERE thread_id = ?",
+                (thread_id,),
+            ) as cur,
+        ):
+            row = await cur.fetchone()
+        return None if row is None else ForkInfo(*row)
+
+    async def _fork_point_messages(self, fork: ForkInfo, checkpoint_ns: str) -> list[Any]:
+        config: RunnableConfig = {
+            "configurable": {
+                "thread_id": fork.parent_thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": fork.parent_checkpoint_id,
+            }
+        }
+        if (fork_point := await self.aget_tuple(config)) is None:
+            return []
+        return fork_point.checkpoint["channel_values"].get("messages", [])
+
+    async def _with_shared_messages(self, checkpoint: CheckpointTuple) -> CheckpointTuple:
+        values: dict[str, Any] = dict(checkpoint.checkpoint)
+        if (shared_count := values.pop(_FORK_PREFIX, None)) is None:
+            return checkpoint
+        configurable = checkpoint.config["configurable"]
+        shared = []
+        if (fork := await self._get_fork(str(configurable["thread_id"]))) is not None:
+            shared = await self._fork_point_messages(fork, configurable.get("checkpoint_ns", ""))
+        if len(shared) != shared_count:
+            raise ValueError(f"Thread {configurable['thread_id']} is missing the checkpoint it was forked from")
+        values["channel_values"] = {
+            **values["channel_values"],
+            "messages": [*shared, *values["channel_values"]["messages"]],
+        }
+        return checkpoint._replace(checkpoint=cast(Checkpoint, values))
+
+    async def _store_in_full(self, thread_id: str) -> None:
+        # Only the thread's own checkpoints, collected before the shared messages are read
+        base_list = super().alist
+        own = await self._aread(lambda: _collected(base_list({"configurable": {"thread_id": thread_id}})))
+        rows, blobs = [], {}
+        for checkpoint in own:
+            if _FORK_PREFIX in checkpoint.checkpoint:
+                full = await self._with_shared_messages(checkpoint)
+                configurable = checkpoint.config["configurable"]
+                type_, serialized, checkpoint_blobs = self._dumps(full.checkpoint)
+                blobs.update(checkpoint_blobs)
+                rows.append(
+                    (type_, serialized, thread_id, configurable["checkpoint_ns"], configurable["checkpoint_id"])
+                )
+        await self._awrite(
+            "UPDATE checkpoints SET type = ?, checkpoint = ? "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            rows,
+            blobs,
+        )
+
+    async def _aread(self, read: Callable[[], Awaitable[T]]) -> T:
+        # Deserializing can't wait on the database, so the blobs a read is missing are fetched through this
+        # connection and the read runs again with them at hand
+        if not isinstance(self.serde, BlobSerializer):
+            return await read()
+        texts: dict[str, str] = {}
+        while True:
+            with self.serde.preloaded(texts):
+                try:
+                    return await read()
+                except MissingBlobs as e:
+                    missing = e.digests
+            fetched = await self._afetch_blobs(missing)
+            if lost := missing - fetched.keys():
+                raise KeyError(f"Checkpoint blobs are missing: {', '.join(sorted(lost))}")
+            texts.update(fetched)
+
+    async def _afetch_blobs(self, digests: set[str]) -> dict[str, str]:
+        assert isinstance(self.serde, BlobSerializer)
+        missing = list(digests)
+        rows: list[tuple[str, str, bytes]] = []
+        async with self.lock:
+            for offset in range(0, len(missing), 500):
+                batch = missing[offset : offset + 500]
+                placeholders = ", ".join("?" * len(batch))
+                query = f"SELECT digest, codec, data FROM checkpoint_blobs WHERE digest IN ({placeholders})"
+                async with self.conn.execute(query, batch) as cur:
+                    rows.extend(cast(list[tuple[str, str, bytes]], await cur.fetchall()))
+        return self.serde.loaded(rows)
+
+    def _dumps(self, value: Any) -> tuple[str, bytes, dict[str, str]]:
+        if isinstance(self.serde, BlobSerializer):
+            return self.serde.dumps_packed(value)
+        return *self.serde.dumps_typed(value), {}
+
+    async def _awrite(self, query: str, rows: list[tuple[Any, ...]], blobs: dict[str, str]) -> None:
+        # The blobs go first and commit with the rows that refer to them, through this connection and under its
+        # lock, so they neither wait on another connection for the sqlite lock nor outlive a failed write
+        blob_rows = self.serde.blob_rows(blobs) if blobs and isinstance(self.serde, BlobSerializer) else []
+        async with self.lock:
+            try:
+                if blob_rows:
+                    await self.conn.executemany(STORE_BLOBS, blob_rows)
+                await self.conn.executemany(query, rows)
+                await self.conn.commit()
+            except BaseException:
+                await self.conn.rollback()
+                raise
+        if blobs and isinstance(self.serde, BlobSerializer):
+            self.serde.stored(blobs, blob_rows)
+
+
+async def _collected(items: AsyncIterator[T]) -> list[T]:
+    return [item async for item in items]
+
+
+def _starts_with(messages: list[Any], prefix: list[Any]) -> bool:
+    # Messages are compared by id, which the graph assigns to every message it adds
+    if len(messages) < len(prefix):
+        return False
+    return all(
+        getattr(shared, "id", None) is not None and getattr(shared, "id", None) == getattr(message, "id", None)
+        for shared, message in zip(prefix, messages)
+    )
+
+
+def _on_thread(config: RunnableConfig, thread_id: str) -> RunnableConfig:
+    return {"configurable": {**config["configurable"], "thread_id": thread_id}}
+
+
+_checkpointers: dict[str, ForkingSqliteSaver] = {}
+_checkpointers_lock = threading.Lock()
+
+
+async def _open_checkpointer(path: str) -> ForkingSqliteSaver:
+    settings = get_settings()
+    conn = await aiosqlite.connect(path)
+    await conn.execute("PRAGMA journal_mode=WAL")
+    await conn.execute(f"PRAGMA synchronous={settings.CHECKPOINT_SYNCHRONOUS}")
+    await conn.execute(f"PRAGMA busy_timeout={settings.CHECKPOINT_BUSY_TIMEOUT_MS}")
+    await conn.execute(f"PRAGMA wal_autocheckpoint={settings.CHECKPOINT_WAL_AUTOCHECKPOINT_PAGES}")
+    serde = None
+    if settings.CHECKPOINT_BLOBS:
+        serde = BlobSerializer(
+            min_chars=settings.CHECKPOINT_BLOB_MIN_CHARS, cache_max_chars=settings.CHECKPOINT_BLOB_CACHE_MAX_CHARS
+        )
+    # AsyncSqliteSaver binds itself to the running loop, so it has to be built on the shared one
+    return ForkingSqliteSaver(conn, serde=serde)
+
+
+def get_checkpointer(path: str | None = None) -> ForkingSqliteSaver:
+    # A single connection per database file and process: every agent writes through it, so writers in one
+    # process never contend for the sqlite lock and the saver's own asyncio lock orders their writes.
+    path = path or get_settings().CHECKPOINT_STORAGE_PATH
+    with _checkpointers_lock:
+        if path not in _checkpointers:
+            _checkpointers[path] = run_sync(_open_checkpointer(path))
+        return _checkpointers[path]
+
+
+def checkpoint_timestamp(checkpoint_id: str) -> float:
+    # Checkpoint ids are UUIDv6, which carry their creation time; no need to deserialize the checkpoint
+    value = UUID(checkpoint_id).int
+    timestamp = ((value >> 80) << 12) | ((value >> 64) & 0x0FFF)
+    return (timestamp - _UUID_EPOCH_OFFSET) / 10_000_000
+
+
+@dataclass
+class PruneResult:
+    threads_deleted: int = 0
+    checkpoints_deleted: int = 0
+    writes_deleted: int = 0
+    blobs_deleted: int = 0
+
+
+def prune_checkpoints(
+    conn: sqlite3.Connection, idle_days: float | None, keep_history: bool = False, now: float | None = None
+) -> PruneResult:
+    result = PruneResult()
+    if not _has_checkpoint_tables(conn):
+        return result
+
+    conn.execute(_FORKS_TABLE)
+    if idle_days is not None:
+        cutoff = (now if now is not None else time.time()) - idle_days * 86400
+        latest = conn.execute("SELECT thread_id, MAX(checkpoint_id) FROM checkpoints GROUP BY thread_id").fetchall()
+        last_active = {thread_id: checkpoint_timestamp(checkpoint_id) for thread_id, checkpoint_id in latest}
+        parents = {}
+        for thread_id, parent_thread_id, created_at in conn.execute(
+            "SELECT thread_id, parent_thread_id, created_at FROM forks"
+        ):
+            parents[thread_id] = parent_thread_id
+            last_active[thread_id] = max(last_active.get(thread_id, 0.0), created_at)
+        # A thread is kept while it, or any fork that reads through to it, is still active
+        keep: set[str] = set()
+        for thread_id, active_at in last_active.items():
+            ancestor: str | None = thread_id if active_at >= cutoff else None
+            while ancestor is not None and ancestor not in keep:
+                keep.add(ancestor)
+                ancestor = parents.get(ancestor)
+        idle = [(thread_id,) for thread_id in last_active if thread_id not in keep]
+        before = conn.total_changes
+        conn.executemany("DELETE FROM writes WHERE thread_id = ?", idle)
+        result.writes_deleted += conn.total_changes - before
+        before = conn.total_changes
+        conn.executemany("DELETE FROM checkpoints WHERE thread_id = ?", idle)
+        result.checkpoints_deleted += conn.total_changes - before
+        conn.executemany("DELETE FROM forks WHERE thread_id = ?", idle)
+        result.threads_deleted = len(idle)
+
+    # Forks with nothing of their own whose parent is gone can no longer be read
+    while unreachable := conn.execute(
+        """
+        SELECT thread_id FROM forks
+        WHERE thread_id NOT IN (SELECT thread_id FROM checkpoints)
+        AND parent_thread_id NOT IN (SELECT thread_id FROM checkpoints)
+        AND parent_thread_id NOT IN (SELECT thread_id FROM forks)
+        """
+    ).fetchall():
+        conn.executemany("DELETE FROM forks WHERE thread_id = ?", unreachable)
+        result.threads_deleted += len(unreachable)
+
+    if not keep_history:
+        # Every checkpoint is a full snapshot of the thread, so only the latest one per thread is needed to resume,
+        # plus the ones forks were made from
+        result.checkpoints_deleted += conn.execute(
+            """
+            DELETE FROM checkpoints WHERE checkpoint_id < (
+                SELECT MAX(latest.checkpoint_id) FROM checkpoints AS latest
+                WHERE latest.thread_id = checkpoints.thread_id AND latest.checkpoint_ns = checkpoints.checkpoint_ns
+            )
+            AND checkpoint_id NOT IN (SELECT parent_checkpoint_id FROM forks)
+            """
+        ).rowcount
+        result.writes_deleted += conn.execute(
+            """
+            DELETE FROM writes WHERE NOT EXISTS (
+                SELECT 1 FROM checkpoints
+                WHERE checkpoints.thread_id = writes.thread_id
+                AND checkpoints.checkpoint_ns = writes.checkpoint_ns
+                AND checkpoints.checkpoint_id = writes.checkpoint_id
+            )
+            """
+        ).rowcount
+
+    # Last, so that it sees what the steps above deleted
+    result.blobs_deleted = collect_blobs(conn, now)
+    conn.commit()
+    return result
+
+
+def compact(conn: sqlite3.Connection) -> None:
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("VACUUM")
+
+
+def _has_checkpoint_tables(conn: sqlite3.Connection) -> bool:
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    return {"checkpoints", "writes"} <= tables
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Apply the checkpoint retention policy and compact the database.")
+    parser.add_argument("--path", default=settings.CHECKPOINT_STORAGE_PATH)
+    parser.add_argument("--idle-days", type=float, default=settings.CHECKPOINT_RETENTION_DAYS)
+    parser.add_argument("--keep-history", action="store_true", default=settings.CHECKPOINT_KEEP_HISTORY)
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.path, timeout=settings.CHECKPOINT_BUSY_TIMEOUT_MS / 1000)
+    try:
+        size_before = _database_size(conn)
+        result = prune_checkpoints(conn, idle_days=args.idle_days, keep_history=args.keep_history)
+        if not args.no_vacuum:
+            compact(conn)
+        size_after = _database_size(conn)
+    finally:
+        conn.close()
+
+    print(
+        f"Deleted {result.threads_deleted} idle threads, {result.checkpoints_deleted} checkpoints, "
+        f"{result.writes_deleted} pending writes and {result.blobs_deleted} message blobs; "
+        f"{size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB"
+    )
+
+
+def _database_size(conn: sqlite3.Connection) -> int:
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,119 @@
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from .constants import LLMModel
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=True, env_file_encoding="utf-8", extra="ignore")
 
+    # "fake" answers every agent offline with app.fake_llm.FakeChatModel, for benchmarks and load tests
+    LLM_BACKEND: Literal["openai", "fake"] = "openai"
+    FAKE_LLM_LATENCY: Literal["fixed", "uniform", "lognormal", "exponential"] = "lognormal"
+    FAKE_LLM_LATENCY_SECONDS: float = 0.5
+    FAKE_LLM_LATENCY_SPREAD: float = 0.5
+    FAKE_LLM_TOKENS_PER_SECOND: float = 50
+    FAKE_LLM_OUTPUT_TOKENS: int = 200
+    FAKE_LLM_FAILURE_RATE: float = 0.0
+    FAKE_LLM_FAILURE: Literal["rate_limit", "timeout", "server_error"] = "rate_limit"
+    FAKE_LLM_RETRY_AFTER_SECONDS: float = 1
+    FAKE_LLM_SEED: int = 0
+
     CHECKPOINT_STORAGE_PATH: str = ".data/checkpoints/checkpointer.db"
+    CHECKPOINT_SYNCHRONOUS: Literal["OFF", "NORMAL", "FULL"] = "NORMAL"
+    CHECKPOINT_BUSY_TIMEOUT_MS: int = 5000
+    CHECKPOINT_WAL_AUTOCHECKPOINT_PAGES: int = 1000
+    # langgraph's default writes a checkpoint per graph step; opt into "exit" for one per agent call, at the cost
+    # of losing the steps of a call that crashes halfway
+    CHECKPOINT_DURABILITY: Literal["sync", "async", "exit"] = "async"
+    CHECKPOINT_RETENTION_DAYS: float | None = 30
+    CHECKPOINT_KEEP_HISTORY: bool = False
+    # Opt-in: message bodies are stored once per distinct chunk, compressed, and checkpoints reference them by
+    # digest. Checkpoints written this way can't be read with it off or by older versions.
+    CHECKPOINT_BLOBS: bool = False
+    CHECKPOINT_BLOB_MIN_CHARS: int = 256
+    CHECKPOINT_BLOB_CACHE_MAX_CHARS: int = 50_000_000
+
+    # Chat messages the UI renders per page, and the shared cache of message texts they are rendered from
+    TRANSCRIPT_PAGE_SIZE: int = 20
+    TRANSCRIPT_CACHE_MAX_CHARS: int = 20_000_000
+
+    # Opt-in upper bound on the prompt sent per model call; None (the default) sends the whole thread history
+    CONTEXT_MAX_TOKENS: int | None = None
+    CONTEXT_KEEP_TURNS: int = 4
+    CONTEXT_SUMMARY_MAX_TOKENS: int = 1000
+
+    # Opt-in replay of identical completions; sampled (temperature > 0) calls bypass it unless explicitly allowed
+    RESPONSE_CACHE_ENABLED: bool = False
+    RESPONSE_CACHE_PATH: str = ".data/cache/responses.db"
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    RESPONSE_CACHE_ALLOW_NONZERO_TEMPERATURE: bool = False
+
+    METRICS_ENABLED: bool = True
+    # Optional exporters on top of the in-process registry: Prometheus textfile and a JSON-lines call trace
+    METRICS_PROMETHEUS_PATH: str | None = None
+    METRICS_PROMETHEUS_INTERVAL_SECONDS: float = 5
+    METRICS_TRACE_PATH: str | None = None
+    # Per-thread series behind `get_stats`, kept out of the exported labels; least recently used threads go first
+    METRICS_MAX_THREADS: int = 10_000
+
+    CRITIC_PANEL_TIMEOUT_SECONDS: float = 120
+
+    # Opt-in: after the first draft the generator answers with section edits, the critic then reviews the whole
+    # revised draft or only the diff
+    REVISION_MODE: bool = False
+    REVISION_CRITIC_VIEW: Literal["document", "diff"] = "document"
+
+    # Model an agent in cascade mode answers with first; replies shorter than this go to its own model instead
+    CASCADE_FAST_MODEL: LLMModel = LLMModel.GPT_4_1_MINI
+    CASCADE_MIN_CHARS: int = 200
+
+    # Opt-in: start the likely next agent call while the user reads, committed only if the user asks for it
+    SPECULATION_ENABLED: bool = False
+    SPECULATION_MAX_TOKENS_PER_SESSION: int = 50_000
+
+    # Opt-in: every model call queues per model and API key, interactive turns first, then speculative and
+    # autonomous ones. RPM/TPM limits are keyed by model name (JSON in the environment), models without one are only
+    # limited by the adaptive concurrency cap. Throttled and transiently failed calls are retried with jittered
+    # backoff, in place of the OpenAI client's own retries. Off, calls go straight to the client as before.
+    SCHEDULER_ENABLED: bool = False
+    SCHEDULER_RPM: dict[str, int] = {}
+    SCHEDULER_TPM: dict[str, int] = {}
+    SCHEDULER_MAX_CONCURRENCY: int = 16
+    SCHEDULER_MIN_CONCURRENCY: int = 1
+    SCHEDULER_MAX_RETRIES: int = 5
+    SCHEDULER_BACKOFF_SECONDS: float = 1
+    SCHEDULER_MAX_BACKOFF_SECONDS: float = 60
+
+    # Process-wide keep-alive HTTP clients shared by every session talking to the same endpoint with the same key
+    HTTP_SHARED_CLIENTS: bool = True
+    OPENAI_BASE_URL: str | None = None
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30
+    HTTP_TIMEOUT_SECONDS: float = 600
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5
+    # Used only when the optional h2 package is installed
+    HTTP2_ENABLED: bool = True
+    HTTP_CLIENT_IDLE_SECONDS: float = 600
+
+    # How long an HTTP API request may hold a session while its agent answers; a crashed worker's lease runs out
+    API_SESSION_LEASE_SECONDS: float = 900
+
+    AGENT_POOL_MAX_SIZE: int = 64
+    AGENT_POOL_TTL_SECONDS: float = 3600
+    # The UI builds the agents for the chosen models in the background, before the first message needs them
+    AGENT_PREWARM_ENABLED: bool = True
 
-    @field_validator("CHECKPOINT_STORAGE_PATH")
+    @field_validator("CHECKPOINT_STORAGE_PATH", "RESPONSE_CACHE_PATH")
     @classmethod
-    def _create_checkpoint_directory(cls, v: str) -> str:
+    def _create_parent_directory(cls, v: str) -> str:
         Path(v).parent.mkdir(parents=True, exist_ok=True)
         return v
 
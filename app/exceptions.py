@@ -1,2 +1,6 @@
 class ManualOrchestratorException(Exception):
     pass
+
+
+class SessionConflictException(Exception):
+    pass
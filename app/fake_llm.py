@@ -0,0 +1,246 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Iterator, Literal
+
+import httpx
+from langchain_core.caches import BaseCache
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.ai import UsageMetadata
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from openai import APIError, APITimeoutError, InternalServerError, RateLimitError
+from pydantic import PrivateAttr
+
+from .config import get_settings
+
+LatencyDistribution = Literal["fixed", "uniform", "lognormal", "exponential"]
+FailureKind = Literal["rate_limit", "timeout", "server_error"]
+
+_WORDS = [
+    "the",
+    "draft",
+    "plan",
+    "should",
+    "cover",
+    "scope",
+    "risks",
+    "owners",
+    "milestones",
+    "budget",
+    "metrics",
+    "and",
+    "a",
+    "short",
+    "summary",
+    "of",
+    "open",
+    "questions",
+    "for",
+    "review",
+    "next",
+    "steps",
+    "include",
+    "tests",
+    "rollout",
+    "monitoring",
+    "data",
+    "sources",
+    "constraints",
+    "assumptions",
+    "examples",
+]
+_REQUEST = httpx.Request("POST", "https://fake.invalid/v1/chat/completions")
+
+
+@dataclass
+class _Call:
+    words: list[str]
+    first_token_delay: float
+    token_delay: float
+    usage: UsageMetadata
+    failure: APIError | None
+
+
+class FakeChatModel(BaseChatModel):
+    # Offline stand-in for a provider model, for benchmarks and load tests. Answers are filler text; latency, output
+    # length and failures are drawn from a generator seeded by the prompt, so the same run replays identically.
+    model_name: str = "fake"
+    latency: LatencyDistribution = "lognormal"
+    # Time to first token: the value itself for "fixed", the median for "lognormal", the mean otherwise
+    latency_seconds: float = 0.5
+    # Relative half-width for "uniform", sigma for "lognormal"
+    latency_spread: float = 0.5
+    # 0 emits the whole answer at once
+    tokens_per_second: float = 50.0
+    output_tokens: int = 200
+    failure_rate: float = 0.0
+    failure: FailureKind = "rate_limit"
+    retry_after_seconds: float = 1.0
+    seed: int = 0
+    # Never served from a global LLM cache, which would skip the simulated latency and failures
+    cache: BaseCache | bool | None = False
+    # Attempts are counted for the most recently seen prompts only, so a long load test doesn't grow without bound
+    max_tracked_prompts: int = 10_000
+    _attempts: OrderedDict[str, int] = PrivateAttr(default_factory=OrderedDict)
+    _attempts_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "forkflux-fake"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model_name": self.model_name, "seed": self.seed}
+
+    def _plan(self, messages: list[BaseMessage]) -> _Call:
+        digest = hashlib.sha256(
+            "\x00".join([self.model_name, *(message.text for message in messages)]).encode()
+        ).hexdigest()
+        # A retry of the same prompt is a new draw, so injected failures are not permanent
+        with self._attempts_lock:
+            attempt = self._attempts.pop(digest, 0) + 1
+            self._attempts[digest] = attempt
+            while len(self._attempts) > self.max_tracked_prompts:
+                self._attempts.popitem(last=False)
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+
+        first_token_delay = self._sample_latency(rng)
+        failure = self._failure() if rng.random() < self.failure_rate else None
+        count = max(1, round(self.output_tokens * rng.uniform(0.5, 1.5)))
+        words = [rng.choice(_WORDS) for _ in range(count)]
+        input_tokens = count_tokens_approximately(messages)
+        return _Call(
+            words=words,
+            first_token_delay=first_token_delay,
+            token_delay=1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0,
+            usage=UsageMetadata(input_tokens=input_tokens, output_tokens=count, total_tokens=input_tokens + count),
+            failure=failure,
+        )
+
+    def _sample_latency(self, rng: random.Random) -> float:
+        if self.latency == "uniform":
+            spread = self.latency_seconds * self.latency_spread
+            return max(0.0, rng.uniform(self.latency_seconds - spread, self.latency_seconds + spread))
+        if self.latency == "lognormal":
+            return self.latency_seconds * rng.lognormvariate(0, self.latency_spread)
+        if self.latency == "exponential":
+            return rng.expovariate(1 / self.latency_seconds) if self.latency_seconds > 0 else 0.0
+        return self.latency_seconds
+
+    def _failure(self) -> APIError:
+        # The same exceptions the OpenAI client raises, so retry and error handling paths see the real thing
+        if self.failure == "timeout":
+            return APITimeoutError(request=_REQUEST)
+        if self.failure == "server_error":
+            response = httpx.Response(500, request=_REQUEST)
+            return InternalServerError("Injected server error", response=response, body=None)
+        response = httpx.Response(429, request=_REQUEST, headers={"retry-after": f"{self.retry_after_seconds:g}"})
+        return RateLimitError("Injected rate limit", response=response, body=None)
+
+    def _result(self, call: _Call) -> ChatResult:
+        message = AIMessage(
+            content=" ".join(call.words),
+            usage_metadata=call.usage,
+            response_metadata={"model_name": self.model_name, "finish_reason": "stop"},
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, call: _Call) -> Iterator[ChatGenerationChunk]:
+        for i, word in enumerate(call.words):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+        yield ChatGenerationChunk(
+            message=AIMessageChunk(
+                content="",
+                usage_metadata=call.usage,
+                response_metadata={"model_name": self.model_name, "finish_reason": "stop"},
+                chunk_position="last",
+            )
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        call = self._plan(messages)
+        time.sleep(call.first_token_delay)
+        if call.failure is not None:
+            raise call.failure
+        time.sleep(call.token_delay * len(call.words))
+        return self._result(call)
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        call = self._plan(messages)
+        await asyncio.sleep(call.first_token_delay)
+        if call.failure is not None:
+            raise call.failure
+        await asyncio.sleep(call.token_delay * len(call.words))
+        return self._result(call)
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        call = self._plan(messages)
+        time.sleep(call.first_token_delay)
+        if call.failure is not None:
+            raise call.failure
+        for i, chunk in enumerate(self._chunks(call)):
+            if i and chunk.message.content:
+                time.sleep(call.token_delay)
+            if run_manager and chunk.message.content:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        call = self._plan(messages)
+        await asyncio.sleep(call.first_token_delay)
+        if call.failure is not None:
+            raise call.failure
+        for i, chunk in enumerate(self._chunks(call)):
+            if i and chunk.message.content:
+                await asyncio.sleep(call.token_delay)
+            if run_manager and chunk.message.content:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+def fake_chat_model(model: str) -> FakeChatModel:
+    settings = get_settings()
+    return FakeChatModel(
+        model_name=model,
+        latency=settings.FAKE_LLM_LATENCY,
+        latency_seconds=settings.FAKE_LLM_LATENCY_SECONDS,
+        latency_spread=settings.FAKE_LLM_LATENCY_SPREAD,
+        tokens_per_second=settings.FAKE_LLM_TOKENS_PER_SECOND,
+        output_tokens=settings.FAKE_LLM_OUTPUT_TOKENS,
+        failure_rate=settings.FAKE_LLM_FAILURE_RATE,
+        failure=settings.FAKE_LLM_FAILURE,
+        retry_after_seconds=settings.FAKE_LLM_RETRY_AFTER_SECONDS,
+        seed=settings.FAKE_LLM_SEED,
+    )
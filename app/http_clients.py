@@ -0,0 +1,150 @@
+import asyncio
+import atexit
+import hashlib
+import importlib.util
+import threading
+import time
+import weakref
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, NamedTuple
+
+import httpx
+
+from .config import get_settings
+from .runtime import get_event_loop
+
+
+def api_key_fingerprint(api_key: str) -> str:
+    # Raw keys never end up in the pools, only a digest to tell tenants apart
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class ClientKey(NamedTuple):
+    provider: str
+    base_url: str | None
+    api_key_fingerprint: str
+
+
+@dataclass
+class _Entry:
+    client: httpx.Client
+    async_client: httpx.AsyncClient
+    last_used: float
+    # Live objects (agent sessions) holding the clients; an entry is only closed once nothing holds it
+    leases: int = 0
+    finalizers: "list[weakref.finalize[..., object]]" = field(default_factory=list)
+
+
+class HttpClientRegistry:
+    # One keep-alive connection pool per provider endpoint and API key for the whole process, instead of one per
+    # model object. Clients are leased to their holders and closed once unused for `idle_seconds`, by a sweep on
+    # the shared loop that runs while any client is unleased, so an idle process closes them too.
+
+    def __init__(
+        self,
+        limits: httpx.Limits,
+        timeout: httpx.Timeout,
+        http2: bool,
+        idle_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.limits = limits
+        self.timeout = timeout
+        # HTTP/2 needs the optional `h2` package
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        self.idle_seconds = idle_seconds
+        self._clock = clock
+        self._entries: dict[ClientKey, _Entry] = {}
+        self._lock = threading.Lock()
+        self._sweep_scheduled = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def acquire(
+        self, holder: object, provider: str, base_url: str | None, api_key: str
+    ) -> tuple[httpx.Client, httpx.AsyncClient]:
+        key = ClientKey(provider, base_url, api_key_fingerprint(api_key))
+        with self._lock:
+            self._close_idle()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(
+                    client=httpx.Client(limits=self.limits, timeout=self.timeout, http2=self.http2),
+                    async_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout, http2=self.http2),
+                    last_used=self._clock(),
+                )
+            entry.leases += 1
+            entry.last_used = self._clock()
+            entry.finalizers.append(weakref.finalize(holder, self._release, key))
+        return entry.client, entry.async_client
+
+    def close_idle(self) -> int:
+        with self._lock:
+            return self._close_idle()
+
+    def close(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                for finalizer in entry.finalizers:
+                    finalizer.detach()
+                _close(entry)
+            self._entries.clear()
+
+    def _release(self, key: ClientKey) -> None:
+        with self._lock:
+            if (entry := self._entries.get(key)) is not None:
+                entry.leases -= 1
+                entry.last_used = self._clock()
+                # Including the one being called
+                entry.finalizers = [finalizer for finalizer in entry.finalizers if finalizer.alive]
+                if not entry.leases:
+                    self._schedule_sweep()
+
+    def _schedule_sweep(self) -> None:
+        # Under the lock; one pending sweep at a time
+        loop = get_event_loop()
+        if self._sweep_scheduled or not loop.is_running():
+            return
+        self._sweep_scheduled = True
+        loop.call_soon_threadsafe(loop.call_later, self.idle_seconds, self._sweep)
+
+    def _sweep(self) -> None:
+        with self._lock:
+            self._sweep_scheduled = False
+            self._close_idle()
+            if any(not entry.leases for entry in self._entries.values()):
+                self._schedule_sweep()
+
+    def _close_idle(self) -> int:
+        deadline = self._clock() - self.idle_seconds
+        idle = [key for key, entry in self._entries.items() if not entry.leases and entry.last_used <= deadline]
+        for key in idle:
+            _close(self._entries.pop(key))
+        return len(idle)
+
+
+def _close(entry: _Entry) -> None:
+    entry.client.close()
+    # The async client's connections belong to the shared loop, so it is closed there
+    loop = get_event_loop()
+    if loop.is_running():
+        asyncio.run_coroutine_threadsafe(entry.async_client.aclose(), loop)
+
+
+@lru_cache
+def get_http_clients() -> HttpClientRegistry:
+    settings = get_settings()
+    registry = HttpClientRegistry(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+        http2=settings.HTTP2_ENABLED,
+        idle_seconds=settings.HTTP_CLIENT_IDLE_SECONDS,
+    )
+    atexit.register(registry.close)
+    return registry
@@ -1,21 +1,36 @@
 import uuid
+from typing import TYPE_CHECKING
 
 import streamlit as st
 
-from app.constants import LLM_AVAILABLE_MODELS, Agent
+from app.config import get_settings
+from app.constants import LLM_AVAILABLE_MODELS, Agent, LLMModel
 from app.exceptions import ManualOrchestratorException
-from app.orchestrator import ManualOrchestrator
 from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+from app.transcript import TranscriptEntry, load, reference
+from app.warmup import prewarm
 
+if TYPE_CHECKING:
+    from app.orchestrator import ManualOrchestrator
 
-@st.cache_resource
-def get_orchestrator():
-    return ManualOrchestrator()
+settings = get_settings()
+
+
+def get_orchestrator() -> "ManualOrchestrator":
+    # Imported on first use, which app.warmup has usually done by then: the page renders without waiting for the
+    # LLM and checkpoint stacks
+    if "orchestrator" not in st.session_state:
+        from app.orchestrator import ManualOrchestrator
+
+        st.session_state.orchestrator = ManualOrchestrator()
+    return st.session_state.orchestrator
 
 
 def initialize_session_state() -> None:
-    if "messages" not in st.session_state:
-        st.session_state.messages = []
+    # References into the checkpointer rather than the messages themselves; see app/transcript.py
+    if "transcript" not in st.session_state:
+        st.session_state.transcript = []
+        st.session_state.transcript_window = settings.TRANSCRIPT_PAGE_SIZE
     if "agents" not in st.session_state:
         st.session_state.agents = {
             Agent.GENERATOR: {"thread_id": str(uuid.uuid4())},
@@ -27,60 +42,172 @@ def initialize_session_state() -> None:
         st.session_state.main_task_submitted = False
     if "current_agent" not in st.session_state:
         st.session_state.current_agent = Agent.GENERATOR
+    if "pending_redirect" not in st.session_state:
+        st.session_state.pending_redirect = False
+    if "branch" not in st.session_state:
+        st.session_state.branch = "Main"
+        st.session_state.branches = {}
 
 
 initialize_session_state()
-orchestrator = get_orchestrator()
 
 
 def redirect_response() -> None:
-    if not st.session_state.messages:
-        return
-
-    last_message = st.session_state.messages[-1]
-    last_agent_role = last_message["role"]
-    last_content = last_message["content"]
-    next_agent = Agent.CRITIC if last_agent_role == Agent.GENERATOR else Agent.GENERATOR
-
-    try:
-        thread_id = st.session_state.agents[next_agent]["thread_id"]
-        response = orchestrator.talk_to(
-            agent_name=next_agent, input_text=last_content, thread_id=thread_id, context_from=last_agent_role
-        )
-        st.session_state.messages.append({"role": next_agent, "content": response})
-        st.session_state.current_agent = next_agent
-    except ManualOrchestratorException as e:
-        st.session_state.messages.append({"role": "assistant", "content": f"Error from {next_agent.value}: {str(e)}"})
+    # The reply is streamed from the script body: widgets rendered from a callback end up above the chat.
+    if st.session_state.transcript:
+        st.session_state.pending_redirect = True
+
+
+def show_earlier() -> None:
+    st.session_state.transcript_window += settings.TRANSCRIPT_PAGE_SIZE
+
+
+def save_branch() -> None:
+    st.session_state.branches[st.session_state.branch] = {
+        "agents": st.session_state.agents,
+        "transcript": st.session_state.transcript,
+        "current_agent": st.session_state.current_agent,
+    }
+
+
+def load_branch(name: str) -> None:
+    st.session_state.branch = name
+    for key, value in st.session_state.branches[name].items():
+        st.session_state[key] = value
+
+
+def fork_conversation() -> None:
+    # Both agents' threads are forked at their latest turn, so the new branch starts with the same memory
+    save_branch()
+    orchestrator = get_orchestrator()
+    orchestrator.discard_speculation()
+    agents = {}
+    for agent_name, agent in st.session_state.agents.items():
+        try:
+            thread_id = orchestrator.fork(agent["thread_id"])
+        except ManualOrchestratorException:
+            # The agent hasn't replied in this branch yet, there is nothing to share
+            thread_id = str(uuid.uuid4())
+        agents[agent_name] = {"thread_id": thread_id}
+    name = f"Branch {len(st.session_state.branches) + 1}"
+    st.session_state.branches[name] = {
+        "agents": agents,
+        "transcript": list(st.session_state.transcript),
+        "current_agent": st.session_state.current_agent,
+    }
+    load_branch(name)
+    st.session_state.selected_branch = name
+
+
+def switch_branch() -> None:
+    save_branch()
+    get_orchestrator().discard_speculation()
+    load_branch(st.session_state.selected_branch)
+
+
+def stream_reply(agent_name: Agent, input_text: str, context_from: str | None = None) -> None:
+    orchestrator = get_orchestrator()
+    orchestrator.revision_mode = st.session_state.revision_mode
+    thread_id = st.session_state.agents[agent_name]["thread_id"]
+    with st.chat_message(agent_name.value):
+        try:
+            response = st.write_stream(
+                orchestrator.stream_to(
+                    agent_name=agent_name, input_text=input_text, thread_id=thread_id, context_from=context_from
+                )
+            )
+        except ManualOrchestratorException as e:
+            error = f"Error from {agent_name.value}: {str(e)}" if context_from is not None else str(e)
+            st.session_state.transcript.append(TranscriptEntry(role="assistant", text=error))
+            return
+    st.session_state.transcript.append(reference(agent_name.value, thread_id, str(response)))
+    st.session_state.current_agent = agent_name
+    # Get the redirect going while the user reads; a no-op unless speculation is enabled
+    next_agent = Agent.CRITIC if agent_name == Agent.GENERATOR else Agent.GENERATOR
+    orchestrator.speculate(
+        next_agent, str(response), thread_id=st.session_state.agents[next_agent]["thread_id"], context_from=agent_name
+    )
 
 
 with st.sidebar:
     st.title("Configuration")
-    agent_generator = st.selectbox(
-        "Choose the Generator model",
-        LLM_AVAILABLE_MODELS,
+    agent_generator = LLMModel(
+        st.selectbox(
+            "Choose the Generator model",
+            LLM_AVAILABLE_MODELS,
+            disabled=st.session_state.main_task_submitted,
+            help="You can only choose the model before starting the chat.",
+        )
+    )
+    agent_critic = LLMModel(
+        st.selectbox(
+            "Choose the Critic model",
+            LLM_AVAILABLE_MODELS,
+            disabled=st.session_state.main_task_submitted,
+            help="You can only choose the model before starting the chat.",
+        )
+    )
+    temperature = st.slider(
+        "Temperature",
+        min_value=0.0,
+        max_value=1.0,
+        value=0.7,
+        step=0.1,
         disabled=st.session_state.main_task_submitted,
-        help="You can only choose the model before starting the chat.",
+        help="At 0 the agents answer the same prompt the same way, so the response cache can replay their answers.",
     )
-    agent_critic = st.selectbox(
-        "Choose the Critic model",
-        LLM_AVAILABLE_MODELS,
+    fast_model = settings.CASCADE_FAST_MODEL
+    cascade_critic = st.checkbox(
+        f"Let {fast_model.value} try the critiques first",
         disabled=st.session_state.main_task_submitted,
-        help="You can only choose the model before starting the chat.",
+        help="The Critic model only answers when the fast critique is too short, truncated or flags the request.",
+    )
+    st.checkbox(
+        "Revise with edits",
+        value=settings.REVISION_MODE,
+        key="revision_mode",
+        help="After the first draft the Generator sends only the sections it changes, so long drafts come back faster.",
     )
     openai_api_key = st.text_input("OpenAI API Key", key="chatbot_api_key", type="password")
     "[Get an OpenAI API key](https://platform.openai.com/account/api-keys)"
+    if not st.session_state.main_task_submitted:
+        # Builds the chosen agents while the user types the main task; a no-op once they are built
+        prewarm(
+            agent_generator, agent_critic, openai_api_key or None, fast_model if cascade_critic else None, temperature
+        )
+
+    if st.session_state.transcript:
+        st.divider()
+        st.button(
+            "Fork conversation",
+            on_click=fork_conversation,
+            help="Continue in a new branch from here, e.g. to try another critique. The current branch is kept.",
+        )
+        if st.session_state.branches:
+            st.selectbox("Branch", list(st.session_state.branches), key="selected_branch", on_change=switch_branch)
 
 st.set_page_config(page_title="Agentic-Critic System", page_icon="🤖")
 st.title("💬 Agentic-Critic: Your AI-team")
 st.caption("🚀 Iteratively improving ideas with collaborating AI agents")
 
-for msg in st.session_state.messages:
-    role_str = msg["role"].value if isinstance(msg["role"], Agent) else msg["role"]
-    with st.chat_message(role_str):
-        st.markdown(msg["content"])
+# Only the latest page is loaded and rendered, so a rerun costs the same however long the conversation is
+transcript = st.session_state.transcript
+if hidden := max(len(transcript) - st.session_state.transcript_window, 0):
+    st.button(f"Show earlier messages ({hidden} hidden)", on_click=show_earlier)
+visible = transcript[hidden:]
+for entry, text in zip(visible, load(visible)):
+    with st.chat_message(entry.role):
+        st.markdown(text)
+
+if st.session_state.pending_redirect:
+    st.session_state.pending_redirect = False
+    last_entry = transcript[-1]
+    next_agent = Agent.CRITIC if last_entry.role == Agent.GENERATOR else Agent.GENERATOR
+    stream_reply(next_agent, load([last_entry])[0], context_from=last_entry.role)
+    st.rerun()
 
-if st.session_state.messages:
-    last_message_role = st.session_state.messages[-1]["role"]
+if transcript:
+    last_message_role = transcript[-1].role
     if last_message_role in [Agent.GENERATOR, Agent.CRITIC]:
         next_agent_display = "Critic" if last_message_role == Agent.GENERATOR else "Generator"
         st.button(f"Redirect response to {next_agent_display}", on_click=redirect_response)
@@ -93,29 +220,27 @@ if prompt := st.chat_input("What is the main task?"):
     st.session_state.main_task_submitted = True
 
     if not st.session_state.is_main_task_set:
+        orchestrator = get_orchestrator()
         orchestrator.set_llm_api_key(openai_api_key)
         orchestrator.set_main_task(prompt)
         orchestrator.add_agent(
             name=Agent.GENERATOR,
             system_prompt=GENERATOR_SYSTEM_PROMPT,
             model=agent_generator,
+            temperature=temperature,
         )
         orchestrator.add_agent(
             name=Agent.CRITIC,
             system_prompt=CRITIC_SYSTEM_PROMPT,
             model=agent_critic,
+            fast_model=fast_model if cascade_critic else None,
+            temperature=temperature,
         )
         st.session_state.is_main_task_set = True
 
-    st.session_state.messages.append({"role": "user", "content": prompt})
-
-    try:
-        thread_id = st.session_state.agents[st.session_state.current_agent]["thread_id"]
-        response = orchestrator.talk_to(
-            agent_name=st.session_state.current_agent, input_text=prompt, thread_id=thread_id
-        )
-        st.session_state.messages.append({"role": st.session_state.current_agent, "content": response})
-    except ManualOrchestratorException as e:
-        st.session_state.messages.append({"role": "assistant", "content": str(e)})
+    st.session_state.transcript.append(TranscriptEntry(role="user", text=prompt))
+    with st.chat_message("user"):
+        st.markdown(prompt)
 
+    stream_reply(st.session_state.current_agent, prompt)
     st.rerun()
@@ -0,0 +1,335 @@
+import atexit
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from enum import Enum
+from functools import lru_cache
+from typing import Any, Iterable, Protocol
+
+from .config import get_settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 40.0, 60.0, 120.0, math.inf)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def label_value(value: Any) -> str:
+    # Agent names are often str enums, whose str() is the member name rather than the value
+    return value.value if isinstance(value, Enum) else str(value)
+
+
+def make_labels(**labels: Any) -> Labels:
+    return tuple(sorted((key, label_value(value)) for key, value in labels.items()))
+
+
+@dataclass
+class Histogram:
+    buckets: tuple[float, ...] = LATENCY_BUCKETS
+    counts: list[int] = field(default_factory=list)
+    count: int = 0
+    sum: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.counts = self.counts or [0] * len(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def merge(self, other: "Histogram") -> None:
+        self.count += other.count
+        self.sum += other.sum
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def quantile(self, q: float) -> float:
+        # Same estimate as Prometheus' histogram_quantile: linear interpolation inside the bucket
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen, lower = 0, 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if seen + count >= rank and count:
+                if math.isinf(bound):
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+
+class MetricsSink(Protocol):
+    def record(self, event: dict[str, Any]) -> None: ...
+
+    def flush(self, registry: "MetricsRegistry") -> None: ...
+
+
+class InMemorySink:
+    def __init__(self) -> None:
+        self.events: list[dict[str, Any]] = []
+
+    def record(self, event: dict[str, Any]) -> None:
+        self.events.append(event)
+
+    def flush(self, registry: "MetricsRegistry") -> None:
+        pass
+
+
+class JsonLinesSink:
+    # One line per model call, a trace to replay or load into a notebook. Lines are buffered and appended by a
+    # writer thread every `interval` seconds, so recording a call never opens the file on the event loop.
+    def __init__(self, path: str, interval: float = 1.0, max_buffered: int = 1000) -> None:
+        self.path = path
+        self.interval = interval
+        self.max_buffered = max_buffered
+        self._lines: list[str] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._run, name="forkflux-metrics-trace", daemon=True).start()
+        atexit.register(self.close)
+
+    def record(self, event: dict[str, Any]) -> None:
+        line = json.dumps(event, default=str)
+        with self._lock:
+            self._lines.append(line)
+            if len(self._lines) >= self.max_buffered:
+                self._wake.set()
+
+    def flush(self, registry: "MetricsRegistry") -> None:
+        pass
+
+    def close(self) -> None:
+        self._write()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._write()
+
+    def _write(self) -> None:
+        # Taken before the buffer is swapped, so batches land in the order they were recorded
+        with self._write_lock:
+            with self._lock:
+                lines, self._lines = self._lines, []
+            if lines:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(line + "\n" for line in lines))
+
+
+class PrometheusFileSink:
+    # Text exposition format, for node_exporter's textfile collector. Rewritten atomically by the registry's
+    # flusher thread, never by the call being recorded.
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def record(self, event: dict[str, Any]) -> None:
+        pass
+
+    def flush(self, registry: "MetricsRegistry") -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, encoding="utf-8") as f:
+            f.write(registry.render_prometheus())
+        os.replace(f.name, self.path)
+
+
+class MetricsRegistry:
+    # Exported series are labelled by what is bounded (agent, model, ...). A `thread` passed to `inc`/`observe`
+    # records the same value in that thread's own series instead, which only `thread=` queries read; the least
+    # recently used threads are dropped past `max_threads`. Sinks are flushed every `flush_interval` seconds by a
+    # background thread and at exit, off the path of the calls being recorded.
+
+    def __init__(
+        self,
+        sinks: Iterable[MetricsSink] = (),
+        prefix: str = "forkflux",
+        max_threads: int = 10_000,
+        flush_interval: float = 5.0,
+    ) -> None:
+        self.sinks = list(sinks)
+        self.prefix = prefix
+        self.max_threads = max_threads
+        self.counters: dict[str, dict[Labels, float]] = {}
+        self.histograms: dict[str, dict[Labels, Histogram]] = {}
+        self.threads: OrderedDict[str, MetricsRegistry] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.sinks:
+            ref = weakref.ref(self)
+            threading.Thread(
+                target=_flush_every, args=(ref, flush_interval), name="forkflux-metrics-flush", daemon=True
+            ).start()
+            atexit.register(_flush, ref)
+
+    def inc(self, name: str, labels: Labels, value: float = 1, thread: str | None = None) -> None:
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0) + value
+        if thread is not None:
+            self._thread(thread).inc(name, labels, value)
+
+    def observe(self, name: str, labels: Labels, value: float, thread: str | None = None) -> None:
+        with self._lock:
+            self.histograms.setdefault(name, {}).setdefault(labels, Histogram()).observe(value)
+        if thread is not None:
+            self._thread(thread).observe(name, labels, value)
+
+    def _thread(self, thread: str) -> "MetricsRegistry":
+        with self._lock:
+            if thread not in self.threads:
+                self.threads[thread] = MetricsRegistry(prefix=self.prefix)
+                while len(self.threads) > self.max_threads:
+                    self.threads.popitem(last=False)
+            self.threads.move_to_end(thread)
+            return self.threads[thread]
+
+    def _thread_registries(self, threads: Any) -> list["MetricsRegistry"]:
+        threads = set(threads) if isinstance(threads, (set, frozenset, list, tuple)) else {threads}
+        with self._lock:
+            return [registry for thread, registry in self.threads.items() if thread in threads]
+
+    def record(self, event: dict[str, Any]) -> None:
+        for sink in self.sinks:
+            sink.record(event)
+
+    def flush(self) -> None:
+        for sink in self.sinks:
+            try:
+                sink.flush(self)
+            except OSError:
+                logger.warning("Flushing metrics to %s failed", type(sink).__name__, exc_info=True)
+
+    def counter_total(self, name: str, **match: Any) -> float:
+        if "thread" in match:
+            threads = match.pop("thread")
+            return sum(registry.counter_total(name, **match) for registry in self._thread_registries(threads))
+        with self._lock:
+            return sum(value for labels, value in self.counters.get(name, {}).items() if _matches(labels, match))
+
+    def histogram_total(self, name: str, **match: Any) -> Histogram:
+        total = Histogram()
+        if "thread" in match:
+            threads = match.pop("thread")
+            for registry in self._thread_registries(threads):
+                total.merge(registry.histogram_total(name, **match))
+            return total
+        with self._lock:
+            for labels, histogram in self.histograms.get(name, {}).items():
+                if _matches(labels, match):
+                    total.merge(histogram)
+        return total
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.counters.items()):
+                lines.append(f"# TYPE {self.prefix}_{name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{self.prefix}_{name}{_format_labels(labels)} {value}")
+            for name, histograms in sorted(self.histograms.items()):
+                lines.append(f"# TYPE {self.prefix}_{name} histogram")
+                for labels, histogram in histograms.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if math.isinf(bound) else repr(bound)
+                        lines.append(
+                            f"{self.prefix}_{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}"
+                        )
+                    lines.append(f"{self.prefix}_{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{self.prefix}_{name}_count{_format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _flush(ref: "weakref.ref[MetricsRegistry]") -> bool:
+    if (registry := ref()) is None:
+        return False
+    registry.flush()
+    return True
+
+
+def _flush_every(ref: "weakref.ref[MetricsRegistry]", interval: float) -> None:
+    # Holds the registry only while flushing, so the thread ends once the registry is dropped
+    while True:
+        time.sleep(interval)
+        if not _flush(ref):
+            return
+
+
+def _matches(labels: Labels, match: dict[str, Any]) -> bool:
+    values = dict(labels)
+    for key, expected in match.items():
+        if isinstance(expected, (set, frozenset, list, tuple)):
+            if values.get(key) not in expected:
+                return False
+        elif values.get(key) != expected:
+            return False
+    return True
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+@dataclass
+class AgentStats:
+    calls: int = 0
+    errors: int = 0
+    latency_mean: float = 0.0
+    latency_p95: float = 0.0
+    ttft_mean: float | None = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    response_cache_hits: int = 0
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+
+def agent_stats(registry: MetricsRegistry, **match: Any) -> AgentStats:
+    latency = registry.histogram_total("model_call_seconds", **match)
+    ttft = registry.histogram_total("time_to_first_token_seconds", **match)
+    return AgentStats(
+        calls=latency.count + int(registry.counter_total("model_call_errors_total", **match)),
+        errors=int(registry.counter_total("model_call_errors_total", **match)),
+        latency_mean=latency.sum / latency.count if latency.count else 0.0,
+        latency_p95=latency.quantile(0.95),
+        ttft_mean=ttft.sum / ttft.count if ttft.count else None,
+        input_tokens=int(registry.counter_total("input_tokens_total", **match)),
+        output_tokens=int(registry.counter_total("output_tokens_total", **match)),
+        cached_tokens=int(registry.counter_total("cached_input_tokens_total", **match)),
+        response_cache_hits=int(registry.counter_total("response_cache_hits_total", **match)),
+    )
+
+
+@lru_cache
+def get_metrics() -> MetricsRegistry:
+    settings = get_settings()
+    sinks: list[MetricsSink] = []
+    if settings.METRICS_PROMETHEUS_PATH:
+        sinks.append(PrometheusFileSink(settings.METRICS_PROMETHEUS_PATH))
+    if settings.METRICS_TRACE_PATH:
+        sinks.append(JsonLinesSink(settings.METRICS_TRACE_PATH))
+    return MetricsRegistry(
+        sinks, max_threads=settings.METRICS_MAX_THREADS, flush_interval=settings.METRICS_PROMETHEUS_INTERVAL_SECONDS
+    )
@@ -1,13 +1,29 @@
+import asyncio
 import logging
 import sys
-from typing import Any
+import time
+from itertools import count
+from typing import Any, Awaitable, Callable, Mapping, Sequence
 
 from langchain.agents.middleware import AgentMiddleware
-from langchain.agents.middleware.types import ResponseT
-from langchain.messages import AIMessage
+from langchain.agents.middleware.types import ModelRequest, ModelResponse, ResponseT
+from langchain.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.exceptions import LangChainException
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.config import get_config
+from openai import APIError, RateLimitError
 
+from .cache import ResponseCache, cache_key
+from .cascade import CascadeTier, EscalationGate
+from .metrics import MetricsRegistry, label_value, make_labels
+from .prompts import CONTEXT_SUMMARY_PROMPT
+from .scheduler import RETRYABLE_ERRORS, ModelLimiter, backoff, call_priority
 from .state import AgentSessionState
 
+Summarizer = Callable[[str | None, Sequence[BaseMessage], int], str]
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 handler = logging.StreamHandler(sys.stdout)
@@ -16,6 +32,11 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 
+def model_name(model: Any, default: str) -> str:
+    # The model actually called, which is not the agent's own one when a middleware swapped it in
+    return getattr(model, "model_name", None) or default
+
+
 class LoggingMiddleware(AgentMiddleware[AgentSessionState[ResponseT], Any]):
     def before_model(self, state: AgentSessionState[ResponseT], runtime: Any) -> None:
         logger.info(f"Agent {state['agent_name']} is about to call model with {len(state['messages'])} messages")
@@ -25,3 +46,348 @@ class LoggingMiddleware(AgentMiddleware[AgentSessionState[ResponseT], Any]):
         if isinstance(state["messages"][-1], AIMessage):
             logger.info(f"Agent {state['agent_name']} usage data: {state['messages'][-1].usage_metadata}")
         return None
+
+
+def summarize_locally(previous: str | None, messages: Sequence[BaseMessage], max_tokens: int) -> str:
+    # Extractive and free: one clipped line per folded message, oldest lines dropped once over budget
+    lines = previous.splitlines() if previous else []
+    for message in messages:
+        text = " ".join(message.text.split())
+        if "# Response from another LLM:" in text:
+            # Drop the CONTEXT_WRAPPER_PROMPT header, the main task is kept separately anyway
+            text = text.split("# Response from another LLM:", 1)[1].split("# Your task:", 1)[0].strip()
+        role = "User" if isinstance(message, HumanMessage) else "Assistant"
+        lines.append(f"- {role}: {text[:300]}{'…' if len(text) > 300 else ''}")
+    while len(lines) > 1 and count_tokens_approximately([HumanMessage("\n".join(lines))]) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ContextBudgetMiddleware(AgentMiddleware[AgentSessionState[ResponseT], Any]):
+    # Keeps what is sent to the model under `max_tokens`: the system prompt, the main task, a rolling summary of
+    # folded turns and the latest `keep_turns` turns verbatim. The full history stays in the checkpoint.
+
+    def __init__(
+        self,
+        max_tokens: int,
+        keep_turns: int = 4,
+        summary_max_tokens: int = 1000,
+        reserved_tokens: int = 0,
+        summarizer: Summarizer = summarize_locally,
+    ) -> None:
+        super().__init__()
+        self.max_tokens = max_tokens
+        self.keep_turns = keep_turns
+        self.summary_max_tokens = summary_max_tokens
+        self.reserved_tokens = reserved_tokens
+        self.summarizer = summarizer
+
+    def before_model(self, state: AgentSessionState[ResponseT], runtime: Any) -> dict[str, Any] | None:
+        messages = state["messages"]
+        start = state.get("summarized_through", 0)
+        turn_starts = [i for i, message in enumerate(messages) if i >= start and isinstance(message, HumanMessage)]
+        if not turn_starts:
+            return None
+
+        keep_from = turn_starts[-self.keep_turns] if len(turn_starts) > self.keep_turns else start
+        budget = self.max_tokens - self.reserved_tokens - self.summary_max_tokens
+        budget -= count_tokens_approximately([HumanMessage(state.get("main_task", ""))])
+        while keep_from < turn_starts[-1] and count_tokens_approximately(messages[keep_from:]) > budget:
+            keep_from = next(i for i in turn_starts if i > keep_from)
+
+        update: dict[str, Any] = {}
+        if keep_from > start:
+            update["context_summary"] = self.summarizer(
+                state.get("context_summary"), messages[start:keep_from], self.summary_max_tokens
+            )
+            update["summarized_through"] = keep_from
+        update["context_tokens"] = self.reserved_tokens + count_tokens_approximately(
+            self._context_messages({**state, **update}, messages)
+        )
+        logger.info(f"Agent {state['agent_name']} context is ~{update['context_tokens']} tokens")
+        return update
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        return handler(request.override(messages=self._context_messages(request.state, request.messages)))
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        return await handler(request.override(messages=self._context_messages(request.state, request.messages)))
+
+    def _context_messages(self, state: Any, messages: list[Any]) -> list[Any]:
+        start = state.get("summarized_through", 0)
+        if not start:
+            return messages
+        summary = CONTEXT_SUMMARY_PROMPT.format(main_task=state.get("main_task", ""), summary=state["context_summary"])
+        return [HumanMessage(summary), *messages[start:]]
+
+
+class ResponseCacheMiddleware(AgentMiddleware[AgentSessionState[ResponseT], Any]):
+    def __init__(
+        self, cache: ResponseCache, model: str, temperature: float, allow_nonzero_temperature: bool = False
+    ) -> None:
+        super().__init__()
+        self.cache = cache
+        self.model = model
+        self.temperature = temperature
+        # A sampled answer is only one of many valid ones, replaying it has to be asked for explicitly
+        self.enabled = temperature == 0 or allow_nonzero_temperature
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        if not self.enabled:
+            self.cache.stats.bypassed += 1
+            return handler(request)
+        key = cache_key(
+            model_name(request.model, self.model), self.temperature, request.system_prompt, request.messages
+        )
+        if (cached := self.cache.get(key)) is not None:
+            return ModelResponse(result=[cached])
+        response = handler(request)
+        self._store(key, response)
+        return response
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        if not self.enabled:
+            self.cache.stats.bypassed += 1
+            return await handler(request)
+        key = cache_key(
+            model_name(request.model, self.model), self.temperature, request.system_prompt, request.messages
+        )
+        if (cached := await self.cache.aget(key)) is not None:
+            return ModelResponse(result=[cached])
+        response = await handler(request)
+        if (message := self._replayable(response)) is not None:
+            await self.cache.aput(key, message)
+        return response
+
+    def _store(self, key: str, response: ModelResponse) -> None:
+        if (message := self._replayable(response)) is not None:
+            self.cache.put(key, message)
+
+    def _replayable(self, response: ModelResponse) -> AIMessage | None:
+        message = response.result[-1] if response.result else None
+        # Truncated or tool-calling replies are not worth replaying
+        if (
+            isinstance(message, AIMessage)
+            and not message.tool_calls
+            and message.response_metadata.get("finish_reason") != "length"
+        ):
+            return message
+        return None
+
+
+class CascadeMiddleware(AgentMiddleware[AgentSessionState[ResponseT], Any]):
+    # Answers with `fast_model` first and calls the agent's own model only when `gate` finds the fast reply wanting.
+    # The fast model should be tagged nostream, so an escalated turn doesn't stream two answers; an accepted fast
+    # reply is then emitted whole. Each reply records the tier that served it in its response metadata.
+
+    def __init__(
+        self,
+        fast_model: BaseChatModel,
+        model: str,
+        gate: EscalationGate,
+        registry: MetricsRegistry | None = None,
+    ) -> None:
+        super().__init__()
+        self.fast_model = fast_model
+        self.model = model
+        self.gate = gate
+        self.registry = registry
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        try:
+            response = handler(request.override(model=self.fast_model))
+        except (APIError, LangChainException):
+            # The agent's own model may still answer, e.g. when the fast one has the smaller context window
+            logger.warning("Fast model failed, escalating to %s", self.model, exc_info=True)
+            return self._tag(request, handler(request), CascadeTier.STRONG, "error")
+        if (reason := self._escalation(response)) is None:
+            return self._tag(request, response, CascadeTier.FAST)
+        return self._tag(request, handler(request), CascadeTier.STRONG, reason)
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        try:
+            response = await handler(request.override(model=self.fast_model))
+        except (APIError, LangChainException):
+            logger.warning("Fast model failed, escalating to %s", self.model, exc_info=True)
+            return self._tag(request, await handler(request), CascadeTier.STRONG, "error")
+        if (reason := self._escalation(response)) is None:
+            return self._tag(request, response, CascadeTier.FAST)
+        return self._tag(request, await handler(request), CascadeTier.STRONG, reason)
+
+    def _escalation(self, response: ModelResponse) -> str | None:
+        message = response.result[-1] if response.result else None
+        return self.gate(message) if isinstance(message, AIMessage) else "no_reply"
+
+    def _tag(
+        self, request: ModelRequest, response: ModelResponse, tier: CascadeTier, reason: str | None = None
+    ) -> ModelResponse:
+        message = response.result[-1] if response.result else None
+        if isinstance(message, AIMessage):
+            message.response_metadata["cascade_tier"] = tier.value
+            if reason is not None:
+                message.response_metadata["cascade_escalation"] = reason
+        if self.registry is not None:
+            agent_name = label_value(request.state.get("agent_name", ""))
+            labels = make_labels(agent=agent_name, model=self.model, tier=tier, reason=reason or "")
+            self.registry.inc("cascade_turns_total", labels)
+        return response
+
+
+class MetricsMiddleware(AgentMiddleware[AgentSessionState[ResponseT], Any]):
+    # Times every model call and counts its tokens, labelled by agent and model and kept per thread for `get_stats`.
+    # Sits inside the context budget (so it sees the prompt actually sent) and outside the response cache (so hits
+    # are counted too).
+
+    def __init__(self, registry: MetricsRegistry, model: str) -> None:
+        super().__init__()
+        self.registry = registry
+        self.model = model
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        started = time.perf_counter()
+        try:
+            response = handler(request)
+        except Exception as e:
+            self._record(request, started, error=e)
+            raise
+        self._record(request, started, response=response)
+        return response
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        started = time.perf_counter()
+        try:
+            response = await handler(request)
+        except Exception as e:
+            self._record(request, started, error=e)
+            raise
+        self._record(request, started, response=response)
+        return response
+
+    def _record(
+        self,
+        request: ModelRequest,
+        started: float,
+        response: ModelResponse | None = None,
+        error: Exception | None = None,
+    ) -> None:
+        elapsed = time.perf_counter() - started
+        agent_name = label_value(request.state.get("agent_name", ""))
+        thread_id = str(get_config().get("configurable", {}).get("thread_id", ""))
+        model = model_name(request.model, self.model)
+        labels = make_labels(agent=agent_name, model=model)
+        event: dict[str, Any] = {
+            "ts": time.time(),
+            "agent": agent_name,
+            "model": model,
+            "thread": thread_id,
+            "latency": elapsed,
+        }
+
+        if error is not None:
+            self.registry.inc(
+                "model_call_errors_total", make_labels(error=type(error).__name__, **dict(labels)), thread=thread_id
+            )
+            self.registry.record({**event, "error": type(error).__name__})
+            return
+
+        self.registry.observe("model_call_seconds", labels, elapsed, thread=thread_id)
+        message = response.result[-1] if response and response.result else None
+        usage = message.usage_metadata if isinstance(message, AIMessage) else None
+        if usage:
+            cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+            self.registry.inc("input_tokens_total", labels, usage["input_tokens"], thread=thread_id)
+            self.registry.inc("output_tokens_total", labels, usage["output_tokens"], thread=thread_id)
+            self.registry.inc("cached_input_tokens_total", labels, cached, thread=thread_id)
+            event.update(input_tokens=usage["input_tokens"], output_tokens=usage["output_tokens"], cached_tokens=cached)
+        if message is not None and message.response_metadata.get("response_cache") == "hit":
+            self.registry.inc("response_cache_hits_total", labels, thread=thread_id)
+            event["response_cache"] = "hit"
+        self.registry.record(event)
+
+
+class SchedulerMiddleware(AgentMiddleware[AgentSessionState[ResponseT], Any]):
+    # Queues every model call behind the model's limiter (rate limits, adaptive concurrency, priority) and retries
+    # throttled or transiently failed calls with jittered backoff. Sits innermost, so cache hits skip the queue.
+
+    def __init__(
+        self,
+        limiters: Mapping[str, ModelLimiter],
+        model: str,
+        max_retries: int = 5,
+        backoff_seconds: float = 1.0,
+        max_backoff_seconds: float = 60.0,
+        registry: MetricsRegistry | None = None,
+    ) -> None:
+        super().__init__()
+        # Keyed by model name; calls to a model without its own limiter queue behind the agent's one
+        self.limiters = limiters
+        self.model = model
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.registry = registry
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        # The limiter lives on the shared event loop, blocking calls only get the retries
+        for attempt in count():
+            try:
+                return handler(request)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(model_name(request.model, self.model), attempt, e))
+        raise AssertionError("unreachable")
+
+    async def awrap_model_call(
+        self, request: ModelRequest, handler: Callable[[ModelRequest], Awaitable[ModelResponse]]
+    ) -> ModelResponse:
+        estimate = count_tokens_approximately([SystemMessage(request.system_prompt or ""), *request.messages])
+        priority = call_priority.get()
+        model = model_name(request.model, self.model)
+        limiter = self.limiters.get(model) or self.limiters[self.model]
+        for attempt in count():
+            queued = time.perf_counter()
+            epoch = await limiter.acquire(priority, estimate)
+            if self.registry is not None:
+                labels = make_labels(model=model, priority=priority.name.lower())
+                self.registry.observe("scheduler_wait_seconds", labels, time.perf_counter() - queued)
+            try:
+                response = await handler(request)
+            except RETRYABLE_ERRORS as e:
+                limiter.release()
+                # Rejected requests don't count against the token budget
+                limiter.settle(estimate, 0)
+                if isinstance(e, RateLimitError):
+                    limiter.on_throttle(epoch)
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._backoff(model, attempt, e))
+                continue
+            except BaseException:
+                limiter.release()
+                # Cancelled (a discarded speculation, a deadline) or failed for good: the estimate goes back too
+                limiter.settle(estimate, 0)
+                raise
+            limiter.release()
+            limiter.on_success()
+            message = response.result[-1] if response.result else None
+            if isinstance(message, AIMessage) and message.usage_metadata:
+                limiter.settle(estimate, message.usage_metadata["total_tokens"])
+            else:
+                # Streamed and replayed replies may come without usage, the reply is counted like the prompt
+                limiter.settle(estimate, estimate + count_tokens_approximately(response.result))
+            return response
+        raise AssertionError("unreachable")
+
+    def _backoff(self, model: str, attempt: int, error: APIError) -> float:
+        if self.registry is not None:
+            self.registry.inc("model_call_retries_total", make_labels(model=model, error=type(error).__name__))
+        return backoff(attempt, error, self.backoff_seconds, self.max_backoff_seconds)
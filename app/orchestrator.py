@@ -1,12 +1,32 @@
-from typing import TYPE_CHECKING, Optional, Sequence
+import asyncio
+import logging
+import sqlite3
+import time
+import uuid
+from collections.abc import AsyncGenerator, Iterator, Mapping, Sequence
+from contextlib import aclosing, contextmanager
+from typing import TYPE_CHECKING, Any, Optional, cast
 
 from langchain.messages import AIMessage, HumanMessage
 from langchain_core.exceptions import LangChainException
-from openai import AuthenticationError
+from langchain_core.messages.ai import add_usage
+from openai import AuthenticationError, OpenAIError, RateLimitError
 
 from .agents import AgentSession
+from .checkpoints import ForkInfo, get_checkpointer
+from .config import get_settings
+from .constants import Agent
 from .exceptions import ManualOrchestratorException
-from .prompts import CONTEXT_WRAPPER_PROMPT
+from .metrics import AgentStats, agent_stats, get_metrics, make_labels
+from .panel import PanelReview, merge_critiques
+from .pool import get_agent_pool
+from .prompts import CONTEXT_WRAPPER_PROMPT, REVISION_DIFF_PROMPT, REVISION_PROMPT
+from .refinement import RefinementTrace, RefinementTurn, StopReason, draft_similarity
+from .revisions import Revision, RevisionError, RevisionOutcome, revise, unified_diff
+from .runtime import get_event_loop, iter_sync, run_sync
+from .scheduler import Priority, priority
+from .singleflight import SingleFlight, get_single_flight
+from .speculation import Speculation, SpeculationOutcome, SpeculationStats, StagedReply
 from .state import AgentSessionState
 
 if TYPE_CHECKING:
@@ -15,11 +35,45 @@ if TYPE_CHECKING:
 
     from .constants import LLMModel
 
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def _provider_errors(agent_name: str) -> Iterator[None]:
+    try:
+        yield
+    except LangChainException:
+        raise ManualOrchestratorException(f"Error while talking to agent {agent_name}")
+    except AuthenticationError:
+        raise ManualOrchestratorException("API key is invalid")
+    except RateLimitError:
+        raise ManualOrchestratorException(f"Agent {agent_name} is rate limited by the provider, try again later")
+    except sqlite3.Error:
+        logger.warning("Checkpoint storage failed for agent %s", agent_name, exc_info=True)
+        raise ManualOrchestratorException("Conversation storage is unavailable, try again later")
+
+
+def _total_tokens(message: AIMessage) -> int:
+    return message.usage_metadata["total_tokens"] if message.usage_metadata else 0
+
 
 class ManualOrchestrator:
-    main_task: str | None = None
-    agents: dict[str, AgentSession[AIMessage, Optional["BaseModel"]]] = {}
-    llm_api_key: str | None = None
+    settings = get_settings()
+
+    # One instance per browser session; compiled agents are borrowed from the process-wide pool.
+    def __init__(self) -> None:
+        self.main_task: str | None = None
+        self.agents: dict[str, AgentSession[AIMessage, Optional["BaseModel"]]] = {}
+        self.llm_api_key: str | None = None
+        # Threads this session has talked to, per agent; the metrics registry is process-wide
+        self.threads: dict[str, set[str]] = {}
+        self.speculative = self.settings.SPECULATION_ENABLED
+        self.speculation: Speculation | None = None
+        self.speculation_stats = SpeculationStats()
+        # Opt-in: the generator answers critiques with edits to its latest draft (per thread) instead of a rewrite
+        self.revision_mode = self.settings.REVISION_MODE
+        self.drafts: dict[str, str] = {}
+        self.last_revision: Revision | None = None
 
     def set_llm_api_key(self, api_key: str) -> None:
         self.llm_api_key = api_key
@@ -27,31 +81,530 @@ class ManualOrchestrator:
     def set_main_task(self, main_task: str) -> None:
         self.main_task = main_task
 
-    def add_agent(self, name: str, system_prompt: str, model: "LLMModel") -> None:
+    def add_agent(
+        self,
+        name: str,
+        system_prompt: str,
+        model: "LLMModel",
+        fast_model: Optional["LLMModel"] = None,
+        temperature: float = 0.7,
+    ) -> None:
+        # With `fast_model` the agent runs in cascade mode: `model` only answers when the fast reply is escalated.
+        # The response cache only replays agents at temperature 0, unless RESPONSE_CACHE_ALLOW_NONZERO_TEMPERATURE.
         if self.llm_api_key is None:
             raise ManualOrchestratorException("API key is not set")
-        self.agents[name] = AgentSession(api_key=self.llm_api_key, system_prompt=system_prompt, model=model)
+        self.agents[name] = get_agent_pool().acquire(
+            api_key=self.llm_api_key,
+            system_prompt=system_prompt,
+            model=model,
+            temperature=temperature,
+            fast_model=fast_model,
+        )
 
-    def talk_to(self, agent_name: str, input_text: str, thread_id: str, context_from: str | None = None) -> str:
+    def _prepare_input(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None
+    ) -> tuple[AgentSessionState[AIMessage], "RunnableConfig"]:
         if agent_name not in self.agents:
             raise ManualOrchestratorException(f"Agent {agent_name} not found")
         if self.main_task is None:
             raise ManualOrchestratorException("Main task not set")
 
         talk_to_input = None
-        if context_from is not None:
+        revision = self.last_revision
+        if (
+            context_from == Agent.GENERATOR
+            and self.settings.REVISION_CRITIC_VIEW == "diff"
+            and revision is not None
+            and revision.diff
+            and revision.document == input_text
+        ):
+            talk_to_input = REVISION_DIFF_PROMPT.format(main_task=self.main_task, diff=revision.diff)
+        elif context_from is not None:
             talk_to_input = CONTEXT_WRAPPER_PROMPT.format(main_task=self.main_task, context_text=input_text)
 
+        self.threads.setdefault(agent_name, set()).add(thread_id)
         messages: Sequence[HumanMessage] = [HumanMessage(content=talk_to_input or input_text)]
         config: "RunnableConfig" = {"configurable": {"thread_id": thread_id}}
+        return AgentSessionState(agent_name=agent_name, main_task=self.main_task, messages=list(messages)), config
+
+    async def _ainvoke(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None = None
+    ) -> AIMessage:
+        # A double submit joins the call already in flight instead of running it, and so adding a second reply
+        flights = get_single_flight()
+        async with flights.join(self._flight_key(agent_name, input_text, thread_id, context_from)) as flight:
+            if not flight.leader:
+                message = flight.result()
+                self._count_coalesced(agent_name)
+            else:
+                async with flights.thread_lock(thread_id):
+                    if self._revises(agent_name, thread_id, context_from):
+                        message = await self._arevise(input_text, thread_id, context_from)
+                    else:
+                        message = await self._acall(agent_name, input_text, thread_id, context_from)
+                flight.publish(message)
+        if agent_name == Agent.GENERATOR:
+            self.drafts[thread_id] = message.text
+        return message
+
+    async def _acall(self, agent_name: str, input_text: str, thread_id: str, context_from: str | None) -> AIMessage:
+        if staged := await self._take_speculation(agent_name, input_text, thread_id, context_from):
+            return staged
+        agent_input, config = self._prepare_input(agent_name, input_text, thread_id, context_from)
+        with _provider_errors(agent_name):
+            response = await self.agents[agent_name].agent.ainvoke(
+                input=agent_input, config=config, durability=self.settings.CHECKPOINT_DURABILITY  # type: ignore[arg-type]
+            )
+        return response["messages"][-1]
+
+    async def atalk_to(self, agent_name: str, input_text: str, thread_id: str, context_from: str | None = None) -> str:
+        response = await self._ainvoke(agent_name, input_text, thread_id, context_from)
+        response_content = response.content
+        return response_content  # type: ignore[return-value]
+
+    async def astream_to(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None = None
+    ) -> AsyncGenerator[str, None]:
+        # The graph checkpoints the final message once the stream is exhausted, same as `atalk_to`.
+        started = time.perf_counter()
+        if self._revises(agent_name, thread_id, context_from):
+            # Edits are applied once complete, so a revision arrives in one piece
+            message = await self._ainvoke(agent_name, input_text, thread_id, context_from)
+            self._observe_ttft(agent_name, thread_id, time.perf_counter() - started)
+            yield message.text
+            return
+        flights = get_single_flight()
+        async with flights.join(self._flight_key(agent_name, input_text, thread_id, context_from)) as flight:
+            if not flight.leader:
+                # Joined an identical call, which may not stream, so the reply arrives in one piece
+                message = flight.result()
+                self._count_coalesced(agent_name)
+            else:
+                async with (
+                    flights.thread_lock(thread_id),
+                    aclosing(self._astream(agent_name, input_text, thread_id, context_from, started)) as replies,
+                ):
+                    async for reply in replies:
+                        if isinstance(reply, AIMessage):
+                            message = reply
+                        else:
+                            yield reply
+                flight.publish(message)
+                return
+        if agent_name == Agent.GENERATOR:
+            self.drafts[thread_id] = message.text
+        self._observe_ttft(agent_name, thread_id, time.perf_counter() - started)
+        yield message.text
+
+    async def _astream(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None, started: float
+    ) -> AsyncGenerator[str | AIMessage, None]:
+        # Yields the reply's text as it arrives, then the whole reply
+        first_token = True
+        if staged := await self._take_speculation(agent_name, input_text, thread_id, context_from):
+            if agent_name == Agent.GENERATOR:
+                self.drafts[thread_id] = staged.text
+            self._observe_ttft(agent_name, thread_id, time.perf_counter() - started)
+            yield staged.text
+            yield staged
+            return
+        agent_input, config = self._prepare_input(agent_name, input_text, thread_id, context_from)
+        chunks: list[str] = []
+        with _provider_errors(agent_name):
+            async for item in self.agents[agent_name].agent.astream(
+                input=agent_input,  # type: ignore[arg-type]
+                config=config,
+                stream_mode="messages",
+                durability=self.settings.CHECKPOINT_DURABILITY,
+            ):
+                chunk, metadata = cast(tuple[Any, dict[str, Any]], item)
+                if metadata.get("langgraph_node") == "model" and isinstance(chunk, AIMessage) and chunk.text:
+                    if first_token:
+                        first_token = False
+                        self._observe_ttft(agent_name, thread_id, time.perf_counter() - started)
+                    chunks.append(chunk.text)
+                    yield chunk.text
+        if agent_name == Agent.GENERATOR:
+            self.drafts[thread_id] = "".join(chunks)
+        yield AIMessage("".join(chunks))
+
+    def _revises(self, agent_name: str, thread_id: str, context_from: str | None) -> bool:
+        return (
+            self.revision_mode
+            and agent_name == Agent.GENERATOR
+            and context_from is not None
+            and thread_id in self.drafts
+        )
+
+    async def _arevise(self, input_text: str, thread_id: str, context_from: str | None) -> AIMessage:
+        # The reply costs output tokens only for the sections that change; edits that don't apply cleanly to the
+        # draft are thrown away and the round is redone as an ordinary full rewrite.
+        draft = self.drafts[thread_id]
+        prompt = REVISION_PROMPT.format(main_task=self.main_task, document=draft, context_text=input_text)
+        # Kept out of the thread until it is known to apply
+        with _provider_errors(Agent.GENERATOR):
+            staged = await self._arun_staged(Agent.GENERATOR, prompt, thread_id, None)
+        usage = staged.message.usage_metadata
+        try:
+            revised, outcome, edits = revise(draft, staged.message.text)
+        except RevisionError:
+            message = await self._acall(Agent.GENERATOR, input_text, thread_id, context_from)
+            usage = add_usage(usage, message.usage_metadata)
+            revised, outcome, edits = message.text, RevisionOutcome.FALLBACK, 0
+        else:
+            await self._acommit(Agent.GENERATOR, thread_id, staged)
+        self.last_revision = Revision(document=revised, outcome=outcome, edits=edits, diff=unified_diff(draft, revised))
+        get_metrics().inc("revisions_total", make_labels(outcome=outcome))
+        return AIMessage(revised, usage_metadata=usage, response_metadata={"revision": outcome.value})
+
+    def speculate(self, agent_name: str, input_text: str, thread_id: str, context_from: str | None = None) -> bool:
+        # Starts the call the user is most likely to make next without blocking. The reply is staged, not written to
+        # the thread: the matching `talk_to`/`stream_to` commits it, any other call discards it.
+        self.discard_speculation()
+        if not self.speculative or self._revises(agent_name, thread_id, context_from):
+            return False
+        if self.speculation_stats.tokens >= self.settings.SPECULATION_MAX_TOKENS_PER_SESSION:
+            self._count_speculation(agent_name, SpeculationOutcome.SKIPPED)
+            return False
+        future = asyncio.run_coroutine_threadsafe(
+            self._astage(agent_name, input_text, thread_id, context_from), get_event_loop()
+        )
+        self.speculation = Speculation(key=(agent_name, input_text, thread_id, context_from), future=future)
+        self.speculation_stats.started += 1
+        return True
+
+    def discard_speculation(self) -> None:
+        speculation, self.speculation = self.speculation, None
+        if speculation is None:
+            return
+        agent_name = speculation.key[0]
+        if speculation.future.done() and not speculation.future.cancelled() and not speculation.future.exception():
+            self._waste(agent_name, speculation.future.result())
+        speculation.future.cancel()
+        self._count_speculation(agent_name, SpeculationOutcome.DISCARDED)
+
+    async def _astage(self, agent_name: str, input_text: str, thread_id: str, context_from: str | None) -> StagedReply:
+        # Queued behind anything the user is waiting for
+        with priority(Priority.BACKGROUND):
+            staged = await self._arun_staged(agent_name, input_text, thread_id, context_from)
+        self.speculation_stats.tokens += _total_tokens(staged.message)
+        get_metrics().inc("speculative_tokens_total", make_labels(agent=agent_name), _total_tokens(staged.message))
+        return staged
+
+    async def _arun_staged(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None
+    ) -> StagedReply:
+        # Runs a turn on top of the thread without writing it; `_acommit` writes it once it is wanted
+        session = self.agents[agent_name]
+        agent_input, config = self._prepare_input(agent_name, input_text, thread_id, context_from)
+        snapshot = await session.agent.aget_state(config)
+        history = snapshot.values.get("messages", [])
+        values: dict[str, Any] = {}
+        as_node = "model"
+        async for mode, chunk in session.staging_agent.astream(
+            {**snapshot.values, **agent_input, "messages": [*history, *agent_input["messages"]]},  # type: ignore[arg-type]
+            config,
+            stream_mode=["updates", "values"],
+        ):
+            if mode == "updates":
+                as_node = next(reversed(cast(dict[str, Any], chunk)))
+            else:
+                values = cast(dict[str, Any], chunk)
+        return StagedReply(
+            base_checkpoint_id=snapshot.config["configurable"].get("checkpoint_id"),
+            update={**values, "messages": values["messages"][len(history) :]},
+            as_node=as_node,
+            message=values["messages"][-1],
+        )
+
+    async def _acommit(self, agent_name: str, thread_id: str, staged: StagedReply) -> None:
+        config: "RunnableConfig" = {"configurable": {"thread_id": thread_id}}
+        await self.agents[agent_name].agent.aupdate_state(config, staged.update, as_node=staged.as_node)
+        self.threads.setdefault(agent_name, set()).add(thread_id)
+
+    async def _take_speculation(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None
+    ) -> AIMessage | None:
+        speculation = self.speculation
+        if speculation is None:
+            return None
+        if speculation.key != (agent_name, input_text, thread_id, context_from):
+            self.discard_speculation()
+            return None
+        self.speculation = None
+        try:
+            staged = await asyncio.wrap_future(speculation.future)
+        except (LangChainException, OpenAIError, ManualOrchestratorException):
+            # The real call below is made anyway and reports the error if it persists
+            logger.warning("Speculative call to agent %s failed", agent_name, exc_info=True)
+            self._count_speculation(agent_name, SpeculationOutcome.FAILED)
+            return None
+
+        # Commit only on top of the checkpoint the reply was computed from
+        session = self.agents[agent_name]
+        config: "RunnableConfig" = {"configurable": {"thread_id": thread_id}}
+        snapshot = await session.agent.aget_state(config)
+        if snapshot.config["configurable"].get("checkpoint_id") != staged.base_checkpoint_id:
+            self._waste(agent_name, staged)
+            self._count_speculation(agent_name, SpeculationOutcome.DISCARDED)
+            return None
+        await self._acommit(agent_name, thread_id, staged)
+        self._count_speculation(agent_name, SpeculationOutcome.HIT)
+        return staged.message
+
+    def _waste(self, agent_name: str, staged: StagedReply) -> None:
+        self.speculation_stats.wasted_tokens += _total_tokens(staged.message)
+        get_metrics().inc(
+            "speculative_wasted_tokens_total", make_labels(agent=agent_name), _total_tokens(staged.message)
+        )
+
+    def _count_speculation(self, agent_name: str, outcome: SpeculationOutcome) -> None:
+        stats = self.speculation_stats
+        if outcome == SpeculationOutcome.HIT:
+            stats.hits += 1
+        elif outcome == SpeculationOutcome.DISCARDED:
+            stats.discarded += 1
+        elif outcome == SpeculationOutcome.FAILED:
+            stats.failed += 1
+        else:
+            stats.skipped += 1
+        get_metrics().inc("speculations_total", make_labels(agent=agent_name, outcome=outcome))
+
+    async def afork(self, thread_id: str, at_checkpoint: str | None = None, new_thread_id: str | None = None) -> str:
+        # The new thread reads the history up to `at_checkpoint` (default: the latest) from the original and only
+        # stores what happens after; both threads can then be continued independently.
+        try:
+            return await get_checkpointer(self.settings.CHECKPOINT_STORAGE_PATH).afork(
+                thread_id, at_checkpoint, new_thread_id
+            )
+        except ValueError as e:
+            raise ManualOrchestratorException(str(e))
+
+    def fork(self, thread_id: str, at_checkpoint: str | None = None, new_thread_id: str | None = None) -> str:
+        return run_sync(self.afork(thread_id, at_checkpoint, new_thread_id))
+
+    def list_forks(self, thread_id: str | None = None) -> list[ForkInfo]:
+        return run_sync(get_checkpointer(self.settings.CHECKPOINT_STORAGE_PATH).alist_forks(thread_id))
+
+    def _flight_key(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None
+    ) -> tuple[str, str]:
+        return SingleFlight.key(thread_id, agent_name, self.main_task, context_from, input_text)
+
+    def _count_coalesced(self, agent_name: str) -> None:
+        get_metrics().inc("coalesced_calls_total", make_labels(agent=agent_name))
+
+    def _observe_ttft(self, agent_name: str, thread_id: str, elapsed: float) -> None:
+        labels = make_labels(agent=agent_name, model=self.agents[agent_name].model)
+        get_metrics().observe("time_to_first_token_seconds", labels, elapsed, thread=thread_id)
+
+    def get_stats(self) -> dict[str, AgentStats]:
+        return {
+            agent_name: agent_stats(get_metrics(), agent=agent_name, thread=threads)
+            for agent_name, threads in self.threads.items()
+        }
+
+    async def arefine(
+        self,
+        main_task: str,
+        max_rounds: int = 5,
+        token_budget: int | None = None,
+        deadline: float | None = None,
+        convergence_threshold: float = 0.95,
+        thread_ids: dict[str, str] | None = None,
+        critics: Sequence[str] | None = None,
+        resume: bool = False,
+    ) -> RefinementTrace:
+        # Runs generator -> critic -> generator ... on its own. A round is one generator draft plus the critique of
+        # it; the loop always ends on a draft. `deadline` is a `time.time()` timestamp, an in-flight call that runs
+        # past it is cancelled. With `critics`, every draft goes to that panel instead of the single critic.
+        # With `resume`, turns already stored in the `thread_ids` threads are picked up instead of being redone.
+        critics = list(critics or [Agent.CRITIC])
+        if resume and critics != [Agent.CRITIC]:
+            # Stored turns are rebuilt from the generator's and the single critic's threads only
+            raise ManualOrchestratorException("Resuming is only supported with the single critic")
+        for agent_name in (Agent.GENERATOR, *critics):
+            if agent_name not in self.agents:
+                raise ManualOrchestratorException(f"Agent {agent_name} not found")
+        self.set_main_task(main_task)
+        thread_ids = dict(thread_ids or {})
+        for agent_name in (Agent.GENERATOR, *critics):
+            thread_ids.setdefault(agent_name, str(uuid.uuid4()))
+        trace = RefinementTrace(main_task=main_task, thread_ids=thread_ids)
+        if resume:
+            trace.turns = await self._astored_turns(thread_ids[Agent.GENERATOR], thread_ids[Agent.CRITIC])
+            trace.resumed_turns = len(trace.turns)
+        loop = asyncio.get_running_loop()
+        loop_deadline = None if deadline is None else loop.time() + deadline - time.time()
+        started = time.perf_counter()
+
+        async def turn(round_: int, agent_name: Agent, input_text: str, context_from: Agent | None) -> RefinementTurn:
+            turn_started = time.perf_counter()
+            # Nobody is waiting on a single turn of an autonomous loop, interactive calls go first
+            with priority(Priority.BACKGROUND):
+                async with asyncio.timeout_at(loop_deadline):
+                    message = await self._ainvoke(agent_name, input_text, thread_ids[agent_name], context_from)
+            return RefinementTurn(
+                round=round_,
+                agent_name=agent_name,
+                content=message.text,
+                elapsed=time.perf_counter() - turn_started,
+                tokens=message.usage_metadata["total_tokens"] if message.usage_metadata else 0,
+            )
+
+        async def review_draft(round_: int, draft: str) -> RefinementTurn:
+            if critics == [Agent.CRITIC]:
+                return await turn(round_, Agent.CRITIC, draft, Agent.GENERATOR)
+            with priority(Priority.BACKGROUND):
+                async with asyncio.timeout_at(loop_deadline):
+                    review = await self.apanel_review(critics, draft, thread_ids)
+            return RefinementTurn(
+                round=round_,
+                agent_name=Agent.CRITIC,
+                content=review.merged,
+                elapsed=review.elapsed,
+                tokens=review.tokens,
+            )
+
+        def exhausted() -> StopReason | None:
+            if token_budget is not None and trace.tokens >= token_budget:
+                return StopReason.TOKEN_BUDGET
+            if loop_deadline is not None and loop.time() >= loop_deadline:
+                return StopReason.DEADLINE
+            return None
+
+        draft = next((turn for turn in reversed(trace.turns) if turn.agent_name == Agent.GENERATOR), None)
+        first_round = trace.turns[-1].round + (trace.turns[-1] is not draft) if trace.turns else 1
         try:
-            response = self.agents[agent_name].agent.invoke(
-                input=AgentSessionState(agent_name=agent_name, messages=list(messages)), config=config  # type: ignore[arg-type]
+            for round_ in range(first_round, max_rounds + 1):
+                if draft is None:
+                    draft = await turn(round_, Agent.GENERATOR, main_task, None)
+                    trace.turns.append(draft)
+                elif trace.turns[-1] is draft:
+                    # Resumed after the draft of this round was stored
+                    if draft.similarity is not None and draft.similarity >= convergence_threshold:
+                        trace.stop_reason = StopReason.CONVERGED
+                        break
+                else:
+                    critique = trace.turns[-1]
+                    previous, draft = draft, await turn(round_, Agent.GENERATOR, critique.content, Agent.CRITIC)
+                    draft.similarity = draft_similarity(previous.content, draft.content)
+                    trace.turns.append(draft)
+                    if draft.similarity >= convergence_threshold:
+                        trace.stop_reason = StopReason.CONVERGED
+                        break
+                if round_ == max_rounds:
+                    break
+                if reason := exhausted():
+                    trace.stop_reason = reason
+                    break
+                trace.turns.append(await review_draft(round_, draft.content))
+                if reason := exhausted():
+                    trace.stop_reason = reason
+                    break
+        except TimeoutError:
+            trace.stop_reason = StopReason.DEADLINE
+
+        trace.elapsed = time.perf_counter() - started
+        return trace
+
+    async def _astored_turns(self, generator_thread_id: str, critic_thread_id: str) -> list[RefinementTurn]:
+        # Each stored reply is one turn, drafts and critiques alternating from the first draft. Timings are not stored.
+        replies: dict[str, list[AIMessage]] = {}
+        for agent_name, thread_id in ((Agent.GENERATOR, generator_thread_id), (Agent.CRITIC, critic_thread_id)):
+            config: "RunnableConfig" = {"configurable": {"thread_id": thread_id}}
+            snapshot = await self.agents[agent_name].agent.aget_state(config)
+            replies[agent_name] = [m for m in snapshot.values.get("messages", []) if isinstance(m, AIMessage)]
+        turns: list[RefinementTurn] = []
+        previous: RefinementTurn | None = None
+        for round_, draft in enumerate(replies[Agent.GENERATOR], start=1):
+            turn = RefinementTurn(round_, Agent.GENERATOR, draft.text, elapsed=0.0, tokens=_total_tokens(draft))
+            if previous is not None:
+                turn.similarity = draft_similarity(previous.content, turn.content)
+            turns.append(turn)
+            previous = turn
+            if round_ <= len(replies[Agent.CRITIC]):
+                critique = replies[Agent.CRITIC][round_ - 1]
+                turns.append(
+                    RefinementTurn(round_, Agent.CRITIC, critique.text, elapsed=0.0, tokens=_total_tokens(critique))
+                )
+        return turns
+
+    def refine(
+        self,
+        main_task: str,
+        max_rounds: int = 5,
+        token_budget: int | None = None,
+        deadline: float | None = None,
+        convergence_threshold: float = 0.95,
+        thread_ids: dict[str, str] | None = None,
+        critics: Sequence[str] | None = None,
+        resume: bool = False,
+    ) -> RefinementTrace:
+        return run_sync(
+            self.arefine(
+                main_task, max_rounds, token_budget, deadline, convergence_threshold, thread_ids, critics, resume
             )
-        except LangChainException:
-            raise ManualOrchestratorException(f"Error while talking to agent {agent_name}")
-        except AuthenticationError:
-            raise ManualOrchestratorException("API key is invalid")
+        )
+
+    async def apanel_review(
+        self,
+        critics: Sequence[str],
+        draft: str,
+        thread_ids: Mapping[str, str],
+        timeout: float | None = None,
+        context_from: str = Agent.GENERATOR,
+    ) -> PanelReview:
+        # Every critic reviews the same draft concurrently, each under its own timeout, so the round takes as long
+        # as the slowest critic that answers in time. A critic that fails or times out is reported, not fatal.
+        timeout = timeout if timeout is not None else self.settings.CRITIC_PANEL_TIMEOUT_SECONDS
+        started = time.perf_counter()
+
+        async def review(agent_name: str) -> AIMessage:
+            async with asyncio.timeout(timeout):
+                return await self._ainvoke(agent_name, draft, thread_ids[agent_name], context_from)
+
+        tasks = {agent_name: asyncio.create_task(review(agent_name)) for agent_name in critics}
+        try:
+            await asyncio.wait(tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            # Only once they have let go of their threads, which the next round's calls lock again
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+        panel = PanelReview(critiques={})
+        for agent_name, task in tasks.items():
+            error = task.exception()
+            if isinstance(error, TimeoutError):
+                panel.failures[agent_name] = f"timed out after {timeout}s"
+            elif error is not None:
+                panel.failures[agent_name] = str(error) or type(error).__name__
+            else:
+                message = task.result()
+                panel.critiques[agent_name] = message.text
+                panel.tokens += message.usage_metadata["total_tokens"] if message.usage_metadata else 0
+        if not panel.critiques:
+            raise ManualOrchestratorException("No critic answered: " + "; ".join(panel.failures.values()))
+
+        panel.merged = merge_critiques(panel.critiques)
+        panel.elapsed = time.perf_counter() - started
+        return panel
+
+    def panel_review(
+        self,
+        critics: Sequence[str],
+        draft: str,
+        thread_ids: Mapping[str, str],
+        timeout: float | None = None,
+        context_from: str = Agent.GENERATOR,
+    ) -> PanelReview:
+        return run_sync(self.apanel_review(critics, draft, thread_ids, timeout, context_from))
+
+    def talk_to(self, agent_name: str, input_text: str, thread_id: str, context_from: str | None = None) -> str:
+        return run_sync(self.atalk_to(agent_name, input_text, thread_id, context_from))
 
-        response_content = response["messages"][-1].content
-        return response_content
+    def stream_to(
+        self, agent_name: str, input_text: str, thread_id: str, context_from: str | None = None
+    ) -> Iterator[str]:
+        return iter_sync(self.astream_to(agent_name, input_text, thread_id, context_from))
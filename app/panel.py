@@ -0,0 +1,61 @@
+import re
+from dataclasses import dataclass, field
+from typing import Mapping
+
+from .refinement import draft_similarity
+
+_BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+
+
+@dataclass
+class PanelReview:
+    critiques: dict[str, str]
+    # Critics that timed out or failed, with the reason
+    failures: dict[str, str] = field(default_factory=dict)
+    merged: str = ""
+    tokens: int = 0
+    elapsed: float = 0.0
+
+
+def _split_points(critique: str) -> list[str]:
+    # A point is a bullet or a paragraph; headings and blank lines only separate them
+    points: list[str] = []
+    current: list[str] = []
+    for line in critique.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#") or _BULLET.match(line):
+            if current:
+                points.append(" ".join(current))
+                current = []
+            if stripped and not stripped.startswith("#"):
+                current.append(_BULLET.sub("", line).strip())
+        else:
+            current.append(stripped)
+    if current:
+        points.append(" ".join(current))
+    return points
+
+
+def _normalize(point: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", point.lower()).split())
+
+
+def merge_critiques(critiques: Mapping[str, str], similarity_threshold: float = 0.8) -> str:
+    # Near-duplicate points raised by several critics are kept once, attributed to everyone who raised them
+    merged: list[tuple[str, str, list[str]]] = []
+    for critic, critique in critiques.items():
+        for point in _split_points(critique):
+            normalized = _normalize(point)
+            if not normalized:
+                continue
+            for kept_normalized, _, raised_by in merged:
+                if draft_similarity(kept_normalized, normalized) >= similarity_threshold:
+                    if critic not in raised_by:
+                        raised_by.append(critic)
+                    break
+            else:
+                merged.append((normalized, point, [critic]))
+
+    lines = [f"# Feedback from {len(critiques)} reviewers:"]
+    lines.extend(f"- {point} (raised by: {', '.join(raised_by)})" for _, point, raised_by in merged)
+    return "\n".join(lines)
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional
+
+from langchain.messages import AIMessage
+
+from .agents import AgentSession
+from .config import get_settings
+from .constants import LLMModel
+from .http_clients import api_key_fingerprint
+
+if TYPE_CHECKING:
+    from pydantic import BaseModel
+
+
+class AgentKey(NamedTuple):
+    model: str
+    system_prompt: str
+    temperature: float
+    max_tokens: int | None
+    api_key_fingerprint: str
+    fast_model: str | None = None
+
+
+class AgentPool:
+    # Compiled agent graphs are stateless between calls (history lives in the checkpointer under a thread_id),
+    # so every session asking for the same configuration can share one instance.
+
+    def __init__(self, max_size: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[AgentKey, tuple[float, AgentSession[AIMessage, Optional["BaseModel"]]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def acquire(
+        self,
+        api_key: str,
+        system_prompt: str,
+        model: "LLMModel",
+        temperature: float = 0.7,
+        max_tokens: int | None = None,
+        fast_model: "LLMModel | None" = None,
+    ) -> AgentSession[AIMessage, Optional["BaseModel"]]:
+        key = AgentKey(
+            LLMModel(model).value,
+            system_prompt,
+            temperature,
+            max_tokens,
+            api_key_fingerprint(api_key),
+            LLMModel(fast_model).value if fast_model is not None else None,
+        )
+        with self._lock:
+            self._evict_expired()
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self._entries[key] = (self._clock(), self._entries[key][1])
+                return self._entries[key][1]
+
+        # Compiling the graph is slow, so it happens outside the lock. Two sessions racing for the same new key
+        # both build one and the second insert wins, which is harmless.
+        session: AgentSession[AIMessage, Optional["BaseModel"]] = AgentSession(
+            api_key=api_key,
+            system_prompt=system_prompt,
+            model=model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            fast_model=fast_model,
+        )
+        with self._lock:
+            self._entries[key] = (self._clock(), session)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return session
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _evict_expired(self) -> None:
+        deadline = self._clock() - self.ttl_seconds
+        while self._entries:
+            key, (last_used, _) = next(iter(self._entries.items()))
+            if last_used > deadline:
+                break
+            del self._entries[key]
+
+
+@lru_cache
+def get_agent_pool() -> AgentPool:
+    settings = get_settings()
+    return AgentPool(max_size=settings.AGENT_POOL_MAX_SIZE, ttl_seconds=settings.AGENT_POOL_TTL_SECONDS)
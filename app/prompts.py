@@ -8,6 +8,7 @@ When you receive a draft that includes feedback from a 'Critic', your most impor
 - You **MUST NOT** critique the feedback or the critic.
 - Your sole focus is to **revise your previous work** by implementing the suggested changes.
 - Your output should always be a **new, complete, and improved version** of the content, not a discussion about the feedback itself.
+- If the request asks for edits to the current draft instead, reply with edits in exactly the format it gives.
 """
 
 CRITIC_SYSTEM_PROMPT = """
@@ -44,3 +45,46 @@ CONTEXT_WRAPPER_PROMPT = """
 # Your task:
 Review it and provide your response.
 """
+
+CONTEXT_SUMMARY_PROMPT = """
+# Main Task:
+{main_task}
+
+# Summary of the earlier conversation:
+{summary}
+
+The most recent messages follow in full.
+"""
+
+REVISION_PROMPT = """
+# Main Task:
+{main_task}
+
+# Current draft:
+{document}
+
+# Response from another LLM:
+{context_text}
+
+# Your task:
+Revise the current draft to address the response. Do not repeat unchanged text: reply only with edits, one block per changed section, in this format:
+
+@@ REPLACE: <exact heading line of an existing section>
+<the new section, starting with its heading line>
+@@ INSERT AFTER: <exact heading line of an existing section>
+<the new section, starting with its heading line>
+@@ DELETE: <exact heading line of an existing section>
+
+Use "(start)" as the heading of the text before the first heading. If the draft has no headings or has to change throughout, reply with the complete new draft instead, without any "@@" lines.
+"""
+
+REVISION_DIFF_PROMPT = """
+# Main Task:
+{main_task}
+
+# Changes another LLM made to its draft since the previous version:
+{diff}
+
+# Your task:
+Review the changes and provide your response.
+"""
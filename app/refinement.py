@@ -0,0 +1,48 @@
+import difflib
+from dataclasses import dataclass, field
+from enum import Enum
+
+from .constants import Agent
+
+
+class StopReason(str, Enum):
+    CONVERGED = "converged"
+    MAX_ROUNDS = "max_rounds"
+    TOKEN_BUDGET = "token_budget"
+    DEADLINE = "deadline"
+
+
+@dataclass
+class RefinementTurn:
+    round: int
+    agent_name: str
+    content: str
+    elapsed: float
+    tokens: int = 0
+    # Similarity to the previous generator draft, only set on generator turns after the first one
+    similarity: float | None = None
+
+
+@dataclass
+class RefinementTrace:
+    main_task: str
+    thread_ids: dict[str, str]
+    turns: list[RefinementTurn] = field(default_factory=list)
+    stop_reason: StopReason = StopReason.MAX_ROUNDS
+    elapsed: float = 0.0
+    # Turns picked up from the threads instead of being run, see `resume` in ManualOrchestrator.arefine
+    resumed_turns: int = 0
+
+    @property
+    def tokens(self) -> int:
+        return sum(turn.tokens for turn in self.turns)
+
+    @property
+    def final_draft(self) -> str | None:
+        drafts = [turn.content for turn in self.turns if turn.agent_name == Agent.GENERATOR]
+        return drafts[-1] if drafts else None
+
+
+def draft_similarity(previous: str, current: str) -> float:
+    # Word-level diff ratio: cheap enough for multi-page drafts and insensitive to re-wrapping
+    return difflib.SequenceMatcher(None, previous.split(), current.split(), autojunk=False).ratio()
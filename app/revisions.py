@@ -0,0 +1,116 @@
+import difflib
+import re
+from dataclasses import dataclass
+from enum import Enum
+
+# How the generator addresses the text before the first heading
+START = "(start)"
+
+_HEADING = re.compile(r"^#{1,6}\s+\S")
+_EDIT = re.compile(r"^@@\s*(REPLACE|INSERT AFTER|DELETE)\s*:\s*(.*?)\s*$", re.IGNORECASE)
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+class RevisionError(ValueError):
+    pass
+
+
+class RevisionOutcome(str, Enum):
+    # Edits applied to the previous draft, a complete draft sent instead of edits, or edits that didn't apply and
+    # were redone as a full rewrite
+    APPLIED = "applied"
+    REWRITE = "rewrite"
+    FALLBACK = "fallback"
+
+
+@dataclass
+class SectionEdit:
+    op: str
+    heading: str
+    content: str = ""
+
+
+@dataclass
+class Revision:
+    document: str
+    outcome: RevisionOutcome
+    edits: int = 0
+    diff: str = ""
+
+
+def split_sections(document: str) -> list[tuple[str, str]]:
+    # (heading line, section text including the heading) for every markdown heading outside code fences, with the
+    # text before the first heading under START. Joining the texts gives back the document unchanged.
+    sections: list[tuple[str, str]] = [(START, "")]
+    fenced = False
+    for line in document.splitlines(keepends=True):
+        if _FENCE.match(line):
+            fenced = not fenced
+        if not fenced and _HEADING.match(line):
+            sections.append((line.strip(), line))
+        else:
+            heading, text = sections[-1]
+            sections[-1] = (heading, text + line)
+    return sections if sections[0][1] else sections[1:]
+
+
+def parse_edits(text: str) -> list[SectionEdit]:
+    # An empty list means the reply carries no edit blocks at all, i.e. it is a complete draft
+    edits: list[SectionEdit] = []
+    for line in text.splitlines(keepends=True):
+        if match := _EDIT.match(line):
+            edits.append(SectionEdit(op=match.group(1).upper(), heading=match.group(2)))
+        elif edits:
+            edits[-1].content += line
+        elif line.strip():
+            raise RevisionError(f"Text before the first edit: {line.strip()[:80]!r}")
+    for edit in edits:
+        if edit.op == "DELETE" and edit.content.strip():
+            raise RevisionError(f"DELETE of {edit.heading!r} has content")
+        if edit.op != "DELETE" and not edit.content.strip():
+            raise RevisionError(f"{edit.op} of {edit.heading!r} has no content")
+    return edits
+
+
+def apply_edits(document: str, edits: list[SectionEdit]) -> str:
+    sections = split_sections(document)
+    for edit in edits:
+        index = _find(sections, edit.heading)
+        heading, text = sections[index]
+        if edit.op == "DELETE":
+            del sections[index]
+        elif edit.op == "REPLACE":
+            # Keep the blank lines that separated the old section from the next one
+            trailing = text[len(text.rstrip("\n")) :] or "\n"
+            sections[index : index + 1] = split_sections(edit.content.strip("\n") + trailing)
+        else:
+            if not text.endswith("\n\n"):
+                sections[index] = (heading, text.rstrip("\n") + "\n\n")
+            sections[index + 1 : index + 1] = split_sections(edit.content.strip("\n") + "\n\n")
+    revised = "".join(text for _, text in sections)
+    if not revised.strip():
+        raise RevisionError("The edits leave an empty document")
+    return revised.rstrip("\n") + "\n" if document.endswith("\n") else revised.rstrip("\n")
+
+
+def revise(document: str, reply: str) -> tuple[str, RevisionOutcome, int]:
+    # The revised document, how it was produced and the number of edits applied
+    if not (edits := parse_edits(reply)):
+        return reply, RevisionOutcome.REWRITE, 0
+    return apply_edits(document, edits), RevisionOutcome.APPLIED, len(edits)
+
+
+def unified_diff(before: str, after: str) -> str:
+    return "".join(
+        difflib.unified_diff(
+            before.splitlines(keepends=True), after.splitlines(keepends=True), "previous draft", "revised draft"
+        )
+    )
+
+
+def _find(sections: list[tuple[str, str]], heading: str) -> int:
+    wanted = " ".join(heading.split())
+    matches = [i for i, (candidate, _) in enumerate(sections) if " ".join(candidate.split()) == wanted]
+    if len(matches) != 1:
+        raise RevisionError(f"{'No' if not matches else 'More than one'} section {heading!r}")
+    return matches[0]
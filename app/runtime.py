@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from typing import Any, AsyncGenerator, Coroutine, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    # One loop per process, running in a daemon thread. Every async resource (checkpointer connections,
+    # HTTP clients, in-flight agent calls) is bound to it, so sync callers on any thread can share them.
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="forkflux-event-loop", daemon=True).start()
+    return _loop
+
+
+def _check_not_on_loop(loop: asyncio.AbstractEventLoop) -> None:
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    if running is loop:
+        raise RuntimeError("Blocking calls are not allowed from the shared event loop, use the async API instead")
+
+
+def run_sync(coro: Coroutine[Any, Any, T]) -> T:
+    loop = get_event_loop()
+    _check_not_on_loop(loop)
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def iter_sync(agen: AsyncGenerator[T, None]) -> Iterator[T]:
+    loop = get_event_loop()
+    _check_not_on_loop(loop)
+    try:
+        while True:
+            try:
+                yield asyncio.run_coroutine_threadsafe(anext(agen), loop).result()
+            except StopAsyncIteration:
+                return
+    finally:
+        asyncio.run_coroutine_threadsafe(agen.aclose(), loop).result()
+
+
+async def on_shared_loop(coro: Coroutine[Any, Any, T]) -> T:
+    # For callers running their own loop, e.g. an ASGI server: awaits `coro` on the shared loop without blocking
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, get_event_loop()))
+
+
+async def aiter_on_shared_loop(agen: AsyncGenerator[T, None]) -> AsyncGenerator[T, None]:
+    loop = get_event_loop()
+    try:
+        while True:
+            try:
+                yield await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(anext(agen), loop))
+            except StopAsyncIteration:
+                return
+    finally:
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(agen.aclose(), loop))
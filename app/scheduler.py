@@ -0,0 +1,226 @@
+import asyncio
+import heapq
+import random
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from functools import lru_cache
+
+from openai import APIConnectionError, InternalServerError, RateLimitError
+
+from .config import get_settings
+
+# What is worth retrying: throttling, overload and transient network trouble (APITimeoutError is a connection error)
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+
+class Priority(IntEnum):
+    # Lower goes first
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+call_priority: ContextVar[Priority] = ContextVar("call_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def priority(value: Priority) -> Iterator[None]:
+    # Model calls made in this context, including tasks started from it, are queued at `value`
+    token = call_priority.set(value)
+    try:
+        yield
+    finally:
+        call_priority.reset(token)
+
+
+class TokenBucket:
+    # Refills `per_minute` units a minute up to a minute's worth. Reservations may overdraw the bucket, the caller
+    # then waits until the debt is paid off, so requests are admitted in the order they reserved.
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic) -> None:
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self._clock = clock
+        self._updated = clock()
+
+    def reserve(self, amount: float) -> float:
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+        return max(0.0, -self.tokens / self.rate)
+
+    def refund(self, amount: float) -> None:
+        # Settles an estimate against the actual count, `amount` is negative when the estimate was too low
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: Priority
+    seq: int
+    future: "asyncio.Future[None]" = field(compare=False)
+
+
+class ModelLimiter:
+    # Admission control for one model and API key: requests and tokens per minute, plus a concurrency limit that
+    # adapts to the provider (AIMD: +1 per limit's worth of successes, halved on throttling). Waiters are served by
+    # priority, then in arrival order.
+
+    def __init__(
+        self,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.requests = TokenBucket(rpm, clock) if rpm else None
+        self.tokens = TokenBucket(tpm, clock) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        # Bumped on every decrease; throttles from calls admitted before it belong to the same congestion event
+        self.epoch = 0
+        self._waiters: list[_Waiter] = []
+        self._seq = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: Priority = Priority.INTERACTIVE, tokens: int = 0) -> int:
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = _Waiter(priority, self._seq, asyncio.get_running_loop().create_future())
+            self._seq += 1
+            heapq.heappush(self._waiters, waiter)
+            try:
+                await waiter.future
+            except asyncio.CancelledError:
+                if waiter.future.done() and not waiter.future.cancelled():
+                    self.release()
+                elif waiter in self._waiters:
+                    # `_dispatch` may already have dropped it
+                    self._waiters.remove(waiter)
+                    heapq.heapify(self._waiters)
+                raise
+
+        delay = max(
+            self.requests.reserve(1) if self.requests else 0.0,
+            self.tokens.reserve(tokens) if self.tokens else 0.0,
+        )
+        if delay:
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self.release()
+                self.settle(tokens, 0)
+                raise
+        return self.epoch
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def settle(self, estimated: int, actual: int) -> None:
+        if self.tokens:
+            self.tokens.refund(estimated - actual)
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+        self._dispatch()
+
+    def on_throttle(self, epoch: int) -> None:
+        if epoch == self.epoch:
+            self.epoch += 1
+            self.limit = max(self.min_concurrency, self.limit / 2)
+
+    def _dispatch(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = heapq.heappop(self._waiters)
+            if not waiter.future.done():
+                self.in_flight += 1
+                waiter.future.set_result(None)
+
+
+def retry_after(error: Exception) -> float | None:
+    # Only errors the provider answered (APIStatusError) carry the headers
+    if (response := getattr(error, "response", None)) is None:
+        return None
+    headers = response.headers
+    if (value := headers.get("retry-after-ms")) is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    if (value := headers.get("retry-after")) is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_rng = random.Random()
+
+
+def backoff(attempt: int, error: Exception, base: float, cap: float, rng: random.Random = _rng) -> float:
+    # Full jitter on an exponential schedule, but never sooner than the provider asked for. `cap` bounds both.
+    delay = rng.uniform(0, base * 2**attempt)
+    if (after := retry_after(error)) is not None:
+        delay = after + rng.uniform(0, base)
+    return min(delay, cap)
+
+
+class Scheduler:
+    def __init__(
+        self,
+        rpm: dict[str, int],
+        tpm: dict[str, int],
+        max_concurrency: int,
+        min_concurrency: int = 1,
+    ) -> None:
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self._limiters: dict[tuple[str, str], ModelLimiter] = {}
+
+    def limiter(self, model: str, api_key_fingerprint: str) -> ModelLimiter:
+        # Provider limits apply per organisation, so keys are limited separately
+        key = (model, api_key_fingerprint)
+        if key not in self._limiters:
+            self._limiters[key] = ModelLimiter(
+                rpm=self.rpm.get(model),
+                tpm=self.tpm.get(model),
+                max_concurrency=self.max_concurrency,
+                min_concurrency=self.min_concurrency,
+            )
+        return self._limiters[key]
+
+
+@lru_cache
+def get_scheduler() -> Scheduler:
+    settings = get_settings()
+    return Scheduler(
+        rpm=settings.SCHEDULER_RPM,
+        tpm=settings.SCHEDULER_TPM,
+        max_concurrency=settings.SCHEDULER_MAX_CONCURRENCY,
+        min_concurrency=settings.SCHEDULER_MIN_CONCURRENCY,
+    )
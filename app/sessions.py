@@ -0,0 +1,181 @@
+import json
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+
+from .checkpoints import ForkingSqliteSaver, get_checkpointer
+from .config import get_settings
+from .constants import Agent
+from .exceptions import SessionConflictException
+from .revisions import Revision, RevisionOutcome
+
+# Sessions of the HTTP API live next to the checkpoints they point at, so any worker can serve any request.
+# API keys are never stored: callers send theirs with every request and it has to match the fingerprint.
+# Saves are compare-and-swap on `version`, and a request talking to an agent holds the session's lease until it
+# has saved the reply, so requests in other workers can neither overwrite the record nor run a turn meanwhile.
+_SESSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS api_sessions (
+    session_id TEXT PRIMARY KEY,
+    api_key_fingerprint TEXT NOT NULL,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    lease_holder TEXT,
+    lease_expires_at REAL
+)
+"""
+
+
+@dataclass
+class AgentSpec:
+    model: str
+    thread_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    fast_model: str | None = None
+
+
+@dataclass
+class SessionRecord:
+    api_key_fingerprint: str
+    agents: dict[str, AgentSpec]
+    session_id: str = field(default_factory=lambda: str(uuid.uuid4()))
+    main_task: str | None = None
+    # The agent the next user message goes to, and the one whose reply a redirect forwards
+    current_agent: str = Agent.GENERATOR.value
+    last_agent: str | None = None
+    last_reply: str | None = None
+    # The generator's latest document, which revision mode edits; its stored reply may only hold the edits
+    draft: str | None = None
+    # How that document was revised, whose diff the critic is shown with REVISION_CRITIC_VIEW=diff
+    last_revision: Revision | None = None
+    temperature: float = 0.7
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # The stored version this record was read at, 0 until it is first saved, and the lease it holds if any
+    version: int = 0
+    lease: str | None = None
+
+    def state(self) -> str:
+        data = asdict(self)
+        for key in ("session_id", "api_key_fingerprint", "created_at", "updated_at", "version", "lease"):
+            del data[key]
+        return json.dumps(data)
+
+
+class SessionStore:
+    def __init__(self, saver: ForkingSqliteSaver) -> None:
+        self.saver = saver
+        self.is_setup = False
+
+    async def setup(self) -> None:
+        if self.is_setup:
+            return
+        await self.saver.setup()
+        async with self.saver.lock:
+            await self.saver.conn.execute(_SESSIONS_TABLE)
+            await self.saver.conn.commit()
+        self.is_setup = True
+
+    async def aget(self, session_id: str) -> SessionRecord | None:
+        await self.setup()
+        query = (
+            "SELECT api_key_fingerprint, state, created_at, updated_at, version FROM api_sessions WHERE session_id = ?"
+        )
+        async with self.saver.lock, self.saver.conn.execute(query, (session_id,)) as cur:
+            row = await cur.fetchone()
+        if row is None:
+            return None
+        fingerprint, state, created_at, updated_at, version = row
+        data = json.loads(state)
+        if (revision := data.pop("last_revision", None)) is not None:
+            data["last_revision"] = Revision(**{**revision, "outcome": RevisionOutcome(revision["outcome"])})
+        return SessionRecord(
+            api_key_fingerprint=fingerprint,
+            session_id=session_id,
+            agents={name: AgentSpec(**spec) for name, spec in data.pop("agents").items()},
+            created_at=created_at,
+            updated_at=updated_at,
+            version=version,
+            **data,
+        )
+
+    async def asave(self, record: SessionRecord) -> None:
+        # Fails if the record was saved since it was read, or another request holds its lease
+        await self.setup()
+        record.updated_at = time.time()
+        async with self.saver.lock:
+            if record.version == 0:
+                cur = await self.saver.conn.execute(
+                    "INSERT INTO api_sessions (session_id, api_key_fingerprint, state, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (
+                        record.session_id,
+                        record.api_key_fingerprint,
+                        record.state(),
+                        record.created_at,
+                        record.updated_at,
+                    ),
+                )
+            else:
+                cur = await self.saver.conn.execute(
+                    "UPDATE api_sessions SET state = ?, updated_at = ?, version = version + 1 "
+                    "WHERE session_id = ? AND version = ? "
+                    "AND (lease_holder IS NULL OR lease_holder = ? OR lease_expires_at < ?)",
+                    (
+                        record.state(),
+                        record.updated_at,
+                        record.session_id,
+                        record.version,
+                        record.lease,
+                        record.updated_at,
+                    ),
+                )
+            await self.saver.conn.commit()
+        if cur.rowcount == 0:
+            raise SessionConflictException("The session was changed by another request, reload it and try again")
+        record.version += 1
+
+    async def alease(self, record: SessionRecord, seconds: float) -> None:
+        # Granted only while the record is still at the version it was read at and nobody else holds the lease
+        await self.setup()
+        lease, now = str(uuid.uuid4()), time.time()
+        async with self.saver.lock:
+            cur = await self.saver.conn.execute(
+                "UPDATE api_sessions SET lease_holder = ?, lease_expires_at = ? "
+                "WHERE session_id = ? AND version = ? AND (lease_holder IS NULL OR lease_expires_at < ?)",
+                (lease, now + seconds, record.session_id, record.version, now),
+            )
+            await self.saver.conn.commit()
+        if cur.rowcount == 0:
+            raise SessionConflictException("The session is busy with another request, try again once it has finished")
+        record.lease = lease
+
+    async def arelease(self, record: SessionRecord) -> None:
+        if record.lease is None:
+            return
+        await self.setup()
+        async with self.saver.lock:
+            await self.saver.conn.execute(
+                "UPDATE api_sessions SET lease_holder = NULL, lease_expires_at = NULL "
+                "WHERE session_id = ? AND lease_holder = ?",
+                (record.session_id, record.lease),
+            )
+            await self.saver.conn.commit()
+        record.lease = None
+
+    async def adelete(self, session_id: str) -> bool:
+        await self.setup()
+        async with self.saver.lock:
+            cur = await self.saver.conn.execute("DELETE FROM api_sessions WHERE session_id = ?", (session_id,))
+            await self.saver.conn.commit()
+        return cur.rowcount > 0
+
+
+def get_session_store(path: str | None = None) -> SessionStore:
+    return _session_store(path or get_settings().CHECKPOINT_STORAGE_PATH)
+
+
+@lru_cache
+def _session_store(path: str) -> SessionStore:
+    return SessionStore(get_checkpointer(path))
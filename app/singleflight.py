@@ -0,0 +1,81 @@
+import asyncio
+import hashlib
+import weakref
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Any, AsyncIterator, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class Abandoned(Exception):
+    # The leader went away before finishing (cancelled, or its stream was closed); a follower takes over the call
+    pass
+
+
+class Flight(Generic[T]):
+    def __init__(self, future: "asyncio.Future[T]", leader: bool) -> None:
+        self.future = future
+        self.leader = leader
+
+    def publish(self, value: T) -> None:
+        if not self.future.done():
+            self.future.set_result(value)
+
+    def result(self) -> T:
+        return self.future.result()
+
+
+class SingleFlight(Generic[T]):
+    # Concurrent identical requests share the first one's call, and calls on one thread run one at a time, so two
+    # graph runs never read the same checkpoint and write conflicting successors. Lives on the shared event loop.
+
+    def __init__(self) -> None:
+        self._calls: dict[tuple[str, str], "asyncio.Future[T]"] = {}
+        self._locks: weakref.WeakValueDictionary[str, asyncio.Lock] = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    @staticmethod
+    def key(thread_id: str, *parts: str | None) -> tuple[str, str]:
+        digest = hashlib.sha256("\x00".join(part or "" for part in parts).encode()).hexdigest()
+        return thread_id, digest
+
+    def thread_lock(self, thread_id: str) -> asyncio.Lock:
+        # Held by whoever is using it, and dropped once nobody is
+        if (lock := self._locks.get(thread_id)) is None:
+            lock = self._locks[thread_id] = asyncio.Lock()
+        return lock
+
+    @asynccontextmanager
+    async def join(self, key: tuple[str, str]) -> AsyncIterator[Flight[T]]:
+        # Followers enter once the leader has published, and the leader's error is raised to them instead
+        while (future := self._calls.get(key)) is not None:
+            try:
+                # Shielded, so a follower that gives up doesn't cancel the call for everyone else
+                await asyncio.shield(future)
+            except Abandoned:
+                continue
+            yield Flight(future, leader=False)
+            return
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting, which is fine
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._calls[key] = future
+        flight: Flight[T] = Flight(future, leader=True)
+        try:
+            yield flight
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else Abandoned())
+            raise
+        finally:
+            if not future.done():
+                future.set_exception(Abandoned())
+            del self._calls[key]
+
+
+@lru_cache
+def get_single_flight() -> "SingleFlight[Any]":
+    return SingleFlight()
@@ -0,0 +1,44 @@
+from concurrent.futures import Future
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+from langchain.messages import AIMessage
+
+
+class SpeculationOutcome(str, Enum):
+    HIT = "hit"
+    DISCARDED = "discarded"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+
+@dataclass
+class StagedReply:
+    # A finished run that has not been written to the thread yet, and the checkpoint it was computed from
+    base_checkpoint_id: str | None
+    update: dict[str, Any]
+    as_node: str
+    message: AIMessage
+
+
+@dataclass
+class Speculation:
+    key: tuple[str, str, str, str | None]
+    future: "Future[StagedReply]"
+
+
+@dataclass
+class SpeculationStats:
+    started: int = 0
+    hits: int = 0
+    discarded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    tokens: int = 0
+    wasted_tokens: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        resolved = self.hits + self.discarded + self.failed
+        return self.hits / resolved if resolved else 0.0
@@ -1,5 +1,12 @@
+from typing import NotRequired
+
 from langchain.agents.middleware.types import AgentState, ResponseT
 
 
 class AgentSessionState(AgentState[ResponseT]):
     agent_name: str
+    main_task: NotRequired[str]
+    # Rolling summary of the turns ContextBudgetMiddleware no longer sends verbatim, and how many messages it covers
+    context_summary: NotRequired[str]
+    summarized_through: NotRequired[int]
+    context_tokens: NotRequired[int]
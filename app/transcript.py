@@ -0,0 +1,108 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+from .config import get_settings
+from .runtime import run_sync
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+    from langchain_core.runnables import RunnableConfig
+
+
+@dataclass(frozen=True)
+class TranscriptEntry:
+    # What the UI keeps per chat message: a reference to a message the checkpointer already holds, or the text
+    # itself for what it doesn't (user prompts, errors, revised drafts whose thread only has the edits)
+    role: str
+    thread_id: str | None = None
+    message_id: str | None = None
+    text: str | None = None
+
+
+class TranscriptCache:
+    # Process-wide LRU of message texts by id, shared by every browser session. Reruns render from here, so
+    # redrawing a page of the transcript doesn't deserialize the thread it came from again.
+
+    def __init__(self, max_chars: int) -> None:
+        self.max_chars = max_chars
+        self._texts: OrderedDict[str, str] = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def get(self, message_id: str) -> str | None:
+        with self._lock:
+            if message_id not in self._texts:
+                return None
+            self._texts.move_to_end(message_id)
+            return self._texts[message_id]
+
+    def put(self, message_id: str, text: str) -> None:
+        with self._lock:
+            self._chars -= len(self._texts.pop(message_id, ""))
+            self._texts[message_id] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars and len(self._texts) > 1:
+                self._chars -= len(self._texts.popitem(last=False)[1])
+
+    def clear(self) -> None:
+        with self._lock:
+            self._texts.clear()
+            self._chars = 0
+
+
+@lru_cache
+def get_transcript_cache() -> TranscriptCache:
+    return TranscriptCache(get_settings().TRANSCRIPT_CACHE_MAX_CHARS)
+
+
+async def _athread_messages(thread_id: str) -> list["BaseMessage"]:
+    # Imported on first use: the UI renders its first page before the checkpoint stack is loaded
+    from .checkpoints import get_checkpointer
+
+    config: "RunnableConfig" = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    checkpoint = await get_checkpointer().aget_tuple(config)
+    if checkpoint is None:
+        return []
+    messages: list[Any] = checkpoint.checkpoint["channel_values"].get("messages", [])
+    return messages
+
+
+async def areference(role: str, thread_id: str, text: str) -> TranscriptEntry:
+    # Called once a reply is complete: points at it if it is the latest message of its thread
+    messages = await _athread_messages(thread_id)
+    if messages and messages[-1].id and messages[-1].text == text:
+        get_transcript_cache().put(messages[-1].id, text)
+        return TranscriptEntry(role=role, thread_id=thread_id, message_id=messages[-1].id)
+    return TranscriptEntry(role=role, text=text)
+
+
+async def aload(entries: list[TranscriptEntry]) -> list[str]:
+    # One checkpoint read per thread that has messages missing from the cache
+    cache = get_transcript_cache()
+    texts = {entry.message_id: cache.get(entry.message_id) for entry in entries if entry.message_id}
+    missing = {
+        entry.thread_id for entry in entries if entry.thread_id and entry.message_id and texts[entry.message_id] is None
+    }
+    for thread_id in missing:
+        for message in await _athread_messages(thread_id):
+            if message.id in texts and texts[message.id] is None:
+                texts[message.id] = message.text
+                cache.put(message.id, message.text)
+    return [
+        (entry.text or "") if entry.message_id is None else texts[entry.message_id] or "*(no longer stored)*"
+        for entry in entries
+    ]
+
+
+def reference(role: str, thread_id: str, text: str) -> TranscriptEntry:
+    return run_sync(areference(role, thread_id, text))
+
+
+def load(entries: list[TranscriptEntry]) -> list[str]:
+    return run_sync(aload(entries))
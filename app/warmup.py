@@ -0,0 +1,104 @@
+import importlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from .config import get_settings
+from .constants import LLMModel
+from .prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+
+logger = logging.getLogger(__name__)
+
+
+class Prewarmer:
+    # Does on a background thread what the first message would otherwise wait for: importing the LLM and
+    # checkpoint stacks, opening the checkpoint database and, once there is an API key, compiling the agents
+    # into the pool, where `add_agent` finds them. Each configuration is warmed once per process.
+
+    def __init__(self, max_configurations: int) -> None:
+        self.max_configurations = max_configurations
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="forkflux-prewarm")
+        self._warmed: OrderedDict[tuple[str, ...], Future[None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        generator_model: LLMModel,
+        critic_model: LLMModel,
+        api_key: str | None = None,
+        fast_model: LLMModel | None = None,
+        temperature: float = 0.7,
+    ) -> Future[None]:
+        # Lazily, since httpx comes with it
+        from .http_clients import api_key_fingerprint
+
+        key = (
+            LLMModel(generator_model).value,
+            LLMModel(critic_model).value,
+            api_key_fingerprint(api_key) if api_key else "",
+            LLMModel(fast_model).value if fast_model is not None else "",
+            str(temperature),
+        )
+        with self._lock:
+            if key not in self._warmed:
+                self._warmed[key] = self._executor.submit(
+                    self._warm, generator_model, critic_model, api_key, fast_model, temperature
+                )
+                while len(self._warmed) > self.max_configurations:
+                    self._warmed.popitem(last=False)
+            self._warmed.move_to_end(key)
+            return self._warmed[key]
+
+    def _warm(
+        self,
+        generator_model: LLMModel,
+        critic_model: LLMModel,
+        api_key: str | None,
+        fast_model: LLMModel | None,
+        temperature: float,
+    ) -> None:
+        try:
+            # The UI script imports these lazily, so its first page renders before they load
+            importlib.import_module("app.orchestrator")
+            from .checkpoints import get_checkpointer
+            from .pool import get_agent_pool
+
+            get_checkpointer()
+            if api_key is None:
+                if get_settings().LLM_BACKEND == "openai":
+                    # init_chat_model imports the provider package on first use
+                    importlib.import_module("langchain_openai")
+                return
+            pool = get_agent_pool()
+            pool.acquire(
+                api_key=api_key, system_prompt=GENERATOR_SYSTEM_PROMPT, model=generator_model, temperature=temperature
+            )
+            pool.acquire(
+                api_key=api_key,
+                system_prompt=CRITIC_SYSTEM_PROMPT,
+                model=critic_model,
+                temperature=temperature,
+                fast_model=fast_model,
+            )
+        except Exception:
+            # Nothing is lost: the first message builds whatever is missing and reports the error
+            logger.warning("Pre-warming the agents failed", exc_info=True)
+
+
+@lru_cache
+def get_prewarmer() -> Prewarmer:
+    return Prewarmer(max_configurations=get_settings().AGENT_POOL_MAX_SIZE)
+
+
+def prewarm(
+    generator_model: LLMModel,
+    critic_model: LLMModel,
+    api_key: str | None = None,
+    fast_model: LLMModel | None = None,
+    temperature: float = 0.7,
+) -> Future[None] | None:
+    if not get_settings().AGENT_PREWARM_ENABLED:
+        return None
+    return get_prewarmer().submit(generator_model, critic_model, api_key, fast_model, temperature)
@@ -0,0 +1,117 @@
+"""Throughput of the HTTP API as worker processes are added, against the offline fake model.
+
+Starts `python -m app.api --workers W` for every W in --workers, all on one checkpoint database, and drives K
+concurrent sessions x N talk/redirect rounds through it. With the default `--latency 0` a call is all our own
+CPU work (routing, graph invocation, checkpoint writes), which one process can't spread over cores, so the
+calls/s should grow about linearly with the workers up to the number of cores.
+
+    python -m benchmarks.api_load --workers 1 2 4 --sessions 64 --rounds 3
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+
+import httpx
+
+AUTH = {"Authorization": "Bearer sk-load"}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, server: subprocess.Popen[bytes], timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"The server exited with {server.returncode}")
+        try:
+            httpx.get(url + "/sessions/none", headers=AUTH, timeout=1)
+            return
+        except httpx.TransportError:
+            time.sleep(0.2)
+    raise RuntimeError("The server did not come up")
+
+
+async def run_session(client: httpx.AsyncClient, rounds: int, latencies: list[float], errors: list[str]) -> None:
+    response = await client.post("/sessions", json={"main_task": "Write a rollout plan."}, headers=AUTH)
+    session_id = response.json()["session_id"]
+
+    async def call(path: str, body: dict[str, str] | None = None) -> None:
+        started = time.perf_counter()
+        response = await client.post(f"/sessions/{session_id}/{path}", json=body, headers=AUTH)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors.append(str(response.status_code))
+
+    await call("talk", {"input": "Write a rollout plan for the new billing service."})
+    for _ in range(rounds):
+        await call("redirect")
+        await call("redirect")
+
+
+async def drive(url: str, sessions: int, rounds: int) -> tuple[float, list[float], list[str]]:
+    latencies: list[float] = []
+    errors: list[str] = []
+    limits = httpx.Limits(max_connections=sessions, max_keepalive_connections=sessions)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=300) as client:
+        # Compiles the agents in every worker, or at least most of them, before the clock starts
+        await asyncio.gather(*(run_session(client, 0, [], []) for _ in range(sessions)))
+        started = time.perf_counter()
+        await asyncio.gather(*(run_session(client, rounds, latencies, errors) for _ in range(sessions)))
+        return time.perf_counter() - started, latencies, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.0, help="fake model time to first token, seconds")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.sessions} sessions x {1 + 2 * args.rounds} calls")
+    baseline = None
+    for workers in args.workers:
+        port = free_port()
+        env = {
+            **os.environ,
+            "CHECKPOINT_STORAGE_PATH": os.path.join(tempfile.mkdtemp(prefix="forkflux-api-"), "api.db"),
+            "LLM_BACKEND": "fake",
+            "FAKE_LLM_LATENCY": "fixed",
+            "FAKE_LLM_LATENCY_SECONDS": str(args.latency),
+            "FAKE_LLM_TOKENS_PER_SECOND": "0",
+        }
+        server = subprocess.Popen(  # nosec B603
+            [sys.executable, "-m", "app.api", "--port", str(port), "--workers", str(workers)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            url = f"http://127.0.0.1:{port}"
+            wait_until_up(url, server)
+            elapsed, latencies, errors = asyncio.run(drive(url, args.sessions, args.rounds))
+        finally:
+            server.terminate()
+            server.wait()
+        throughput = len(latencies) / elapsed
+        baseline = baseline or throughput / workers
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0.0
+        print(
+            f"  {workers} worker(s): {throughput:.1f} calls/s, {throughput / baseline / workers:.0%} of linear, "
+            f"p95 {p95 * 1000:.0f} ms, {len(errors)} errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
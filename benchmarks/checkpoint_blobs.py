@@ -0,0 +1,101 @@
+"""Checkpoint database size and bytes written per turn with and without the message blob store.
+
+Runs the same K sessions x N generator/critic rounds against the offline fake model twice, once with
+CHECKPOINT_BLOBS=false and once with it on, each on a fresh database with every checkpoint kept, and compares
+the database size and the bytes stored per agent turn.
+
+    python -m benchmarks.checkpoint_blobs --sessions 10 --rounds 8 --output-tokens 400
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Any
+
+
+def stored_bytes(path: str) -> dict[str, int]:
+    with sqlite3.connect(path) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        sizes = {
+            "checkpoints": conn.execute("SELECT COALESCE(SUM(length(checkpoint)), 0) FROM checkpoints").fetchone()[0],
+            "writes": conn.execute("SELECT COALESCE(SUM(length(value)), 0) FROM writes").fetchone()[0],
+            "blobs": 0,
+        }
+        if "checkpoint_blobs" in tables:
+            sizes["blobs"] = conn.execute("SELECT COALESCE(SUM(length(data)), 0) FROM checkpoint_blobs").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return {**sizes, "file": page_count * page_size}
+
+
+def run(blobs: bool, sessions: int, rounds: int) -> dict[str, Any]:
+    from app.config import get_settings
+    from app.constants import Agent, LLMModel
+    from app.orchestrator import ManualOrchestrator
+    from app.pool import get_agent_pool
+    from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+
+    settings = get_settings()
+    settings.CHECKPOINT_STORAGE_PATH = os.path.join(tempfile.mkdtemp(prefix="forkflux-blobs-"), "blobs.db")
+    settings.CHECKPOINT_BLOBS = blobs
+    # Agents hold the checkpointer they were built with
+    get_agent_pool().clear()
+
+    turns = 0
+    started = time.perf_counter()
+    for session in range(sessions):
+        orchestrator = ManualOrchestrator()
+        orchestrator.set_llm_api_key("sk-bench")
+        orchestrator.set_main_task("Write a rollout plan for the new billing service. " * 4)
+        orchestrator.add_agent(name=Agent.GENERATOR, system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+        orchestrator.add_agent(name=Agent.CRITIC, system_prompt=CRITIC_SYSTEM_PROMPT, model=LLMModel.GPT_5)
+        feedback, context_from = orchestrator.main_task, None
+        for _ in range(rounds):
+            draft = orchestrator.talk_to(Agent.GENERATOR, feedback, f"generator-{session}", context_from)
+            feedback = orchestrator.talk_to(Agent.CRITIC, draft, f"critic-{session}", Agent.GENERATOR)
+            context_from = Agent.CRITIC
+            turns += 2
+    elapsed = time.perf_counter() - started
+    sizes = stored_bytes(settings.CHECKPOINT_STORAGE_PATH)
+    stored = sizes["checkpoints"] + sizes["writes"] + sizes["blobs"]
+    return {**sizes, "turns": turns, "per_turn": stored / turns, "ms_per_turn": elapsed / turns * 1000}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--output-tokens", type=int, default=400)
+    args = parser.parse_args()
+
+    os.environ.update(
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY="fixed",
+        FAKE_LLM_LATENCY_SECONDS="0",
+        FAKE_LLM_TOKENS_PER_SECOND="0",
+        FAKE_LLM_OUTPUT_TOKENS=str(args.output_tokens),
+        # Every checkpoint is kept, so the stored bytes are the bytes written
+        CHECKPOINT_KEEP_HISTORY="true",
+    )
+    logging.getLogger("app.middleware").setLevel(logging.WARNING)
+
+    results = {mode: run(mode == "blobs", args.sessions, args.rounds) for mode in ("inline", "blobs")}
+    for mode, result in results.items():
+        print(
+            f"{mode:>6}: {result['file'] / 1e6:.2f} MB database, {result['per_turn'] / 1e3:.1f} kB stored per turn "
+            f"(checkpoints {result['checkpoints'] / 1e6:.2f} MB, writes {result['writes'] / 1e6:.2f} MB, "
+            f"blobs {result['blobs'] / 1e6:.2f} MB), {result['ms_per_turn']:.1f} ms/turn"
+        )
+    inline, blobs = results["inline"], results["blobs"]
+    print(
+        f"blobs: database {inline['file'] / blobs['file']:.1f}x smaller, "
+        f"{inline['per_turn'] / blobs['per_turn']:.1f}x fewer bytes written per turn"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Throughput of the async orchestrator core as the number of concurrent sessions grows.
+
+Runs offline against a fake chat model with a fixed per-call latency, so the numbers show how well
+one process overlaps in-flight requests rather than how fast the provider is.
+
+    python -m benchmarks.concurrency --sessions 1 10 50 100 200 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import Any
+
+
+async def run_round(orchestrator: Any, sessions: int, rounds: int) -> float:
+    from app.constants import Agent
+
+    async def session(i: int) -> None:
+        for _ in range(rounds):
+            await orchestrator.atalk_to(agent_name=Agent.GENERATOR, input_text="Draft it", thread_id=f"s{sessions}-{i}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(session(i) for i in range(sessions)))
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5, help="fake model latency per call, seconds")
+    args = parser.parse_args()
+
+    os.environ.update(
+        CHECKPOINT_STORAGE_PATH=os.path.join(tempfile.mkdtemp(prefix="forkflux-bench-"), "bench.db"),
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY="fixed",
+        FAKE_LLM_LATENCY_SECONDS=str(args.latency),
+        FAKE_LLM_TOKENS_PER_SECOND="0",
+        FAKE_LLM_OUTPUT_TOKENS="20",
+    )
+
+    from app.constants import Agent, LLMModel
+    from app.orchestrator import ManualOrchestrator
+    from app.prompts import GENERATOR_SYSTEM_PROMPT
+    from app.runtime import run_sync
+
+    orchestrator = ManualOrchestrator()
+    orchestrator.set_llm_api_key("sk-bench")
+    orchestrator.set_main_task("Benchmark task")
+    orchestrator.add_agent(name=Agent.GENERATOR, system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+
+    print(f"{'sessions':>8} {'calls':>7} {'seconds':>8} {'calls/s':>8} {'speedup':>8}")
+    for sessions in args.sessions:
+        elapsed = run_sync(run_round(orchestrator, sessions, args.rounds))
+        calls = sessions * args.rounds
+        serial = calls * args.latency
+        print(f"{sessions:>8} {calls:>7} {elapsed:>8.2f} {calls / elapsed:>8.1f} {serial / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Connection reuse across agent sessions, against a local OpenAI-compatible stub server.
+
+Runs K sessions x N calls through AgentSession, at most C sessions at a time as users come and go, in three
+client modes and counts the TCP connections the stub
+accepts in each:
+
+    shared       one process-wide client for the endpoint and key (HTTP_SHARED_CLIENTS=true, the default)
+    per-session  every session brings its own key, so every session opens its own connection pool
+    provider     HTTP_SHARED_CLIENTS=false, the provider SDK's default client
+
+A loopback connection is nearly free, so `--handshake` makes the stub hold every new connection for a while
+before serving it, standing in for the TCP and TLS round trips to a real provider.
+
+    python -m benchmarks.http_pooling --sessions 50 --concurrency 10 --calls 5 --latency 0.05 --handshake 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, latency: float, handshake: float) -> None:
+        self.latency = latency
+        self.handshake = handshake
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), StubHandler)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def count(self, attribute: str) -> None:
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + 1)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a client that reuses its connections shows up as fewer connections
+    protocol_version = "HTTP/1.1"
+    server: StubServer
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.count("connections")
+        time.sleep(self.server.handshake)
+
+    def do_POST(self) -> None:
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.count("requests")
+        time.sleep(self.server.latency)
+        message = {"role": "assistant", "content": "ok"}
+        usage = {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11}
+        if request.get("stream"):
+            chunks = [
+                {"choices": [{"index": 0, "delta": message, "finish_reason": None}]},
+                {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage},
+            ]
+            body = (
+                "".join(
+                    f"data: {json.dumps({'id': 'stub', 'object': 'chat.completion.chunk', 'created': 0, 'model': request['model'], **chunk})}\n\n"
+                    for chunk in chunks
+                ).encode()
+                + b"data: [DONE]\n\n"
+            )
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps(
+                {
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": request["model"],
+                    "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+                    "usage": usage,
+                }
+            ).encode()
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+def run_mode(
+    mode: str, sessions: int, concurrency: int, calls: int, latency: float, handshake: float
+) -> dict[str, Any]:
+    from langchain.messages import HumanMessage
+
+    from app.agents import AgentSession
+    from app.constants import LLMModel
+    from app.runtime import run_sync
+
+    # Per-call logging would dominate the time being measured
+    logging.getLogger("app.middleware").setLevel(logging.WARNING)
+
+    server = StubServer(latency, handshake)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    AgentSession.settings.OPENAI_BASE_URL = server.base_url
+    AgentSession.settings.HTTP_SHARED_CLIENTS = mode != "provider"
+    # Distinct prompts, so no two sessions share a compiled agent
+    agents = [
+        AgentSession(
+            api_key=f"sk-{mode}-{i}" if mode == "per-session" else "sk-bench",
+            system_prompt=f"You are session {i}.",
+            model=LLMModel.GPT_4_1,
+        )
+        for i in range(sessions)
+    ]
+
+    latencies: list[float] = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def session(i: int) -> None:
+        async with slots:
+            for call in range(calls):
+                started = time.perf_counter()
+                await agents[i].agent.ainvoke(
+                    {"agent_name": f"session-{i}", "main_task": "bench", "messages": [HumanMessage(f"call {call}")]},
+                    {"configurable": {"thread_id": f"{mode}-{i}"}},
+                )
+                latencies.append(time.perf_counter() - started)
+
+    async def run() -> float:
+        started = time.perf_counter()
+        await asyncio.gather(*(session(i) for i in range(sessions)))
+        return time.perf_counter() - started
+
+    elapsed = run_sync(run())
+    server.shutdown()
+    return {
+        "mode": mode,
+        "requests": server.requests,
+        "connections": server.connections,
+        "seconds": elapsed,
+        "mean": statistics.fmean(latencies),
+        "p95": statistics.quantiles(latencies, n=20, method="inclusive")[-1],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub server time per request, seconds")
+    parser.add_argument("--handshake", type=float, default=0.1, help="stub server time per new connection, seconds")
+    args = parser.parse_args()
+
+    os.environ.update(
+        CHECKPOINT_STORAGE_PATH=os.path.join(tempfile.mkdtemp(prefix="forkflux-http-"), "http.db"),
+        LLM_BACKEND="openai",
+        METRICS_ENABLED="false",
+    )
+
+    # Pay for imports and first-call setup outside the measured runs
+    run_mode("warmup", 1, 1, 2, 0, 0)
+
+    print(
+        f"{args.sessions} sessions x {args.calls} calls, {args.concurrency} at a time, stub latency {args.latency * 1000:.0f} ms, "
+        f"handshake {args.handshake * 1000:.0f} ms"
+    )
+    for mode in ("shared", "per-session", "provider"):
+        result = run_mode(mode, args.sessions, args.concurrency, args.calls, args.latency, args.handshake)
+        print(
+            f"  {mode:<12} {result['connections']:>4} connections for {result['requests']} requests, "
+            f"mean {result['mean'] * 1000:.1f} ms, p95 {result['p95'] * 1000:.1f} ms, total {result['seconds']:.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
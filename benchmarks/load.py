@@ -0,0 +1,160 @@
+"""Load test of the orchestrator against the offline fake model.
+
+Drives K concurrent sessions x N generator/critic rounds through ManualOrchestrator, the same path the UI takes,
+and reports call latency percentiles, throughput, checkpoint database growth and peak RSS. With `--latency 0`
+the numbers are our own overhead: graph invocation, middleware, prompt formatting and checkpoint writes.
+
+    python -m benchmarks.load --sessions 50 --rounds 5 --latency 0.2 --json results.json
+    python -m benchmarks.load --baseline results.json  # exits 1 if p95, throughput or RSS regressed
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any
+
+
+def database_size(path: str) -> int:
+    return sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+
+
+def percentile(values: list[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+async def run_session(orchestrator: Any, session: int, rounds: int, latencies: list[float], errors: list[str]) -> None:
+    from app.constants import Agent
+
+    async def call(agent_name: str, input_text: str, context_from: str | None) -> str:
+        started = time.perf_counter()
+        try:
+            return await orchestrator.atalk_to(agent_name, input_text, f"{agent_name}-{session}", context_from)
+        except Exception as e:
+            errors.append(type(e).__name__)
+            return input_text
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    feedback = orchestrator.main_task
+    for round_ in range(rounds):
+        draft = await call(Agent.GENERATOR, feedback, Agent.CRITIC if round_ else None)
+        feedback = await call(Agent.CRITIC, draft, Agent.GENERATOR)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake model time to first token, seconds")
+    parser.add_argument("--distribution", default="lognormal", choices=["fixed", "uniform", "lognormal", "exponential"])
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="0 returns the whole answer at once")
+    parser.add_argument("--output-tokens", type=int, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--scheduler", action="store_true", help="queue and retry calls (SCHEDULER_ENABLED)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against results written by a previous --json run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression vs the baseline")
+    args = parser.parse_args()
+
+    checkpoint_path = os.path.join(tempfile.mkdtemp(prefix="forkflux-load-"), "load.db")
+    os.environ.update(
+        CHECKPOINT_STORAGE_PATH=checkpoint_path,
+        LLM_BACKEND="fake",
+        FAKE_LLM_LATENCY=args.distribution,
+        FAKE_LLM_LATENCY_SECONDS=str(args.latency),
+        FAKE_LLM_TOKENS_PER_SECOND=str(args.tokens_per_second),
+        FAKE_LLM_OUTPUT_TOKENS=str(args.output_tokens),
+        FAKE_LLM_FAILURE_RATE=str(args.failure_rate),
+        FAKE_LLM_SEED=str(args.seed),
+        SCHEDULER_ENABLED=str(args.scheduler).lower(),
+    )
+
+    from app.constants import Agent, LLMModel
+    from app.metrics import get_metrics
+    from app.orchestrator import ManualOrchestrator
+    from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+    from app.runtime import run_sync
+
+    # Per-call logging would dominate the overhead being measured
+    logging.getLogger("app.middleware").setLevel(logging.WARNING)
+
+    orchestrators = []
+    for _ in range(args.sessions):
+        orchestrator = ManualOrchestrator()
+        orchestrator.set_llm_api_key("sk-load")
+        orchestrator.set_main_task("Write a rollout plan for the new billing service.")
+        orchestrator.add_agent(name=Agent.GENERATOR, system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+        orchestrator.add_agent(name=Agent.CRITIC, system_prompt=CRITIC_SYSTEM_PROMPT, model=LLMModel.GPT_5)
+        orchestrators.append(orchestrator)
+
+    latencies: list[float] = []
+    errors: list[str] = []
+
+    async def run() -> float:
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                run_session(orchestrator, i, args.rounds, latencies, errors)
+                for i, orchestrator in enumerate(orchestrators)
+            )
+        )
+        return time.perf_counter() - started
+
+    size_before = database_size(checkpoint_path)
+    elapsed = run_sync(run())
+    model_seconds = get_metrics().histogram_total("model_call_seconds")
+
+    results = {
+        "calls": len(latencies),
+        "errors": len(errors),
+        "seconds": elapsed,
+        "throughput": len(latencies) / elapsed,
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        # End-to-end time per call that isn't spent waiting on the model
+        "overhead_mean": (sum(latencies) - model_seconds.sum) / len(latencies) if latencies else 0.0,
+        "db_growth_bytes": database_size(checkpoint_path) - size_before,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+
+    print(f"{args.sessions} sessions x {args.rounds} rounds, {results['calls']} calls, {results['errors']} errors")
+    print(f"  {results['seconds']:.2f} s, {results['throughput']:.1f} calls/s")
+    print(
+        f"  latency p50 {results['p50'] * 1000:.1f} ms, p95 {results['p95'] * 1000:.1f} ms, "
+        f"p99 {results['p99'] * 1000:.1f} ms, overhead {results['overhead_mean'] * 1000:.1f} ms/call"
+    )
+    print(
+        f"  checkpoint db +{results['db_growth_bytes'] / 1e6:.2f} MB, peak RSS {results['peak_rss_bytes'] / 1e6:.0f} MB"
+    )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = [
+            f"{key}: {baseline[key]:.4g} -> {results[key]:.4g}"
+            for key, higher_is_worse in (("p95", True), ("throughput", False), ("peak_rss_bytes", True))
+            if (results[key] - baseline[key]) * (1 if higher_is_worse else -1) > args.tolerance * baseline[key]
+        ]
+        if regressions:
+            print("Regressed against the baseline:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
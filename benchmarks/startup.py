@@ -0,0 +1,126 @@
+"""Cold start of the UI: import time before the first page renders, and time to the first response.
+
+Every measurement runs in a fresh interpreter. The import totals come from `python -X importtime` for the modules
+the UI script imports before it renders, next to what it imported when it loaded the orchestrator eagerly. Time to
+first response is measured against the offline fake model, from submitting the main task to the first streamed
+token. It is measured with and without the background pre-warm, which runs while the user is typing
+(--think-seconds). The pre-warmed figure depends on whether the pre-warm finished in that time: a message sent
+sooner still waits for the rest of it, so the pre-warm's own duration is printed next to it.
+
+    python -m benchmarks.startup --runs 3 --think-seconds 2
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+# What app/main.py imports before its first page, and what it used to import
+UI_MODULES = ["streamlit", "app.config", "app.transcript", "app.warmup"]
+EAGER_MODULES = ["streamlit", "app.config", "app.orchestrator", "app.transcript"]
+
+
+def import_seconds(modules: list[str]) -> tuple[float, list[tuple[float, str]]]:
+    # The total is the sum of the top-level imports' cumulative times
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    total, heaviest = 0.0, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        seconds = int(cumulative) / 1e6
+        heaviest.append((seconds, name.strip()))
+        if not name[1:].startswith(" "):
+            total += seconds
+    return total, sorted(heaviest, reverse=True)
+
+
+def first_response(prewarmed: bool, think_seconds: float) -> dict[str, float]:
+    # Runs in the child interpreter, in the order the UI script does it
+    started = time.perf_counter()
+    from app.constants import Agent, LLMModel
+    from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+    from app.warmup import prewarm
+
+    rendered = time.perf_counter()
+    warmed: list[float] = []
+    if prewarmed and (future := prewarm(LLMModel.GPT_4_1, LLMModel.GPT_5, "sk-bench")) is not None:
+        future.add_done_callback(lambda _: warmed.append(time.perf_counter()))
+    time.sleep(think_seconds)
+
+    submitted = time.perf_counter()
+    from app.orchestrator import ManualOrchestrator
+
+    orchestrator = ManualOrchestrator()
+    orchestrator.set_llm_api_key("sk-bench")
+    orchestrator.set_main_task("Write a rollout plan for the new billing service.")
+    orchestrator.add_agent(name=Agent.GENERATOR, system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+    orchestrator.add_agent(name=Agent.CRITIC, system_prompt=CRITIC_SYSTEM_PROMPT, model=LLMModel.GPT_5)
+    next(orchestrator.stream_to(Agent.GENERATOR, orchestrator.main_task, "generator"))
+    first_token = time.perf_counter()
+    return {
+        "render": rendered - started,
+        "first_response": first_token - submitted,
+        "prewarm": warmed[0] - rendered if warmed else 0.0,
+    }
+
+
+def run_child(prewarmed: bool, think_seconds: float) -> dict[str, float]:
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY": "fixed",
+        "FAKE_LLM_LATENCY_SECONDS": "0",
+        "FAKE_LLM_TOKENS_PER_SECOND": "0",
+        "CHECKPOINT_STORAGE_PATH": os.path.join(tempfile.mkdtemp(prefix="forkflux-startup-"), "startup.db"),
+        "AGENT_PREWARM_ENABLED": "true",
+    }
+    command = [sys.executable, "-m", "benchmarks.startup", "--child", "prewarmed" if prewarmed else "cold"]
+    result = subprocess.run(
+        [*command, "--think-seconds", str(think_seconds)], capture_output=True, text=True, check=True, env=env
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--think-seconds", type=float, default=2.0)
+    parser.add_argument("--top", type=int, default=5, help="heaviest imports to list")
+    parser.add_argument("--child", choices=["cold", "prewarmed"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(first_response(args.child == "prewarmed", args.think_seconds)))
+        return
+
+    for label, modules in (("eager", EAGER_MODULES), ("lazy", UI_MODULES)):
+        totals = [import_seconds(modules) for _ in range(args.runs)]
+        print(f"{label:>9} imports: {statistics.median(total for total, _ in totals):.2f} s")
+        for seconds, name in totals[-1][1][: args.top]:
+            print(f"{'':>11}{seconds:6.2f} s  {name}")
+
+    results: dict[str, list[dict[str, Any]]] = {}
+    for mode in ("cold", "prewarmed"):
+        results[mode] = [run_child(mode == "prewarmed", args.think_seconds) for _ in range(args.runs)]
+        first = statistics.median(result["first_response"] for result in results[mode])
+        render = statistics.median(result["render"] for result in results[mode])
+        line = f"{mode:>9}: {render:.2f} s to render, {first:.2f} s from submit to first token"
+        if mode == "prewarmed":
+            prewarm = statistics.median(result["prewarm"] for result in results[mode])
+            line += f" (pre-warm took {prewarm:.2f} s of the {args.think_seconds:g} s think time)"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,15 @@
 import pytest
 from langchain_community.cache import SQLiteCache
 from langchain_core.globals import set_llm_cache
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
 
 from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
 
+from .eval_runner import LLM_CACHE_PATH, build_chain
+
 
 @pytest.fixture(scope="session", autouse=True)
 def set_llm_cache_for_session():
-    cache_db_file = ".langchain.db"
-    set_llm_cache(SQLiteCache(database_path=cache_db_file))
+    set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
 
     yield
 
@@ -20,13 +18,9 @@ def set_llm_cache_for_session():
 
 @pytest.fixture(scope="session")
 def critic_chain():
-    llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.7)
-    prompt_template = ChatPromptTemplate.from_messages([("system", CRITIC_SYSTEM_PROMPT), ("human", "{input_text}")])
-    return prompt_template | llm | StrOutputParser()
+    return build_chain(CRITIC_SYSTEM_PROMPT)
 
 
 @pytest.fixture(scope="session")
 def generator_chain():
-    llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.7)
-    prompt_template = ChatPromptTemplate.from_messages([("system", GENERATOR_SYSTEM_PROMPT), ("human", "{input_text}")])
-    return prompt_template | llm | StrOutputParser()
+    return build_chain(GENERATOR_SYSTEM_PROMPT)
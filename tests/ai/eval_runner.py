@@ -0,0 +1,237 @@
+"""Concurrent, sharded runner for the golden eval suites.
+
+Generates every output of a shard concurrently, then measures the judge metrics concurrently. Judge results are
+cached on disk by (metric config, input, output), so a rerun only pays for outputs that changed. Shards split the
+datasets by a stable hash of the spec id, either across CI jobs (EVAL_SHARD=<index>/<count> for pytest) or across
+local worker processes. The pytest suites still assert through deepeval's `assert_test`, with
+`judge_metric.CachedMetric` replaying the judgement made up front, so `deepeval test run` reports every test case.
+
+    python -m tests.ai.eval_runner --workers 4 --max-concurrency 8
+"""
+
+import argparse
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from enum import Enum
+from typing import Any, Callable, Sequence
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import Runnable
+from langchain_openai import ChatOpenAI
+
+LLM_CACHE_PATH = ".langchain.db"
+JUDGE_CACHE_PATH = os.environ.get("EVAL_JUDGE_CACHE_PATH", ".deepeval-judge.db")
+
+
+@dataclass
+class EvalResult:
+    spec_id: str
+    metric: str
+    score: float | None
+    threshold: float
+    success: bool
+    reason: str | None
+    actual_output: str
+    cached: bool = False
+
+
+def build_chain(system_prompt: str) -> Runnable[dict[str, str], str]:
+    llm = ChatOpenAI(model="gpt-4.1-mini", temperature=0.7)
+    prompt_template = ChatPromptTemplate.from_messages([("system", system_prompt), ("human", "{input_text}")])
+    return prompt_template | llm | StrOutputParser()
+
+
+def build_test_case(spec: dict[str, Any], actual_output: str) -> Any:
+    from deepeval.test_case import LLMTestCase
+
+    return LLMTestCase(
+        input=spec.get("test_case_input", spec["input"]), actual_output=actual_output, context=spec.get("context")
+    )
+
+
+def shard_of(spec_id: str, count: int) -> int:
+    # crc32 rather than hash(), which is salted per process
+    return zlib.crc32(spec_id.encode()) % count
+
+
+def select_shard(specs: Sequence[dict[str, Any]], index: int, count: int) -> list[dict[str, Any]]:
+    return [spec for spec in specs if shard_of(spec["id"], count) == index]
+
+
+def shard_from_env() -> tuple[int, int]:
+    index, _, count = os.environ.get("EVAL_SHARD", "0/1").partition("/")
+    return int(index), int(count)
+
+
+def metric_config(metric: Any) -> dict[str, Any]:
+    # A metric's configuration is what it was constructed with; other attributes are state set while measuring
+    parameters = inspect.signature(type(metric).__init__).parameters
+    config = {key: value for key in parameters if key != "self" and _is_plain(value := getattr(metric, key, None))}
+    config["type"] = type(metric).__name__
+    config["model"] = getattr(metric, "evaluation_model", None)
+    return config
+
+
+def judge_cache_key(metric: Any, test_case: Any) -> str:
+    payload = json.dumps(
+        [
+            metric_config(metric),
+            test_case.input,
+            hashlib.sha256(test_case.actual_output.encode()).hexdigest(),
+            getattr(test_case, "context", None),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _is_plain(value: Any) -> bool:
+    if isinstance(value, (list, tuple)):
+        return all(_is_plain(item) for item in value)
+    return value is None or isinstance(value, (str, int, float, bool, Enum))
+
+
+class JudgeCache:
+    def __init__(self, path: str = JUDGE_CACHE_PATH) -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS judgements (key TEXT PRIMARY KEY, score REAL, success INTEGER, reason TEXT)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> tuple[float | None, bool, str | None] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT score, success, reason FROM judgements WHERE key = ?", (key,)).fetchone()
+        return None if row is None else (row[0], bool(row[1]), row[2])
+
+    def put(self, key: str, score: float | None, success: bool, reason: str | None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO judgements (key, score, success, reason) VALUES (?, ?, ?, ?)",
+                (key, score, int(success), reason),
+            )
+            self._conn.commit()
+
+
+async def arun_suite(
+    chain: Runnable[dict[str, str], str],
+    specs: Sequence[dict[str, Any]],
+    build_test_case: Callable[[dict[str, Any], str], Any],
+    judge_cache: JudgeCache | None = None,
+    max_concurrency: int = 8,
+) -> list[EvalResult]:
+    outputs = await chain.abatch(
+        [{"input_text": spec["input"]} for spec in specs], config={"max_concurrency": max_concurrency}
+    )
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def judge(spec: dict[str, Any], actual_output: str) -> EvalResult:
+        metric, test_case = spec["metric"], build_test_case(spec, actual_output)
+        key = judge_cache_key(metric, test_case)
+        result = EvalResult(
+            spec_id=spec["id"],
+            metric=getattr(metric, "__name__", type(metric).__name__),
+            score=None,
+            threshold=metric.threshold,
+            success=False,
+            reason=None,
+            actual_output=actual_output,
+        )
+        if judge_cache is not None and (cached := judge_cache.get(key)) is not None:
+            result.score, result.success, result.reason = cached
+            result.cached = True
+            return result
+        async with semaphore:
+            await metric.a_measure(test_case, _show_indicator=False)
+        result.score, result.success, result.reason = metric.score, metric.is_successful(), metric.reason
+        if judge_cache is not None:
+            judge_cache.put(key, result.score, result.success, result.reason)
+        return result
+
+    return list(await asyncio.gather(*(judge(spec, output) for spec, output in zip(specs, outputs))))
+
+
+def run_specs(chain: Runnable[dict[str, str], str], specs: Sequence[dict[str, Any]]) -> dict[str, EvalResult]:
+    # For the pytest suites: the whole shard is generated and judged up front, filling the judge cache; each test
+    # then asserts its own result through `assert_spec`
+    results = asyncio.run(arun_suite(chain, specs, build_test_case, JudgeCache()))
+    return {result.spec_id: result for result in results}
+
+
+def assert_spec(spec: dict[str, Any], result: EvalResult) -> None:
+    from deepeval import assert_test
+
+    from .judge_metric import CachedMetric
+
+    assert_test(build_test_case(spec, result.actual_output), [CachedMetric(spec["metric"], JudgeCache())])
+
+
+def run_shard(suite: str, index: int, count: int, max_concurrency: int) -> list[EvalResult]:
+    # Runs in a worker process: datasets hold live metric objects, so each worker imports its own copy
+    from langchain_community.cache import SQLiteCache
+    from langchain_core.globals import set_llm_cache
+
+    from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+
+    from .eval_datasets.critic_golden_dataset import critic_golden_dataset
+    from .eval_datasets.generator_golden_dataset import generator_golden_dataset
+
+    set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+    suites = {
+        "critic": (CRITIC_SYSTEM_PROMPT, critic_golden_dataset),
+        "generator": (GENERATOR_SYSTEM_PROMPT, generator_golden_dataset),
+    }
+    system_prompt, dataset = suites[suite]
+    specs = select_shard(dataset, index, count)
+    if not specs:
+        return []
+    return asyncio.run(arun_suite(build_chain(system_prompt), specs, build_test_case, JudgeCache(), max_concurrency))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=["critic", "generator", "all"], default="all")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="in-flight model calls per worker")
+    parser.add_argument("--json", help="write every result to this file")
+    args = parser.parse_args()
+
+    suites = ["critic", "generator"] if args.suite == "all" else [args.suite]
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [
+            executor.submit(run_shard, suite, index, args.workers, args.max_concurrency)
+            for suite in suites
+            for index in range(args.workers)
+        ]
+        results = [result for future in futures for result in future.result()]
+
+    for result in sorted(results, key=lambda r: r.spec_id):
+        status = "PASS" if result.success else "FAIL"
+        cached = " (cached)" if result.cached else ""
+        print(f"{status} {result.spec_id} {result.metric} {result.score} >= {result.threshold}{cached}")
+        if not result.success:
+            print(f"     {result.reason}")
+    failed = sum(not result.success for result in results)
+    print(f"{len(results) - failed} passed, {failed} failed, {sum(r.cached for r in results)} judged from cache")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
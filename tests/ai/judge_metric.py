@@ -0,0 +1,50 @@
+from typing import Any
+
+from deepeval.metrics import BaseMetric
+
+from .eval_runner import JudgeCache, judge_cache_key
+
+
+class CachedMetric(BaseMetric):
+    # Wraps a dataset metric for `assert_test`: a judgement already in the cache is replayed, anything else is
+    # measured by the wrapped metric and cached. Constructor arguments are kept as attributes of the same name,
+    # which is how deepeval copies metrics.
+
+    def __init__(self, metric: Any, cache: JudgeCache) -> None:
+        self.metric = metric
+        self.cache = cache
+        self.threshold = metric.threshold
+        self.evaluation_model = getattr(metric, "evaluation_model", None)
+        self.include_reason = getattr(metric, "include_reason", True)
+        self.strict_mode = getattr(metric, "strict_mode", False)
+        self.async_mode = getattr(metric, "async_mode", True)
+        self.verbose_mode = False
+        self.evaluation_cost = None
+
+    def measure(self, test_case: Any, *args: Any, **kwargs: Any) -> float | None:
+        key = judge_cache_key(self.metric, test_case)
+        if (cached := self.cache.get(key)) is None:
+            self.metric.measure(test_case, *args, **kwargs)
+            cached = self._store(key)
+        self.score, self.success, self.reason = cached
+        return self.score
+
+    async def a_measure(self, test_case: Any, *args: Any, **kwargs: Any) -> float | None:
+        key = judge_cache_key(self.metric, test_case)
+        if (cached := self.cache.get(key)) is None:
+            await self.metric.a_measure(test_case, *args, **kwargs)
+            cached = self._store(key)
+        self.score, self.success, self.reason = cached
+        return self.score
+
+    def is_successful(self) -> bool:
+        return bool(self.success)
+
+    @property
+    def __name__(self) -> str:
+        return getattr(self.metric, "__name__", type(self.metric).__name__)
+
+    def _store(self, key: str) -> tuple[float | None, bool, str | None]:
+        judgement = (self.metric.score, self.metric.is_successful(), self.metric.reason)
+        self.cache.put(key, *judgement)
+        return judgement
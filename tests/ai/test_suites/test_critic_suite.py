@@ -1,17 +1,17 @@
 import pytest
-from deepeval import assert_test
-from deepeval.test_case import LLMTestCase
 
 from ..eval_datasets.critic_golden_dataset import critic_golden_dataset
+from ..eval_runner import assert_spec, run_specs, select_shard, shard_from_env
 
+specs = select_shard(critic_golden_dataset, *shard_from_env())
 
-@pytest.mark.parametrize("test_spec", [pytest.param(spec, id=spec["id"]) for spec in critic_golden_dataset])
-def test_critic_golden_suite(test_spec: dict, critic_chain):
-    input_text = test_spec["input"]
-    metric = test_spec["metric"]
-    context = test_spec.get("context")
 
-    actual_output = critic_chain.invoke({"input_text": input_text})
+@pytest.fixture(scope="module")
+def critic_results(critic_chain):
+    return run_specs(critic_chain, specs)
 
-    test_case = LLMTestCase(input=input_text, actual_output=actual_output, context=context)
-    assert_test(test_case, [metric])
+
+@pytest.mark.parametrize("test_spec", [pytest.param(spec, id=spec["id"]) for spec in specs])
+def test_critic_golden_suite(test_spec: dict, critic_results):
+    # Judged with the rest of the shard; assert_test replays the judgement into deepeval's report
+    assert_spec(test_spec, critic_results[test_spec["id"]])
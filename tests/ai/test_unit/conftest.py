@@ -0,0 +1,124 @@
+import asyncio
+import time
+from itertools import cycle
+from typing import Any, AsyncIterator, Iterator
+
+import pytest
+from langchain.messages import AIMessage
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+
+from app.agents import AgentSession
+from app.constants import Agent, LLMModel
+from app.metrics import InMemorySink, MetricsRegistry
+from app.orchestrator import ManualOrchestrator
+from app.pool import get_agent_pool
+from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+
+
+class SlowFakeChatModel(GenericFakeChatModel):
+    model_name: str = "fake"
+    latency: float = 0.0
+    token_delay: float = 0.0
+    prompts: Any = None
+
+    def _generate(self, messages: list[BaseMessage], *args: Any, **kwargs: Any) -> ChatResult:
+        if self.prompts is not None:
+            self.prompts.append(messages)
+        return super()._generate(messages, *args, **kwargs)
+
+    async def _agenerate(self, *args: Any, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._generate(*args, **kwargs)
+
+    def _stream(self, *args: Any, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for chunk in super()._stream(*args, **kwargs):
+            time.sleep(self.token_delay)
+            yield chunk
+
+    async def _astream(self, *args: Any, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        for chunk in super()._stream(*args, **kwargs):
+            await asyncio.sleep(self.token_delay)
+            yield chunk
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_storage(tmp_path, monkeypatch):
+    path = tmp_path / "checkpointer.db"
+    monkeypatch.setattr(AgentSession.settings, "CHECKPOINT_STORAGE_PATH", str(path))
+    return path
+
+
+@pytest.fixture(autouse=True)
+def agent_pool():
+    pool = get_agent_pool()
+    pool.clear()
+    yield pool
+    pool.clear()
+
+
+@pytest.fixture(autouse=True)
+def metrics(monkeypatch):
+    registry = MetricsRegistry([InMemorySink()])
+    monkeypatch.setattr("app.agents.get_metrics", lambda: registry)
+    monkeypatch.setattr("app.orchestrator.get_metrics", lambda: registry)
+    return registry
+
+
+class Replies:
+    # Cycles through the replies, raising the ones that are errors; copies messages, since the graph assigns ids
+    # to the messages it stores
+    def __init__(self, replies: list[str | AIMessage | Exception]) -> None:
+        self._replies = cycle(replies)
+
+    def __iter__(self) -> "Replies":
+        return self
+
+    def __next__(self) -> str | AIMessage:
+        reply = next(self._replies)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply.model_copy() if isinstance(reply, AIMessage) else reply
+
+
+@pytest.fixture
+def fake_llm(monkeypatch):
+    # `responses` and `latency` are either shared by every agent or keyed by model name; errors among the responses
+    # are raised by the model
+    def use(
+        responses: list[str | AIMessage | Exception] | dict[str, list[str | AIMessage | Exception]],
+        token_delay: float = 0.0,
+        latency: float | dict[str, float] = 0.0,
+    ) -> list[list[BaseMessage]]:
+        prompts: list[list[BaseMessage]] = []
+
+        def init_chat_model(model: str, **kwargs: Any) -> SlowFakeChatModel:
+            replies = responses[LLMModel(model).value] if isinstance(responses, dict) else responses
+            return SlowFakeChatModel(
+                model_name=LLMModel(model).value,
+                tags=kwargs.get("tags"),
+                messages=Replies(replies),
+                latency=latency.get(LLMModel(model).value, 0.0) if isinstance(latency, dict) else latency,
+                token_delay=token_delay,
+                prompts=prompts,
+                cache=False,
+            )
+
+        monkeypatch.setattr("app.agents.init_chat_model", init_chat_model)
+        return prompts
+
+    return use
+
+
+@pytest.fixture
+def orchestrator():
+    def build(main_task: str = "Write a haiku about the sea.") -> ManualOrchestrator:
+        orchestrator = ManualOrchestrator()
+        orchestrator.set_llm_api_key("sk-test")
+        orchestrator.set_main_task(main_task)
+        orchestrator.add_agent(name=Agent.GENERATOR, system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+        orchestrator.add_agent(name=Agent.CRITIC, system_prompt=CRITIC_SYSTEM_PROMPT, model=LLMModel.GPT_5)
+        return orchestrator
+
+    return build
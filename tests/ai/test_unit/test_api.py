@@ -0,0 +1,182 @@
+import json
+
+import pytest
+
+from app.agents import AgentSession
+from app.constants import LLMModel
+from app.exceptions import SessionConflictException
+from app.runtime import run_sync
+from app.sessions import get_session_store
+
+pytest.importorskip("starlette")
+
+from starlette.testclient import TestClient  # noqa: E402
+
+from app.api import app  # noqa: E402
+
+GENERATOR, CRITIC = LLMModel.GPT_4_1.value, LLMModel.GPT_5.value
+AUTH = {"Authorization": "Bearer sk-test"}
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def create(client, **body) -> str:
+    response = client.post(
+        "/sessions", json={"main_task": "Write a haiku.", "critic_model": CRITIC, **body}, headers=AUTH
+    )
+    assert response.status_code == 201
+    return response.json()["session_id"]
+
+
+def events(response) -> list[tuple[str, dict]]:
+    parsed = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        parsed.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return parsed
+
+
+def test_talk_and_redirect(fake_llm, client):
+    prompts = fake_llm({GENERATOR: ["A draft."], CRITIC: ["A critique."]})
+    session_id = create(client)
+
+    reply = client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=AUTH).json()
+    redirected = client.post(f"/sessions/{session_id}/redirect", headers=AUTH).json()
+
+    assert reply == {"agent": "generator", "reply": "A draft."}
+    assert redirected == {"agent": "critic", "reply": "A critique."}
+    # The critic got the draft wrapped with the main task, as in the UI
+    assert "A draft." in prompts[-1][-1].text and "Write a haiku." in prompts[-1][-1].text
+    state = client.get(f"/sessions/{session_id}", headers=AUTH).json()
+    assert state["last_agent"] == "critic" and state["last_reply"] == "A critique."
+
+
+def test_any_worker_can_continue_a_session(fake_llm, client, agent_pool):
+    prompts = fake_llm({GENERATOR: ["A draft."], CRITIC: ["A critique."]})
+    session_id = create(client)
+    client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=AUTH)
+    client.post(f"/sessions/{session_id}/redirect", headers=AUTH)
+
+    # Nothing but the database carries over to the next request
+    agent_pool.clear()
+    reply = client.post(f"/sessions/{session_id}/redirect", headers=AUTH).json()
+
+    assert reply["agent"] == "generator"
+    assert [m.text for m in prompts[-1][1:3]] == ["Go", "A draft."]
+    assert "A critique." in prompts[-1][-1].text
+
+
+def test_streams_server_sent_events(fake_llm, client):
+    fake_llm({GENERATOR: ["A long draft."], CRITIC: ["A critique."]})
+    session_id = create(client)
+
+    response = client.post(
+        f"/sessions/{session_id}/talk", json={"input": "Go"}, headers={**AUTH, "Accept": "text/event-stream"}
+    )
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    parsed = events(response)
+    assert "".join(data["text"] for event, data in parsed if event == "token") == "A long draft."
+    assert parsed[-1] == ("done", {"agent": "generator", "reply": "A long draft."})
+    assert client.get(f"/sessions/{session_id}", headers=AUTH).json()["last_reply"] == "A long draft."
+
+
+def test_a_session_keeps_its_temperature_and_revision(fake_llm, client, agent_pool, monkeypatch):
+    draft, edit = "# Plan\nShip it.\n", "@@ REPLACE: # Plan\n# Plan\nShip it in Q3.\n"
+    prompts = fake_llm({GENERATOR: [draft, edit], CRITIC: ["Say when."]})
+    monkeypatch.setattr(AgentSession.settings, "REVISION_MODE", True)
+    monkeypatch.setattr(AgentSession.settings, "REVISION_CRITIC_VIEW", "diff")
+    session_id = create(client, temperature=0)
+    client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=AUTH)
+    client.post(f"/sessions/{session_id}/redirect", headers=AUTH)
+    client.post(f"/sessions/{session_id}/redirect", headers=AUTH)
+
+    # The next request rebuilds the orchestrator from the database alone
+    agent_pool.clear()
+    client.post(f"/sessions/{session_id}/redirect", headers=AUTH)
+
+    assert client.get(f"/sessions/{session_id}", headers=AUTH).json()["temperature"] == 0
+    assert {key.temperature for key in agent_pool._entries} == {0}
+    assert "-Ship it.\n+Ship it in Q3." in prompts[-1][-1].text
+
+
+def test_a_streamed_request_to_a_busy_session_gets_an_error_event(fake_llm, client):
+    prompts = fake_llm({GENERATOR: ["A draft."], CRITIC: ["A critique."]})
+    session_id = create(client)
+    store = get_session_store()
+    other = run_sync(store.aget(session_id))
+    run_sync(store.alease(other, 60))
+    streamed = {**AUTH, "Accept": "text/event-stream"}
+
+    response = client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=streamed)
+
+    assert [event for event, _ in events(response)] == ["error"]
+    assert prompts == []
+    run_sync(store.arelease(other))
+    assert events(client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=streamed))[-1][0] == "done"
+
+
+@pytest.mark.parametrize(
+    "headers, status",
+    [({}, 401), ({"Authorization": "Bearer sk-other"}, 403)],
+)
+def test_sessions_are_bound_to_the_api_key(fake_llm, client, headers, status):
+    session_id = create(client)
+
+    assert client.get(f"/sessions/{session_id}", headers=headers).status_code == status
+
+
+def test_request_errors(fake_llm, client):
+    fake_llm(["A draft."])
+    response = client.post("/sessions", json={"critic_model": "gpt-2"}, headers=AUTH)
+    assert response.status_code == 422
+    assert client.post("/sessions", json={"temperature": "hot"}, headers=AUTH).status_code == 422
+
+    session_id = client.post("/sessions", json={}, headers=AUTH).json()["session_id"]
+    assert client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=AUTH).status_code == 409
+    assert client.post(f"/sessions/{session_id}/redirect", headers=AUTH).status_code == 409
+    client.put(f"/sessions/{session_id}/task", json={"main_task": "Write a haiku."}, headers=AUTH)
+    assert client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=AUTH).status_code == 200
+
+    assert client.delete(f"/sessions/{session_id}", headers=AUTH).status_code == 204
+    assert client.get(f"/sessions/{session_id}", headers=AUTH).status_code == 404
+
+
+def test_a_session_is_saved_only_from_its_latest_version(fake_llm, client):
+    session_id = create(client)
+    store = get_session_store()
+    first, second = run_sync(store.aget(session_id)), run_sync(store.aget(session_id))
+
+    first.main_task = "Write a limerick."
+    run_sync(store.asave(first))
+    second.main_task = "Write a sonnet."
+
+    with pytest.raises(SessionConflictException):
+        run_sync(store.asave(second))
+    assert client.get(f"/sessions/{session_id}", headers=AUTH).json()["main_task"] == "Write a limerick."
+
+
+def test_a_session_talks_to_one_request_at_a_time(fake_llm, client):
+    prompts = fake_llm({GENERATOR: ["A draft."], CRITIC: ["A critique."]})
+    session_id = create(client)
+    store = get_session_store()
+    # Another worker is in the middle of a turn
+    other = run_sync(store.aget(session_id))
+    run_sync(store.alease(other, 60))
+
+    assert client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=AUTH).status_code == 409
+    task = client.put(f"/sessions/{session_id}/task", json={"main_task": "Write a sonnet."}, headers=AUTH)
+    assert task.status_code == 409
+    assert prompts == []
+
+    other.last_reply = "A draft."
+    run_sync(store.asave(other))
+    run_sync(store.arelease(other))
+    reply = client.post(f"/sessions/{session_id}/talk", json={"input": "Go"}, headers=AUTH)
+    assert reply.status_code == 200
+    # The lease is given back once the reply is saved
+    assert client.post(f"/sessions/{session_id}/redirect", headers=AUTH).status_code == 200
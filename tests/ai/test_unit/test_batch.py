@@ -0,0 +1,114 @@
+import argparse
+import io
+import json
+
+import pytest
+
+from app.batch import BatchRunner, BatchTask, completed_ids, read_tasks, thread_ids
+from app.constants import LLMModel
+from app.runtime import run_sync
+
+GENERATOR, CRITIC = LLMModel.GPT_4_1, LLMModel.GPT_5
+DEFAULTS = argparse.Namespace(
+    generator_model=GENERATOR.value,
+    critic_model=CRITIC.value,
+    max_rounds=2,
+    token_budget=None,
+    convergence_threshold=0.95,
+)
+
+
+def task(task_id: str, max_rounds: int = 2) -> BatchTask:
+    return BatchTask(task_id, f"Write plan {task_id}", GENERATOR, CRITIC, max_rounds=max_rounds)
+
+
+def run(tasks: list[BatchTask], skip: set[str] | None = None, **kwargs) -> tuple[list[dict], BatchRunner]:
+    output = io.StringIO()
+    runner = BatchRunner("sk-test", output, run_id="run", concurrency=2, **kwargs)
+    run_sync(runner.arun(tasks, skip))
+    return [json.loads(line) for line in output.getvalue().splitlines()], runner
+
+
+def test_tasks_are_read_with_defaults(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text('{"main_task": "A"}\n\n{"id": "b", "main_task": "B", "max_rounds": 5, "critic_model": "gpt-4.1"}\n')
+
+    first, second = read_tasks(str(path), DEFAULTS)
+
+    assert (first.id, first.critic_model, first.max_rounds) == ("1", CRITIC, 2)
+    assert (second.id, second.critic_model, second.max_rounds) == ("b", GENERATOR, 5)
+
+
+def test_invalid_tasks_are_rejected(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text('{"main_task": "A", "critic_model": "gpt-2"}\n')
+
+    with pytest.raises(ValueError, match="tasks.jsonl:1"):
+        read_tasks(str(path), DEFAULTS)
+
+
+@pytest.mark.parametrize(
+    "fields, error",
+    [
+        ('"token_budget": "lots"', "invalid literal"),
+        ('"token_budget": 0', "token_budget must be at least 1"),
+        ('"max_rounds": 2.5', "max_rounds must be a whole number"),
+        ('"max_rounds": true', "max_rounds must be a whole number"),
+        ('"convergence_threshold": 1.5', "convergence_threshold must be in"),
+        ('"main_task": ""', "main_task must be a non-empty string"),
+    ],
+)
+def test_task_fields_are_checked_when_read(tmp_path, fields, error):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text(f'{{"main_task": "A"}}\n{{"main_task": "B", {fields}}}\n')
+
+    with pytest.raises(ValueError, match=f"tasks.jsonl:2: .*{error}"):
+        read_tasks(str(path), DEFAULTS)
+
+
+def test_numeric_task_fields_are_coerced(tmp_path):
+    path = tmp_path / "tasks.jsonl"
+    path.write_text('{"main_task": "A", "token_budget": "5000", "max_rounds": 4.0, "convergence_threshold": "0.9"}\n')
+
+    (task,) = read_tasks(str(path), DEFAULTS)
+
+    assert (task.token_budget, task.max_rounds, task.convergence_threshold) == (5000, 4, 0.9)
+
+
+def test_batch_writes_a_record_per_task(fake_llm):
+    fake_llm({GENERATOR.value: ["A draft.", "A better draft."], CRITIC.value: ["A critique."]})
+
+    records, runner = run([task("a"), task("b"), task("c")], prices={GENERATOR.value: 2.0})
+
+    assert sorted(record["id"] for record in records) == ["a", "b", "c"]
+    assert all(record["final_draft"] == "A better draft." and record["rounds"] == 2 for record in records)
+    assert runner.report.completed == 3 and runner.report.resumed_turns == 0
+
+
+def test_interrupted_tasks_resume_from_their_threads(fake_llm, agent_pool):
+    fake_llm({GENERATOR.value: ["A draft."], CRITIC.value: ["A critique."]})
+    # Stands in for a run that stopped after the first draft, the next one starts from scratch but for the database
+    run([task("a", max_rounds=1)])
+    agent_pool.clear()
+    prompts = fake_llm({GENERATOR.value: ["A better draft."], CRITIC.value: ["A critique."]})
+
+    records, runner = run([task("a")])
+
+    assert records[0]["final_draft"] == "A better draft."
+    assert records[0]["resumed_turns"] == 1
+    # Only the critique and the second draft were run
+    assert len(prompts) == 2
+    assert thread_ids("run", "a") == records[0]["thread_ids"]
+
+
+def test_completed_tasks_are_skipped_and_failed_ones_retried(fake_llm, tmp_path):
+    path = tmp_path / "out.jsonl"
+    path.write_text(
+        '{"id": "a", "final_draft": "x"}\n{"final_draft": "y"}\n{"id": "b", "error": "boom"}\n{"id": "c", "fin'
+    )
+    fake_llm(["A draft."])
+
+    records, runner = run([task("a"), task("b"), task("c")], skip=completed_ids(str(path)))
+
+    assert sorted(record["id"] for record in records) == ["b", "c"]
+    assert runner.report.skipped == 1
@@ -0,0 +1,102 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+from langchain.messages import AIMessage, HumanMessage
+
+from app.agents import AgentSession
+from app.blobs import GC_GRACE_SECONDS, BlobSerializer, MissingBlobs, split_chunks
+from app.checkpoints import get_checkpointer, prune_checkpoints
+from app.constants import Agent, LLMModel
+from app.prompts import CONTEXT_WRAPPER_PROMPT
+from app.runtime import run_sync
+
+MAIN_TASK = "Write a rollout plan for the new billing service, covering the migration of existing customers. " * 3
+CRITIQUE = "The plan never says how a failed migration is rolled back or who decides to stop. " * 4
+DRAFT = "# Rollout\n\n" + "Ship to internal users first, then ten percent of customers, then everyone. " * 8 + "\n"
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_blobs(monkeypatch):
+    monkeypatch.setattr(AgentSession.settings, "CHECKPOINT_BLOBS", True)
+
+
+def test_a_quoted_draft_is_cut_into_the_same_chunks():
+    quoted = CONTEXT_WRAPPER_PROMPT.format(main_task=MAIN_TASK, context_text=DRAFT)
+
+    assert set(split_chunks(DRAFT)) <= set(split_chunks(quoted))
+    assert MAIN_TASK in split_chunks(quoted)
+
+
+def test_messages_round_trip_through_blobs():
+    serde = BlobSerializer(min_chars=64, cache_max_chars=10_000)
+    checkpoint = {"channel_values": {"messages": [HumanMessage(MAIN_TASK), AIMessage(DRAFT, id="a")], "n": 1}}
+
+    type_, serialized, packed = serde.dumps_packed(checkpoint)
+
+    assert b"Ship to internal users" not in serialized
+    assert checkpoint["channel_values"]["messages"][1].content == DRAFT
+    # A fresh process has nothing cached, and leaves fetching the blobs to the saver
+    fresh = BlobSerializer(min_chars=64, cache_max_chars=10_000)
+    with pytest.raises(MissingBlobs) as missing:
+        fresh.loads_typed((type_, serialized))
+    assert missing.value.digests == packed.keys()
+    with fresh.preloaded(packed):
+        assert fresh.loads_typed((type_, serialized)) == checkpoint
+
+
+def test_drafts_are_stored_once_across_threads_and_checkpoints(fake_llm, orchestrator, checkpoint_storage):
+    fake_llm([DRAFT])
+    session = orchestrator(MAIN_TASK)
+    for _ in range(3):
+        session.talk_to(Agent.GENERATOR, MAIN_TASK, thread_id="g")
+        session.talk_to(Agent.CRITIC, DRAFT, thread_id="c", context_from=Agent.GENERATOR)
+
+    with sqlite3.connect(checkpoint_storage) as conn:
+        blobs = conn.execute("SELECT COUNT(*) FROM checkpoint_blobs").fetchone()[0]
+        inline = conn.execute("SELECT COUNT(*) FROM checkpoints WHERE instr(checkpoint, ?) > 0", (DRAFT[12:60],))
+
+        assert blobs == 2
+        assert inline.fetchone()[0] == 0
+    messages = session.agents[Agent.CRITIC].agent.get_state({"configurable": {"thread_id": "c"}}).values["messages"]
+    assert messages[0].text == CONTEXT_WRAPPER_PROMPT.format(main_task=MAIN_TASK, context_text=DRAFT)
+
+
+def test_concurrent_sessions_write_and_read_blobs_through_the_saver(fake_llm, orchestrator, checkpoint_storage):
+    drafts = [f"# Draft {i}\n\n" + DRAFT for i in range(30)]
+    fake_llm(drafts, latency=0.01)
+    sessions = [orchestrator(MAIN_TASK) for _ in drafts]
+
+    async def talk_to_all():
+        return await asyncio.gather(
+            *(session.atalk_to(Agent.GENERATOR, MAIN_TASK, thread_id=f"g{i}") for i, session in enumerate(sessions))
+        )
+
+    assert sorted(run_sync(talk_to_all())) == sorted(drafts)
+    with sqlite3.connect(checkpoint_storage) as conn:
+        # The main task and the body the drafts share; each draft's heading is short enough to stay inline
+        assert conn.execute("SELECT COUNT(*) FROM checkpoint_blobs").fetchone()[0] == 2
+    # As in a fresh process, the blobs are read back through the saver's connection
+    get_checkpointer(str(checkpoint_storage)).serde._texts.clear()
+    for i, session in enumerate(sessions):
+        state = session.agents[Agent.GENERATOR].agent.get_state({"configurable": {"thread_id": f"g{i}"}})
+        assert state.values["messages"][-1].text in drafts
+
+
+def test_prune_collects_unreferenced_blobs_after_the_grace_period(fake_llm, orchestrator, checkpoint_storage):
+    fake_llm({LLMModel.GPT_4_1.value: [DRAFT], LLMModel.GPT_5.value: [CRITIQUE]})
+    session = orchestrator(MAIN_TASK)
+    session.talk_to(Agent.GENERATOR, MAIN_TASK, thread_id="g")
+    session.talk_to(Agent.CRITIC, DRAFT, thread_id="c", context_from=Agent.GENERATOR)
+
+    with sqlite3.connect(checkpoint_storage) as conn:
+        conn.execute("DELETE FROM checkpoints WHERE thread_id = 'c'")
+        conn.commit()
+        assert prune_checkpoints(conn, idle_days=None).blobs_deleted == 0
+        # The critic's reply was only referenced by its thread; the draft and main task are still in use
+        result = prune_checkpoints(conn, idle_days=None, now=time.time() + GC_GRACE_SECONDS + 1)
+
+    assert result.blobs_deleted == 1
+    messages = session.agents[Agent.GENERATOR].agent.get_state({"configurable": {"thread_id": "g"}}).values["messages"]
+    assert messages[-1].text == DRAFT
@@ -0,0 +1,126 @@
+import pytest
+from langchain.messages import AIMessage, HumanMessage
+
+from app.agents import AgentSession
+from app.cache import ResponseCache, cache_key
+from app.constants import Agent, LLMModel
+from app.runtime import run_sync
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    def use(**overrides) -> ResponseCache:
+        options = {"max_entries": 8, "max_bytes": 1024 * 1024, "ttl_seconds": 3600, **overrides}
+        cache = ResponseCache(path=str(tmp_path / "responses.db"), **options)
+        monkeypatch.setattr("app.agents.get_response_cache", lambda: cache)
+        return cache
+
+    return use
+
+
+def test_key_ignores_ids_and_whitespace():
+    first = cache_key("gpt-4.1", 0, "Be brief.", [HumanMessage("Hello  world", id="a")])
+    second = cache_key("gpt-4.1", 0, " Be brief.\n", [HumanMessage("Hello world\n", id="b")])
+
+    assert first == second
+    assert first != cache_key("gpt-5", 0, "Be brief.", [HumanMessage("Hello world")])
+    assert first != cache_key("gpt-4.1", 0.7, "Be brief.", [HumanMessage("Hello world")])
+    assert first != cache_key("gpt-4.1", 0, "Be brief.", [AIMessage("Hello world")])
+
+
+def test_disk_tier_serves_entries_evicted_from_memory(response_cache):
+    cache = response_cache(max_entries=1)
+    cache.put("a", AIMessage("first"))
+    cache.put("b", AIMessage("second"))
+
+    assert cache.get("a").content == "first"
+    assert cache.get("missing") is None
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_entries_expire(response_cache):
+    clock = FakeClock()
+    cache = response_cache(ttl_seconds=60, clock=clock)
+    cache.put("a", AIMessage("first"))
+
+    clock.now += 30
+    assert cache.get("a") is not None
+    clock.now += 60
+    assert cache.get("a") is None
+
+
+def test_disk_tier_is_bounded_by_size(response_cache):
+    clock = FakeClock()
+    cache = response_cache(max_entries=1, max_bytes=2000, clock=clock)
+    for key in "abcdefgh":
+        clock.now += 1
+        cache.put(key, AIMessage(key * 300))
+
+    assert cache.disk_usage() <= 2000
+    assert cache.get("a") is None
+    assert cache.get("h") is not None
+
+
+def test_async_lookups_share_both_tiers_and_track_disk_usage(response_cache):
+    cache = response_cache(max_entries=1)
+    run_sync(cache.aput("a", AIMessage("first")))
+    cache.put("a", AIMessage("first, again"))
+    run_sync(cache.aput("b", AIMessage("second")))
+
+    assert run_sync(cache.aget("a")).content == "first, again"
+    assert cache.get("b").content == "second"
+    assert cache._disk_bytes == cache.disk_usage()
+
+
+def test_agents_at_temperature_zero_are_replayed(fake_llm, orchestrator, response_cache, monkeypatch):
+    monkeypatch.setattr(AgentSession.settings, "RESPONSE_CACHE_ENABLED", True)
+    cache = response_cache()
+    prompts = fake_llm(["first answer", "second answer"])
+    session = orchestrator()
+    session.add_agent(Agent.GENERATOR, "Be brief.", LLMModel.GPT_4_1, temperature=0)
+
+    session.talk_to(agent_name=Agent.GENERATOR, input_text="Same task", thread_id="t-1")
+    second = session.talk_to(agent_name=Agent.GENERATOR, input_text="Same task", thread_id="t-2")
+
+    assert second == "first answer"
+    assert len(prompts) == 1
+    assert (cache.stats.hits, cache.stats.bypassed) == (1, 0)
+
+
+def test_identical_calls_are_replayed_when_allowed(fake_llm, orchestrator, response_cache, monkeypatch):
+    monkeypatch.setattr(AgentSession.settings, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(AgentSession.settings, "RESPONSE_CACHE_ALLOW_NONZERO_TEMPERATURE", True)
+    cache = response_cache()
+    prompts = fake_llm(["first answer", "second answer"])
+    session = orchestrator()
+
+    first = session.talk_to(agent_name=Agent.GENERATOR, input_text="Same task", thread_id="t-1")
+    streamed = "".join(session.stream_to(agent_name=Agent.GENERATOR, input_text="Same task", thread_id="t-2"))
+
+    assert first == streamed == "first answer"
+    assert len(prompts) == 1
+    assert cache.stats.hits == 1
+    state = session.agents[Agent.GENERATOR].agent.get_state({"configurable": {"thread_id": "t-2"}}).values
+    assert state["messages"][-1].response_metadata["response_cache"] == "hit"
+
+
+def test_sampled_calls_bypass_the_cache(fake_llm, orchestrator, response_cache, monkeypatch):
+    monkeypatch.setattr(AgentSession.settings, "RESPONSE_CACHE_ENABLED", True)
+    cache = response_cache()
+    prompts = fake_llm(["first answer", "second answer"])
+    session = orchestrator()
+
+    session.talk_to(agent_name=Agent.GENERATOR, input_text="Same task", thread_id="t-1")
+    second = session.talk_to(agent_name=Agent.GENERATOR, input_text="Same task", thread_id="t-2")
+
+    assert second == "second answer"
+    assert len(prompts) == 2
+    assert (cache.stats.hits, cache.stats.misses, cache.stats.bypassed) == (0, 0, 2)
@@ -0,0 +1,102 @@
+import httpx
+from langchain.messages import AIMessage
+from openai import BadRequestError
+
+from app.cascade import escalation_reason
+from app.constants import Agent, LLMModel
+from app.prompts import CRITIC_SYSTEM_PROMPT
+
+GENERATOR, FAST, STRONG = LLMModel.GPT_4_1.value, LLMModel.GPT_4_1_MINI.value, LLMModel.GPT_5.value
+ROUTINE = "The plan assumes the billing migration finishes before launch. " * 5
+# Uses the words of the sanity check, but only as part of the critique itself
+ROUTINE_CRITIQUE = """**Hidden assumptions:** The rollout plan assumes the billing migration finishes before launch, and
+that support can absorb the extra tickets in the first week without new hires.
+
+**Risks:** "Phase two" is ambiguous: it could mean the EU launch or the enterprise tier, and the budget differs by a
+factor of three between them.
+
+**Probing questions:** Could you clarify who owns the rollback decision? What happens if the migration slips?
+"""
+SANITY_CHECK = """The main task asks for a one-page summary, but the context text is a 40-page contract draft with
+conflicting instructions. Before I proceed with a critique, could you clarify which document should be reviewed?
+"""
+
+
+def cascading(orchestrator):
+    session = orchestrator()
+    session.add_agent(Agent.CRITIC, CRITIC_SYSTEM_PROMPT, LLMModel.GPT_5, fast_model=LLMModel.GPT_4_1_MINI)
+    return session
+
+
+def stored_reply(session, thread_id: str) -> AIMessage:
+    state = session.agents[Agent.CRITIC].agent.get_state({"configurable": {"thread_id": thread_id}})
+    return state.values["messages"][-1]
+
+
+def test_escalation_reasons():
+    assert escalation_reason(AIMessage(ROUTINE)) is None
+    assert escalation_reason(AIMessage("Looks fine.")) == "too_short"
+    assert escalation_reason(AIMessage(ROUTINE, response_metadata={"finish_reason": "length"})) == "truncated"
+    flagged = "The main task and the draft are contradictory, could you clarify the goal? " * 3
+    assert escalation_reason(AIMessage(flagged)) == "flagged"
+    assert escalation_reason(AIMessage(SANITY_CHECK)) == "flagged"
+    assert escalation_reason(AIMessage("I can't help with that request. " * 8)) == "flagged"
+
+
+def test_a_routine_critique_is_not_flagged():
+    assert escalation_reason(AIMessage(ROUTINE_CRITIQUE)) is None
+    # The sanity check words only count at the start of the reply
+    assert escalation_reason(AIMessage(ROUTINE * 2 + "The request is ambiguous about the launch date.")) is None
+
+
+def test_routine_turns_are_served_by_the_fast_model(fake_llm, orchestrator, metrics):
+    prompts = fake_llm({GENERATOR: ["A draft."], FAST: [ROUTINE], STRONG: ["A gpt-5 critique."]})
+    session = cascading(orchestrator)
+
+    reply = session.talk_to(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR)
+
+    assert reply == ROUTINE
+    assert len(prompts) == 1
+    assert stored_reply(session, "c").response_metadata["cascade_tier"] == "fast"
+    assert metrics.counter_total("cascade_turns_total", tier="fast") == 1
+    assert metrics.histogram_total("model_call_seconds", model=FAST).count == 1
+    assert metrics.histogram_total("model_call_seconds", model=STRONG).count == 0
+
+
+def test_weak_replies_escalate_and_only_the_final_one_streams(fake_llm, orchestrator, metrics):
+    prompts = fake_llm({GENERATOR: ["A draft."], FAST: ["Fine."], STRONG: ["A gpt-5 critique."]})
+    session = cascading(orchestrator)
+
+    chunks = list(session.stream_to(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR))
+
+    assert "".join(chunks) == "A gpt-5 critique."
+    assert len(prompts) == 2
+    reply = stored_reply(session, "c")
+    assert reply.response_metadata["cascade_tier"] == "strong"
+    assert reply.response_metadata["cascade_escalation"] == "too_short"
+    assert metrics.counter_total("cascade_turns_total", tier="strong", reason="too_short") == 1
+
+
+def test_accepted_fast_reply_still_reaches_a_streaming_caller(fake_llm, orchestrator):
+    fake_llm({GENERATOR: ["A draft."], FAST: [ROUTINE], STRONG: ["A gpt-5 critique."]})
+    session = cascading(orchestrator)
+
+    chunks = list(session.stream_to(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR))
+
+    assert "".join(chunks) == ROUTINE
+
+
+def test_fast_model_errors_escalate(fake_llm, orchestrator, metrics):
+    error = BadRequestError(
+        "context_length_exceeded",
+        response=httpx.Response(400, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions")),
+        body=None,
+    )
+    fake_llm({GENERATOR: ["A draft."], FAST: [error], STRONG: ["A gpt-5 critique."]})
+    session = cascading(orchestrator)
+
+    reply = session.talk_to(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR)
+
+    assert reply == "A gpt-5 critique."
+    assert stored_reply(session, "c").response_metadata["cascade_escalation"] == "error"
+    assert metrics.counter_total("cascade_turns_total", tier="strong", reason="error") == 1
@@ -0,0 +1,83 @@
+import sqlite3
+import time
+
+from langgraph.checkpoint.base.id import uuid6
+
+from app.agents import AgentSession
+from app.checkpoints import checkpoint_timestamp, compact, get_checkpointer, prune_checkpoints
+from app.constants import Agent
+
+
+def count_checkpoints(path, thread_id: str) -> int:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchone()[0]
+
+
+def history(session, thread_id: str) -> list[str]:
+    state = session.agents[Agent.GENERATOR].agent.get_state({"configurable": {"thread_id": thread_id}})
+    return [message.content for message in state.values["messages"]]
+
+
+def test_checkpointer_is_shared_and_uses_wal(checkpoint_storage):
+    first = get_checkpointer(str(checkpoint_storage))
+    second = get_checkpointer(str(checkpoint_storage))
+
+    assert first is second
+    with sqlite3.connect(checkpoint_storage) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_agents_of_one_process_share_the_checkpointer(fake_llm, orchestrator):
+    fake_llm(["ok"])
+    session = orchestrator()
+
+    generator = session.agents[Agent.GENERATOR].agent
+    critic = session.agents[Agent.CRITIC].agent
+    assert generator.checkpointer is critic.checkpointer
+
+
+def test_one_checkpoint_is_written_per_turn(fake_llm, orchestrator, checkpoint_storage, monkeypatch):
+    monkeypatch.setattr(AgentSession.settings, "CHECKPOINT_DURABILITY", "exit")
+    fake_llm(["draft"])
+    session = orchestrator()
+
+    for _ in range(3):
+        session.talk_to(agent_name=Agent.GENERATOR, input_text="again", thread_id="t-1")
+
+    assert count_checkpoints(checkpoint_storage, "t-1") == 3
+
+
+def test_checkpoint_timestamp_is_read_from_the_id():
+    assert abs(checkpoint_timestamp(str(uuid6())) - time.time()) < 1
+
+
+def test_prune_keeps_only_the_latest_snapshot(fake_llm, orchestrator, checkpoint_storage):
+    fake_llm(["draft"])
+    session = orchestrator()
+    for i in range(3):
+        session.talk_to(agent_name=Agent.GENERATOR, input_text=f"turn {i}", thread_id="t-1")
+    before, stored = history(session, "t-1"), count_checkpoints(checkpoint_storage, "t-1")
+
+    with sqlite3.connect(checkpoint_storage) as conn:
+        result = prune_checkpoints(conn, idle_days=None)
+        compact(conn)
+
+    assert result.checkpoints_deleted == stored - 1
+    assert count_checkpoints(checkpoint_storage, "t-1") == 1
+    assert history(session, "t-1") == before
+    session.talk_to(agent_name=Agent.GENERATOR, input_text="turn 3", thread_id="t-1")
+    assert history(session, "t-1") == [*before, "turn 3", "draft"]
+
+
+def test_prune_deletes_idle_threads(fake_llm, orchestrator, checkpoint_storage):
+    fake_llm(["draft"])
+    session = orchestrator()
+    session.talk_to(agent_name=Agent.GENERATOR, input_text="hello", thread_id="t-1")
+
+    with sqlite3.connect(checkpoint_storage) as conn:
+        ten_days_later = prune_checkpoints(conn, idle_days=30, keep_history=True, now=time.time() + 10 * 86400)
+        forty_days_later = prune_checkpoints(conn, idle_days=30, keep_history=True, now=time.time() + 40 * 86400)
+
+    assert ten_days_later.threads_deleted == 0
+    assert forty_days_later.threads_deleted == 1
+    assert count_checkpoints(checkpoint_storage, "t-1") == 0
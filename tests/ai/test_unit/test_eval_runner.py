@@ -0,0 +1,74 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from langchain_core.runnables import RunnableLambda
+
+from ..eval_runner import JudgeCache, arun_suite, judge_cache_key, select_shard
+
+
+class FakeMetric:
+    def __init__(self, name: str, threshold: float = 0.5, latency: float = 0.0) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.latency = latency
+        self.score: float | None = None
+        self.reason: str | None = None
+        self.measured = 0
+
+    async def a_measure(self, test_case, _show_indicator: bool = True) -> float:
+        await asyncio.sleep(self.latency)
+        self.measured += 1
+        self.score = 1.0 if "good" in test_case.actual_output else 0.0
+        self.reason = f"judged {test_case.actual_output!r}"
+        return self.score
+
+    def is_successful(self) -> bool:
+        return self.score is not None and self.score >= self.threshold
+
+
+def build_test_case(spec, actual_output):
+    return SimpleNamespace(input=spec["input"], actual_output=actual_output, context=None)
+
+
+async def slow_echo(value):
+    await asyncio.sleep(0.1)
+    return f"good answer to {value['input_text']}"
+
+
+def test_sharding_is_a_stable_partition():
+    specs = [{"id": f"spec-{i}"} for i in range(50)]
+    shards = [select_shard(specs, index, 4) for index in range(4)]
+
+    assert sorted(spec["id"] for shard in shards for spec in shard) == sorted(spec["id"] for spec in specs)
+    assert all(shards)
+    assert select_shard(specs, 1, 4) == shards[1]
+
+
+def test_judge_cache_key_covers_metric_config_input_and_output():
+    case = SimpleNamespace(input="q", actual_output="a", context=None)
+    key = judge_cache_key(FakeMetric("m"), case)
+
+    assert judge_cache_key(FakeMetric("m"), SimpleNamespace(input="q", actual_output="a", context=None)) == key
+    assert judge_cache_key(FakeMetric("m", threshold=0.9), case) != key
+    assert judge_cache_key(FakeMetric("m"), SimpleNamespace(input="q", actual_output="b", context=None)) != key
+    assert judge_cache_key(FakeMetric("m"), SimpleNamespace(input="r", actual_output="a", context=None)) != key
+
+
+def test_suite_runs_concurrently_and_caches_judgements(tmp_path):
+    specs = [{"id": f"spec-{i}", "input": f"q{i}", "metric": FakeMetric(f"m{i}", latency=0.1)} for i in range(10)]
+    cache = JudgeCache(str(tmp_path / "judge.db"))
+
+    started = time.perf_counter()
+    results = asyncio.run(arun_suite(RunnableLambda(slow_echo), specs, build_test_case, cache, max_concurrency=10))
+    elapsed = time.perf_counter() - started
+
+    # 10 generations and 10 judgements of 0.1 s each, in about two steps
+    assert elapsed < 0.6
+    assert all(result.success and not result.cached for result in results)
+
+    rerun = asyncio.run(arun_suite(RunnableLambda(slow_echo), specs, build_test_case, cache, max_concurrency=10))
+
+    assert all(result.cached and result.success for result in rerun)
+    assert [result.reason for result in rerun] == [result.reason for result in results]
+    assert all(spec["metric"].measured == 1 for spec in specs)
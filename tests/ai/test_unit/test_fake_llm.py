@@ -0,0 +1,90 @@
+import pytest
+from langchain.messages import HumanMessage
+from openai import InternalServerError, RateLimitError
+
+from app.agents import AgentSession
+from app.constants import Agent
+from app.fake_llm import FakeChatModel
+
+
+def test_same_prompt_and_seed_replay_identically():
+    first, second = FakeChatModel(seed=7, latency_seconds=0, tokens_per_second=0), FakeChatModel(
+        seed=7, latency_seconds=0, tokens_per_second=0
+    )
+    prompt = [HumanMessage("Write a plan")]
+
+    assert first.invoke(prompt).content == second.invoke(prompt).content
+    assert (
+        first.invoke(prompt).content
+        != FakeChatModel(seed=8, latency_seconds=0, tokens_per_second=0).invoke(prompt).content
+    )
+
+
+def test_latency_and_token_rate(monkeypatch):
+    sleeps: list[float] = []
+    monkeypatch.setattr("app.fake_llm.time.sleep", sleeps.append)
+    model = FakeChatModel(latency="fixed", latency_seconds=0.1, tokens_per_second=200, output_tokens=20)
+
+    message = model.invoke([HumanMessage("Write a plan")])
+
+    tokens = message.usage_metadata["output_tokens"]
+    assert tokens == len(message.text.split())
+    assert sleeps == [0.1, pytest.approx(tokens / 200)]
+
+
+def test_stream_reports_usage_on_the_last_chunk():
+    prompt = [HumanMessage("Write a plan")]
+
+    chunks = list(FakeChatModel(latency_seconds=0, tokens_per_second=0, output_tokens=10).stream(prompt))
+
+    assert (
+        "".join(chunk.text for chunk in chunks)
+        == FakeChatModel(latency_seconds=0, tokens_per_second=0, output_tokens=10).invoke(prompt).text
+    )
+    assert chunks[-1].usage_metadata["output_tokens"] == len(chunks) - 1
+
+
+def test_failure_injection():
+    prompt = [HumanMessage("Write a plan")]
+    with pytest.raises(RateLimitError) as exc_info:
+        FakeChatModel(latency_seconds=0, tokens_per_second=0, failure_rate=1.0).invoke(prompt)
+    assert exc_info.value.response.headers["retry-after"] == "1"
+    with pytest.raises(InternalServerError):
+        FakeChatModel(latency_seconds=0, tokens_per_second=0, failure_rate=1.0, failure="server_error").invoke(prompt)
+
+    # Retries of the same prompt are independent draws
+    model = FakeChatModel(latency_seconds=0, tokens_per_second=0, failure_rate=0.5)
+    outcomes = set()
+    for _ in range(20):
+        try:
+            model.invoke(prompt)
+            outcomes.add("ok")
+        except RateLimitError:
+            outcomes.add("failed")
+    assert outcomes == {"ok", "failed"}
+
+
+def test_attempts_are_tracked_for_recent_prompts_only():
+    model = FakeChatModel(latency_seconds=0, tokens_per_second=0, output_tokens=5, max_tracked_prompts=2)
+    first = [HumanMessage("Write a plan")]
+    replies = [model.invoke(first).text]
+    for text in ("Write a poem", "Write a song"):
+        model.invoke([HumanMessage(text)])
+
+    assert len(model._attempts) == 2
+    # Forgotten, so it is drawn as a first attempt again
+    replies.append(model.invoke(first).text)
+    assert replies[0] == replies[1]
+
+
+def test_fake_backend_drives_the_orchestrator(monkeypatch, orchestrator, metrics):
+    monkeypatch.setattr(AgentSession.settings, "LLM_BACKEND", "fake")
+    monkeypatch.setattr(AgentSession.settings, "FAKE_LLM_LATENCY_SECONDS", 0)
+    monkeypatch.setattr(AgentSession.settings, "FAKE_LLM_TOKENS_PER_SECOND", 0)
+    orchestrator = orchestrator()
+
+    draft = orchestrator.talk_to(Agent.GENERATOR, "Write a plan", thread_id="t1")
+    streamed = "".join(orchestrator.stream_to(Agent.CRITIC, draft, thread_id="t2", context_from=Agent.GENERATOR))
+
+    assert draft and streamed
+    assert metrics.counter_total("output_tokens_total", agent=Agent.GENERATOR) == len(draft.split())
@@ -0,0 +1,156 @@
+import sqlite3
+import time
+
+import pytest
+
+from app.agents import AgentSession
+from app.checkpoints import prune_checkpoints
+from app.constants import Agent
+from app.exceptions import ManualOrchestratorException
+
+
+@pytest.fixture(autouse=True)
+def checkpoint_per_turn(monkeypatch):
+    # Fork points are counted in turns
+    monkeypatch.setattr(AgentSession.settings, "CHECKPOINT_DURABILITY", "exit")
+
+
+def history(session, thread_id: str) -> list[str]:
+    state = session.agents[Agent.GENERATOR].agent.get_state({"configurable": {"thread_id": thread_id}})
+    return [message.text for message in state.values.get("messages", [])]
+
+
+def checkpoint_ids(session, thread_id: str) -> list[str]:
+    states = session.agents[Agent.GENERATOR].agent.get_state_history({"configurable": {"thread_id": thread_id}})
+    return [state.config["configurable"]["checkpoint_id"] for state in states]
+
+
+def stored(path) -> tuple[int, int]:
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(checkpoint)), 0) FROM checkpoints").fetchone()
+
+
+def talk(session, thread_id: str, *turns: str) -> None:
+    for turn in turns:
+        session.talk_to(agent_name=Agent.GENERATOR, input_text=turn, thread_id=thread_id)
+
+
+def test_fork_shares_history_and_diverges(fake_llm, orchestrator, checkpoint_storage):
+    fake_llm(["ok"])
+    session = orchestrator()
+    talk(session, "main", "one", "two")
+    before = stored(checkpoint_storage)
+
+    fork = session.fork("main")
+
+    # Forking copies nothing
+    assert stored(checkpoint_storage) == before
+    assert history(session, fork) == history(session, "main")
+
+    talk(session, fork, "fork only")
+    talk(session, "main", "main only")
+
+    assert history(session, fork) == ["one", "ok", "two", "ok", "fork only", "ok"]
+    assert history(session, "main") == ["one", "ok", "two", "ok", "main only", "ok"]
+    assert stored(checkpoint_storage)[0] == before[0] + 2
+    # The fork's history runs through its own checkpoint into the parent's
+    assert checkpoint_ids(session, fork)[1:] == checkpoint_ids(session, "main")[1:]
+
+
+def test_fork_at_an_earlier_checkpoint(fake_llm, orchestrator):
+    fake_llm(["ok"])
+    session = orchestrator()
+    talk(session, "main", "one", "two", "three")
+    first_turn = checkpoint_ids(session, "main")[-1]
+
+    fork = session.fork("main", at_checkpoint=first_turn)
+    talk(session, fork, "another two")
+
+    assert history(session, fork) == ["one", "ok", "another two", "ok"]
+    assert len(history(session, "main")) == 6
+
+
+def test_fork_storage_grows_with_divergence_not_history(fake_llm, orchestrator, checkpoint_storage, monkeypatch):
+    # Without the context summary, which the longer thread would otherwise carry in its state
+    monkeypatch.setattr(AgentSession.settings, "CONTEXT_MAX_TOKENS", None)
+    fake_llm(["ok"])
+    session = orchestrator()
+    talk(session, "short", "one")
+    talk(session, "long", *[f"turn {i}" for i in range(20)])
+
+    rows, size = [], []
+    for thread_id in ("short", "long"):
+        fork = session.fork(thread_id)
+        before = stored(checkpoint_storage)
+        talk(session, fork, "diverge")
+        after = stored(checkpoint_storage)
+        rows.append(after[0] - before[0])
+        size.append(after[1] - before[1])
+        assert history(session, fork) == [*history(session, thread_id), "diverge", "ok"]
+
+    assert rows == [1, 1]
+    # The fork's checkpoint holds its own two messages either way; what is left is noise in the channel versions
+    assert abs(size[1] - size[0]) < 64
+
+
+def test_list_forks_and_fork_of_fork(fake_llm, orchestrator):
+    fake_llm(["ok"])
+    session = orchestrator()
+    talk(session, "main", "one")
+    child = session.fork("main", new_thread_id="child")
+    talk(session, child, "two")
+    grandchild = session.fork(child, new_thread_id="grandchild")
+
+    assert [fork.thread_id for fork in session.list_forks("main")] == ["child"]
+    assert [fork.thread_id for fork in session.list_forks()] == ["child", "grandchild"]
+    assert history(session, grandchild) == ["one", "ok", "two", "ok"]
+
+
+def test_fork_of_an_unknown_thread_fails(fake_llm, orchestrator):
+    fake_llm(["ok"])
+
+    with pytest.raises(ManualOrchestratorException, match="no checkpoint"):
+        orchestrator().fork("missing")
+
+
+def test_prune_keeps_what_forks_read_through(fake_llm, orchestrator, checkpoint_storage):
+    fake_llm(["ok"])
+    session = orchestrator()
+    talk(session, "main", "one", "two")
+    fork = session.fork("main", at_checkpoint=checkpoint_ids(session, "main")[-1])
+    talk(session, "main", "three")
+
+    with sqlite3.connect(checkpoint_storage) as conn:
+        prune_checkpoints(conn, idle_days=None)
+
+    assert history(session, fork) == ["one", "ok"]
+    assert history(session, "main") == ["one", "ok", "two", "ok", "three", "ok"]
+
+
+def test_prune_collects_unreachable_forks(fake_llm, orchestrator, checkpoint_storage):
+    fake_llm(["ok"])
+    session = orchestrator()
+    talk(session, "main", "one")
+    active = session.fork("main")
+    idle = session.fork("main")
+    talk(session, active, "two")
+
+    with sqlite3.connect(checkpoint_storage) as conn:
+        conn.execute("UPDATE forks SET created_at = ? WHERE thread_id = ?", (time.time() - 40 * 86400, idle))
+        conn.commit()
+        # The parent is idle too, but the active fork still reads through it
+        result = prune_checkpoints(conn, idle_days=30, now=time.time() + 10 * 86400)
+
+    assert result.threads_deleted == 1
+    assert [fork.thread_id for fork in session.list_forks()] == [active]
+    assert history(session, active) == ["one", "ok", "two", "ok"]
+
+    dangling = session.fork("main")
+    session.agents[Agent.GENERATOR].agent.checkpointer.delete_thread("main")
+    # The active fork took its first messages from the parent, and keeps them
+    assert history(session, active) == ["one", "ok", "two", "ok"]
+    with sqlite3.connect(checkpoint_storage) as conn:
+        result = prune_checkpoints(conn, idle_days=None)
+
+    assert result.threads_deleted == 1
+    assert dangling not in [fork.thread_id for fork in session.list_forks()]
@@ -0,0 +1,98 @@
+import gc
+import time
+
+import httpx
+
+from app.agents import AgentSession
+from app.constants import LLMModel
+from app.http_clients import HttpClientRegistry
+
+
+class Holder:
+    pass
+
+
+def registry(clock) -> HttpClientRegistry:
+    return HttpClientRegistry(
+        limits=httpx.Limits(max_connections=4), timeout=httpx.Timeout(5), http2=False, idle_seconds=60, clock=clock
+    )
+
+
+def test_clients_are_shared_per_endpoint_and_key():
+    clients = registry(lambda: 0.0)
+    a, b, c, d = Holder(), Holder(), Holder(), Holder()
+
+    first = clients.acquire(a, "openai", None, "sk-a")
+
+    assert clients.acquire(b, "openai", None, "sk-a") == first
+    assert clients.acquire(c, "openai", None, "sk-b") != first
+    assert clients.acquire(d, "openai", "http://localhost:8000/v1", "sk-a") != first
+    assert len(clients) == 3
+
+
+def test_idle_clients_close_once_released():
+    now = [0.0]
+    clients = registry(lambda: now[0])
+    holder = Holder()
+    client, _ = clients.acquire(holder, "openai", None, "sk-a")
+
+    now[0] = 120.0
+    # Still leased
+    assert clients.close_idle() == 0
+
+    del holder
+    gc.collect()
+    assert clients.close_idle() == 0
+    now[0] = 200.0
+    assert clients.close_idle() == 1
+    assert client.is_closed
+    assert len(clients) == 0
+
+
+def test_an_idle_process_closes_released_clients():
+    clients = HttpClientRegistry(
+        limits=httpx.Limits(max_connections=4), timeout=httpx.Timeout(5), http2=False, idle_seconds=0.05
+    )
+    holders = [Holder() for _ in range(3)]
+    client, _ = clients.acquire(holders[0], "openai", None, "sk-a")
+    for holder in holders[1:]:
+        clients.acquire(holder, "openai", None, "sk-a")
+
+    del holder
+    holders.pop()
+    gc.collect()
+    # Released leases don't leave their finalizers behind
+    assert len(clients._entries[next(iter(clients._entries))].finalizers) == 2
+    holders.clear()
+    gc.collect()
+    time.sleep(0.3)
+
+    assert client.is_closed
+    assert len(clients) == 0
+
+
+def test_close_closes_everything():
+    clients = registry(lambda: 0.0)
+    holder = Holder()
+    client, _ = clients.acquire(holder, "openai", None, "sk-a")
+
+    clients.close()
+
+    assert client.is_closed
+    assert len(clients) == 0
+
+
+def test_agent_sessions_share_one_client(monkeypatch):
+    clients = registry(lambda: 0.0)
+    monkeypatch.setattr("app.agents.get_http_clients", lambda: clients)
+
+    AgentSession(api_key="sk-a", system_prompt="one", model=LLMModel.GPT_4_1)
+    AgentSession(api_key="sk-a", system_prompt="two", model=LLMModel.GPT_5)
+    assert len(clients) == 1
+
+    AgentSession(api_key="sk-b", system_prompt="one", model=LLMModel.GPT_4_1)
+    assert len(clients) == 2
+
+    monkeypatch.setattr(AgentSession.settings, "HTTP_SHARED_CLIENTS", False)
+    AgentSession(api_key="sk-c", system_prompt="one", model=LLMModel.GPT_4_1)
+    assert len(clients) == 2
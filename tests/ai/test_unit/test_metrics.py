@@ -0,0 +1,135 @@
+import json
+import time
+from typing import Any
+
+import pytest
+from langchain.messages import AIMessage
+from langchain_core.exceptions import LangChainException
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+
+from app.constants import Agent
+from app.exceptions import ManualOrchestratorException
+from app.metrics import Histogram, JsonLinesSink, MetricsRegistry, PrometheusFileSink, make_labels
+
+
+def reply(text: str, input_tokens: int, output_tokens: int, cached: int = 0) -> AIMessage:
+    return AIMessage(
+        text,
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": cached},
+        },
+    )
+
+
+class FailingFakeChatModel(GenericFakeChatModel):
+    def _generate(self, *args: Any, **kwargs: Any):
+        raise LangChainException("provider is down")
+
+
+def test_histogram_quantile_interpolates_within_buckets():
+    histogram = Histogram(buckets=(1.0, 2.0, float("inf")))
+    for value in (0.5, 0.5, 1.5, 1.5):
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == pytest.approx(1.0)
+    assert histogram.quantile(0.75) == pytest.approx(1.5)
+
+
+def test_session_stats_aggregate_calls_tokens_and_ttft(fake_llm, orchestrator, metrics):
+    fake_llm([reply("draft one", 100, 20, cached=60), reply("draft two", 150, 30)])
+    session = orchestrator()
+
+    session.talk_to(agent_name=Agent.GENERATOR, input_text="go", thread_id="t-1")
+    session.talk_to(agent_name=Agent.GENERATOR, input_text="again", thread_id="t-1")
+    # The fake model doesn't report usage when streaming
+    "".join(session.stream_to(agent_name=Agent.GENERATOR, input_text="once more", thread_id="t-1"))
+    session.talk_to(agent_name=Agent.CRITIC, input_text="review", thread_id="t-2")
+
+    stats = session.get_stats()
+    generator = stats[Agent.GENERATOR]
+    assert generator.calls == 3
+    assert generator.errors == 0
+    assert generator.input_tokens == 250
+    assert generator.output_tokens == 50
+    assert generator.cached_tokens == 60
+    assert generator.ttft_mean is not None
+    assert stats[Agent.CRITIC].calls == 1
+
+    event = metrics.sinks[0].events[0]
+    assert event["agent"] == Agent.GENERATOR
+    assert event["thread"] == "t-1"
+    assert event["model"] == "gpt-4.1"
+
+
+def test_stats_are_scoped_to_the_session(fake_llm, orchestrator):
+    fake_llm([reply("draft", 10, 5)])
+    first, second = orchestrator(), orchestrator()
+
+    first.talk_to(agent_name=Agent.GENERATOR, input_text="go", thread_id="first")
+    second.talk_to(agent_name=Agent.GENERATOR, input_text="go", thread_id="second")
+    second.talk_to(agent_name=Agent.GENERATOR, input_text="go", thread_id="second")
+
+    assert first.get_stats()[Agent.GENERATOR].calls == 1
+    assert second.get_stats()[Agent.GENERATOR].calls == 2
+
+
+def test_failed_calls_are_counted(orchestrator, monkeypatch):
+    monkeypatch.setattr("app.agents.init_chat_model", lambda **kwargs: FailingFakeChatModel(messages=iter([])))
+    session = orchestrator()
+
+    with pytest.raises(ManualOrchestratorException):
+        session.talk_to(agent_name=Agent.GENERATOR, input_text="go", thread_id="t-1")
+
+    stats = session.get_stats()[Agent.GENERATOR]
+    assert (stats.calls, stats.errors, stats.error_rate) == (1, 1, 1.0)
+
+
+def test_prometheus_and_trace_sinks(tmp_path):
+    prometheus, trace = tmp_path / "forkflux.prom", tmp_path / "trace.jsonl"
+    trace_sink = JsonLinesSink(str(trace), interval=60)
+    registry = MetricsRegistry([PrometheusFileSink(str(prometheus)), trace_sink], flush_interval=60)
+    labels = make_labels(agent="critic", model='gpt"5')
+
+    registry.observe("model_call_seconds", labels, 0.3, thread="t-1")
+    registry.inc("input_tokens_total", labels, 42, thread="t-1")
+    registry.record({"agent": "critic", "latency": 0.3})
+    # Written by the flusher thread, not by the call being recorded
+    assert not prometheus.exists()
+    registry.flush()
+
+    text = prometheus.read_text()
+    assert "# TYPE forkflux_model_call_seconds histogram" in text
+    assert 'forkflux_model_call_seconds_bucket{agent="critic",model="gpt\\"5",le="0.5"} 1' in text
+    assert 'forkflux_input_tokens_total{agent="critic",model="gpt\\"5"} 42' in text
+    assert "t-1" not in text
+    # Buffered until the writer thread's next round
+    assert not trace.exists()
+    trace_sink.close()
+    assert json.loads(trace.read_text().splitlines()[0]) == {"agent": "critic", "latency": 0.3}
+
+
+def test_sinks_are_flushed_in_the_background(tmp_path):
+    prometheus = tmp_path / "forkflux.prom"
+    registry = MetricsRegistry([PrometheusFileSink(str(prometheus))], flush_interval=0.01)
+    registry.inc("input_tokens_total", make_labels(agent="critic"), 42)
+
+    deadline = time.monotonic() + 5
+    while not prometheus.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert 'forkflux_input_tokens_total{agent="critic"} 42' in prometheus.read_text()
+
+
+def test_per_thread_series_are_bounded():
+    registry = MetricsRegistry(max_threads=2)
+    labels = make_labels(agent="critic", model="gpt-5")
+    for thread in ("a", "b", "a", "c"):
+        registry.inc("input_tokens_total", labels, 10, thread=thread)
+
+    assert list(registry.threads) == ["a", "c"]
+    assert registry.counter_total("input_tokens_total", thread={"a", "b"}) == 20
+    assert registry.counter_total("input_tokens_total") == 40
+    assert set(registry.counters["input_tokens_total"]) == {labels}
@@ -0,0 +1,76 @@
+import pytest
+from langchain.messages import AIMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+from app.agents import AgentSession
+from app.constants import Agent
+from app.middleware import summarize_locally
+
+DRAFT = "A long and detailed draft paragraph about the product launch plan. " * 40
+
+
+def run_rounds(session, rounds: int) -> None:
+    last_reply, last_agent = "Write the launch plan.", None
+    for i in range(rounds):
+        agent = Agent.GENERATOR if i % 2 == 0 else Agent.CRITIC
+        last_reply = session.talk_to(
+            agent_name=agent, input_text=last_reply, thread_id=f"thread-{agent.value}", context_from=last_agent
+        )
+        last_agent = agent
+
+
+@pytest.fixture
+def context_budget(monkeypatch):
+    def use(max_tokens: int | None, keep_turns: int = 2) -> None:
+        monkeypatch.setattr(AgentSession.settings, "CONTEXT_MAX_TOKENS", max_tokens)
+        monkeypatch.setattr(AgentSession.settings, "CONTEXT_KEEP_TURNS", keep_turns)
+        monkeypatch.setattr(AgentSession.settings, "CONTEXT_SUMMARY_MAX_TOKENS", 500)
+
+    return use
+
+
+def test_prompt_size_stays_flat_over_50_rounds(fake_llm, orchestrator, context_budget):
+    context_budget(max_tokens=5000)
+    prompts = fake_llm([DRAFT])
+    run_rounds(orchestrator(), rounds=50)
+
+    sizes = [count_tokens_approximately(prompt) for prompt in prompts]
+    assert len(sizes) == 50
+    assert max(sizes) <= 5000
+    assert max(sizes[-10:]) <= max(sizes[10:20]) * 1.05
+
+
+def test_prompt_grows_without_a_budget(fake_llm, orchestrator, context_budget):
+    context_budget(max_tokens=None)
+    prompts = fake_llm([DRAFT])
+    run_rounds(orchestrator(), rounds=50)
+
+    sizes = [count_tokens_approximately(prompt) for prompt in prompts]
+    assert sizes[-1] > 4 * sizes[10]
+
+
+def test_folded_turns_are_summarized_and_history_is_kept(fake_llm, orchestrator, context_budget):
+    context_budget(max_tokens=5000, keep_turns=2)
+    prompts = fake_llm([DRAFT])
+    session = orchestrator(main_task="Plan the launch")
+    for i in range(5):
+        session.talk_to(agent_name=Agent.GENERATOR, input_text=f"revision {i}", thread_id="t-1")
+
+    state = session.agents[Agent.GENERATOR].agent.get_state({"configurable": {"thread_id": "t-1"}}).values
+    assert len(state["messages"]) == 10
+    assert state["summarized_through"] == 6
+    assert "- User: revision 0" in state["context_summary"]
+    assert state["context_tokens"] == count_tokens_approximately(prompts[-1])
+
+    summary, *recent = prompts[-1][1:]
+    assert "# Main Task:\nPlan the launch" in summary.text
+    assert [message.text for message in recent if isinstance(message, HumanMessage)] == ["revision 3", "revision 4"]
+
+
+def test_local_summary_respects_its_budget():
+    messages = [HumanMessage("question " * 50), AIMessage("answer " * 500)] * 20
+    summary = summarize_locally("- User: the very first turn", messages, max_tokens=200)
+
+    assert count_tokens_approximately([HumanMessage(summary)]) <= 200
+    assert summary.splitlines()[-1].startswith("- Assistant: answer answer")
+    assert "the very first turn" not in summary
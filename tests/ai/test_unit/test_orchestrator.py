@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import Any
+
+from langchain.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatResult
+
+from app.constants import Agent
+from app.prompts import CONTEXT_WRAPPER_PROMPT
+from app.runtime import run_sync
+
+from .conftest import SlowFakeChatModel
+
+
+def test_talk_to_returns_full_reply(fake_llm, orchestrator):
+    fake_llm(["The sea is calm tonight."])
+    reply = orchestrator().talk_to(agent_name=Agent.GENERATOR, input_text="Write it", thread_id="t-1")
+
+    assert reply == "The sea is calm tonight."
+
+
+def test_stream_to_yields_tokens_before_completion(fake_llm, orchestrator):
+    reply = "one two three four five six seven eight nine ten"
+    fake_llm([reply], token_delay=0.02)
+    session = orchestrator()
+
+    started = time.perf_counter()
+    first_token_at = None
+    chunks = []
+    for chunk in session.stream_to(agent_name=Agent.GENERATOR, input_text="Count to ten", thread_id="t-1"):
+        if first_token_at is None:
+            first_token_at = time.perf_counter() - started
+        chunks.append(chunk)
+    total = time.perf_counter() - started
+
+    assert "".join(chunks) == reply
+    assert len(chunks) > 1
+    assert first_token_at is not None
+    assert first_token_at < total / 2
+
+
+def test_stream_to_checkpoints_final_message(fake_llm, orchestrator):
+    fake_llm(["A wave folds into foam."])
+    session = orchestrator()
+
+    chunks = list(
+        session.stream_to(
+            agent_name=Agent.CRITIC, input_text="draft", thread_id="t-critic", context_from=Agent.GENERATOR
+        )
+    )
+
+    state = session.agents[Agent.CRITIC].agent.get_state({"configurable": {"thread_id": "t-critic"}})
+    human, ai = state.values["messages"]
+    assert isinstance(human, HumanMessage)
+    assert human.content == CONTEXT_WRAPPER_PROMPT.format(main_task=session.main_task, context_text="draft")
+    assert isinstance(ai, AIMessage)
+    assert ai.content == "".join(chunks)
+
+
+def test_atalk_to_serves_sessions_concurrently(fake_llm, orchestrator, monkeypatch):
+    fake_llm(["a b c d e"])
+    session = orchestrator()
+    # Each model call waits until all of them are in flight, which would time out if they ran one after the other
+    in_flight, all_in_flight = 0, asyncio.Event()
+    agenerate = SlowFakeChatModel._agenerate
+
+    async def gated(*args: Any, **kwargs: Any) -> ChatResult:
+        nonlocal in_flight
+        in_flight += 1
+        if in_flight == 20:
+            all_in_flight.set()
+        await asyncio.wait_for(all_in_flight.wait(), timeout=5)
+        return await agenerate(*args, **kwargs)
+
+    monkeypatch.setattr(SlowFakeChatModel, "_agenerate", gated)
+
+    async def talk_many(n: int) -> list[str]:
+        return await asyncio.gather(
+            *(session.atalk_to(agent_name=Agent.GENERATOR, input_text="go", thread_id=f"t-{i}") for i in range(n))
+        )
+
+    replies = run_sync(talk_many(20))
+
+    assert replies == ["a b c d e"] * 20
+    assert in_flight == 20
+
+
+def test_astream_to_matches_stream_to(fake_llm, orchestrator):
+    fake_llm(["the tide comes in"], token_delay=0.001)
+    session = orchestrator()
+
+    async def collect() -> list[str]:
+        return [chunk async for chunk in session.astream_to(agent_name=Agent.CRITIC, input_text="x", thread_id="a")]
+
+    assert run_sync(collect()) == list(session.stream_to(agent_name=Agent.CRITIC, input_text="x", thread_id="s"))
@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+import pytest
+
+from app.constants import Agent, LLMModel
+from app.exceptions import ManualOrchestratorException
+from app.panel import merge_critiques
+from app.prompts import CRITIC_SYSTEM_PROMPT
+from app.refinement import StopReason
+from app.runtime import run_sync
+
+CRITICS = {"style": LLMModel.GPT_5, "facts": LLMModel.GPT_5_MINI, "structure": LLMModel.GPT_4O_MINI}
+THREAD_IDS = {name: f"thread-{name}" for name in CRITICS}
+
+
+def with_panel(orchestrator):
+    orchestrator = orchestrator()
+    for name, model in CRITICS.items():
+        orchestrator.add_agent(name=name, system_prompt=CRITIC_SYSTEM_PROMPT, model=model)
+    return orchestrator
+
+
+def test_merge_critiques_deduplicates_and_attributes():
+    merged = merge_critiques(
+        {
+            "style": "- The intro is too long.\n- Use active voice.",
+            "facts": "1. The intro is too long!\n2. Cite the 2019 figures.",
+        }
+    )
+
+    assert merged.splitlines() == [
+        "# Feedback from 2 reviewers:",
+        "- The intro is too long. (raised by: style, facts)",
+        "- Use active voice. (raised by: style)",
+        "- Cite the 2019 figures. (raised by: facts)",
+    ]
+
+
+def test_panel_runs_critics_concurrently(fake_llm, orchestrator):
+    fake_llm(
+        {model.value: [f"Feedback from {name}."] for name, model in CRITICS.items()}
+        | {LLMModel.GPT_4_1.value: ["draft"]},
+        latency={LLMModel.GPT_5.value: 0.1, LLMModel.GPT_5_MINI.value: 0.2, LLMModel.GPT_4O_MINI.value: 0.3},
+    )
+    orchestrator = with_panel(orchestrator)
+
+    started = time.perf_counter()
+    review = orchestrator.panel_review(list(CRITICS), "draft", THREAD_IDS)
+    elapsed = time.perf_counter() - started
+
+    assert 0.3 <= elapsed < 0.5
+    assert review.failures == {}
+    assert set(review.critiques) == set(CRITICS)
+    assert review.merged.startswith("# Feedback from 3 reviewers:")
+
+
+def test_panel_tolerates_a_hung_critic(fake_llm, orchestrator):
+    fake_llm(
+        {model.value: [f"Feedback from {name}."] for name, model in CRITICS.items()}
+        | {LLMModel.GPT_4_1.value: ["draft"]},
+        latency={LLMModel.GPT_4O_MINI.value: 30.0},
+    )
+    orchestrator = with_panel(orchestrator)
+
+    started = time.perf_counter()
+    review = orchestrator.panel_review(list(CRITICS), "draft", THREAD_IDS, timeout=0.2)
+
+    assert time.perf_counter() - started < 1
+    assert set(review.critiques) == {"style", "facts"}
+    assert review.failures == {"structure": "timed out after 0.2s"}
+    assert "structure" not in review.merged
+
+
+def test_panel_fails_when_no_critic_answers(fake_llm, orchestrator):
+    fake_llm(["Feedback."], latency=30.0)
+    orchestrator = with_panel(orchestrator)
+
+    with pytest.raises(ManualOrchestratorException, match="No critic answered"):
+        orchestrator.panel_review(list(CRITICS), "draft", THREAD_IDS, timeout=0.1)
+
+
+def test_a_cancelled_panel_waits_for_its_critics(fake_llm, orchestrator):
+    fake_llm(["Feedback."], latency=30.0)
+    orchestrator = with_panel(orchestrator)
+
+    async def cancel_review() -> set[asyncio.Task[object]]:
+        review = asyncio.create_task(orchestrator.apanel_review(list(CRITICS), "draft", THREAD_IDS))
+        await asyncio.sleep(0.05)
+        review.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await review
+        return {task for task in asyncio.all_tasks() if "apanel_review" in task.get_coro().__qualname__}
+
+    # No critic is still unwinding when the next round starts
+    assert run_sync(cancel_review()) == set()
+
+
+def test_refine_with_a_panel(fake_llm, orchestrator):
+    prompts = fake_llm(
+        {model.value: [f"- Point from {name}."] for name, model in CRITICS.items()}
+        | {LLMModel.GPT_4_1.value: ["first draft here", "second draft entirely rewritten", "done"]}
+    )
+    orchestrator = with_panel(orchestrator)
+
+    trace = orchestrator.refine("Write a plan", max_rounds=2, critics=list(CRITICS))
+
+    assert trace.stop_reason == StopReason.MAX_ROUNDS
+    assert [turn.agent_name for turn in trace.turns] == [Agent.GENERATOR, Agent.CRITIC, Agent.GENERATOR]
+    assert "(raised by: structure)" in trace.turns[1].content
+    assert set(CRITICS) <= set(trace.thread_ids)
+    # The generator revises against the merged feedback
+    assert "Point from facts" in prompts[-1][-1].text
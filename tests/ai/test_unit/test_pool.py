@@ -0,0 +1,84 @@
+from app.constants import Agent, LLMModel
+from app.pool import AgentKey, AgentPool, api_key_fingerprint
+from app.prompts import CRITIC_SYSTEM_PROMPT, GENERATOR_SYSTEM_PROMPT
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_identical_configurations_share_one_agent(fake_llm):
+    fake_llm(["ok"])
+    pool = AgentPool(max_size=4, ttl_seconds=60)
+
+    first = pool.acquire(api_key="sk-a", system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+    second = pool.acquire(api_key="sk-a", system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+
+    assert first is second
+    assert len(pool) == 1
+
+
+def test_any_key_component_yields_a_distinct_agent(fake_llm):
+    fake_llm(["ok"])
+    pool = AgentPool(max_size=8, ttl_seconds=60)
+    base = pool.acquire(api_key="sk-a", system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1)
+
+    variants = [
+        pool.acquire(api_key="sk-b", system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1),
+        pool.acquire(api_key="sk-a", system_prompt=CRITIC_SYSTEM_PROMPT, model=LLMModel.GPT_4_1),
+        pool.acquire(api_key="sk-a", system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_5),
+        pool.acquire(api_key="sk-a", system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1, temperature=0),
+        pool.acquire(api_key="sk-a", system_prompt=GENERATOR_SYSTEM_PROMPT, model=LLMModel.GPT_4_1, max_tokens=10),
+    ]
+
+    assert len({id(agent) for agent in [base, *variants]}) == 6
+
+
+def test_least_recently_used_agent_is_evicted(fake_llm):
+    fake_llm(["ok"])
+    pool = AgentPool(max_size=2, ttl_seconds=60)
+    pool.acquire(api_key="sk-a", system_prompt="one", model=LLMModel.GPT_4_1)
+    pool.acquire(api_key="sk-a", system_prompt="two", model=LLMModel.GPT_4_1)
+    pool.acquire(api_key="sk-a", system_prompt="one", model=LLMModel.GPT_4_1)
+    pool.acquire(api_key="sk-a", system_prompt="three", model=LLMModel.GPT_4_1)
+
+    fingerprint = api_key_fingerprint("sk-a")
+    assert len(pool) == 2
+    assert AgentKey(LLMModel.GPT_4_1.value, "one", 0.7, None, fingerprint) in pool
+    assert AgentKey(LLMModel.GPT_4_1.value, "two", 0.7, None, fingerprint) not in pool
+
+
+def test_idle_agents_expire(fake_llm):
+    fake_llm(["ok"])
+    clock = FakeClock()
+    pool = AgentPool(max_size=4, ttl_seconds=60, clock=clock)
+    first = pool.acquire(api_key="sk-a", system_prompt="one", model=LLMModel.GPT_4_1)
+
+    clock.now = 30
+    assert pool.acquire(api_key="sk-a", system_prompt="one", model=LLMModel.GPT_4_1) is first
+
+    clock.now = 120
+    assert pool.acquire(api_key="sk-a", system_prompt="one", model=LLMModel.GPT_4_1) is not first
+
+
+def test_api_key_is_not_kept_in_the_pool(fake_llm):
+    fake_llm(["ok"])
+    pool = AgentPool(max_size=4, ttl_seconds=60)
+    pool.acquire(api_key="sk-secret", system_prompt="one", model=LLMModel.GPT_4_1)
+
+    assert all("sk-secret" not in key for key in pool._entries)
+
+
+def test_orchestrators_keep_session_state_apart(fake_llm, orchestrator):
+    fake_llm(["ok"])
+    first = orchestrator(main_task="first task")
+    second = orchestrator(main_task="second task")
+
+    assert first.main_task == "first task"
+    assert second.main_task == "second task"
+    assert first.agents is not second.agents
+    assert first.agents[Agent.GENERATOR] is second.agents[Agent.GENERATOR]
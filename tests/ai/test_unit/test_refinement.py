@@ -0,0 +1,106 @@
+import time
+
+import pytest
+from langchain.messages import AIMessage
+
+from app.constants import Agent, LLMModel
+from app.exceptions import ManualOrchestratorException
+from app.orchestrator import ManualOrchestrator
+from app.refinement import StopReason, draft_similarity
+
+GENERATOR_MODEL, CRITIC_MODEL = LLMModel.GPT_4_1.value, LLMModel.GPT_5.value
+
+
+def with_usage(text: str, tokens: int) -> AIMessage:
+    return AIMessage(text, usage_metadata={"input_tokens": tokens, "output_tokens": 0, "total_tokens": tokens})
+
+
+def test_draft_similarity():
+    assert draft_similarity("a b c d", "a b c d") == 1.0
+    assert draft_similarity("a b c d", "a  b\nc d") == 1.0
+    assert draft_similarity("a b c d", "w x y z") == 0.0
+
+
+def test_refine_stops_when_drafts_converge(fake_llm, orchestrator):
+    fake_llm(
+        {
+            GENERATOR_MODEL: [
+                "alpha beta gamma delta",
+                "alpha beta gamma delta epsilon",
+                "alpha beta gamma delta epsilon",
+            ],
+            CRITIC_MODEL: ["Add more detail."],
+        }
+    )
+    trace = orchestrator().refine("Write a plan", max_rounds=10)
+
+    assert trace.stop_reason == StopReason.CONVERGED
+    assert [turn.agent_name for turn in trace.turns] == [Agent.GENERATOR, Agent.CRITIC] * 2 + [Agent.GENERATOR]
+    assert [turn.round for turn in trace.turns] == [1, 1, 2, 2, 3]
+    assert trace.turns[2].similarity == pytest.approx(8 / 9)
+    assert trace.turns[4].similarity == 1.0
+    assert trace.final_draft == "alpha beta gamma delta epsilon"
+    assert all(turn.elapsed >= 0 for turn in trace.turns)
+
+
+def test_refine_ends_on_a_draft_after_max_rounds(fake_llm, orchestrator):
+    fake_llm({GENERATOR_MODEL: ["one", "two", "three"], CRITIC_MODEL: ["Try again."]})
+    session = orchestrator()
+    trace = session.refine("Write a plan", max_rounds=3)
+
+    assert trace.stop_reason == StopReason.MAX_ROUNDS
+    assert len(trace.turns) == 5
+    assert trace.final_draft == "three"
+    critic_state = session.agents[Agent.CRITIC].agent.get_state(
+        {"configurable": {"thread_id": trace.thread_ids[Agent.CRITIC]}}
+    )
+    assert len(critic_state.values["messages"]) == 4
+
+
+def test_refine_respects_the_token_budget(fake_llm, orchestrator):
+    fake_llm(
+        {
+            GENERATOR_MODEL: [with_usage("first draft", 100), with_usage("a rewrite", 100)],
+            CRITIC_MODEL: [with_usage("critique", 100)],
+        }
+    )
+    trace = orchestrator().refine("Write a plan", max_rounds=10, token_budget=250)
+
+    assert trace.stop_reason == StopReason.TOKEN_BUDGET
+    assert len(trace.turns) == 3
+    assert trace.tokens == 300
+
+
+def test_refine_cancels_the_call_in_flight_at_the_deadline(fake_llm, orchestrator):
+    fake_llm(["draft"], latency=0.2)
+    started = time.perf_counter()
+    trace = orchestrator().refine("Write a plan", max_rounds=10, deadline=time.time() + 0.3)
+
+    assert trace.stop_reason == StopReason.DEADLINE
+    assert len(trace.turns) == 1
+    assert time.perf_counter() - started < 0.4
+
+
+def test_refine_needs_both_agents():
+    session = ManualOrchestrator()
+    with pytest.raises(ManualOrchestratorException):
+        session.refine("Write a plan")
+
+
+def test_refine_resumes_from_stored_turns(fake_llm, orchestrator):
+    fake_llm({GENERATOR_MODEL: ["alpha", "beta", "gamma"], CRITIC_MODEL: ["Try again."]})
+    session = orchestrator()
+    first = session.refine("Write a plan", max_rounds=2)
+
+    trace = session.refine("Write a plan", max_rounds=3, thread_ids=first.thread_ids, resume=True)
+
+    assert trace.resumed_turns == 3
+    assert [turn.content for turn in trace.turns] == ["alpha", "Try again.", "beta", "Try again.", "gamma"]
+    assert [turn.round for turn in trace.turns] == [1, 1, 2, 2, 3]
+
+
+def test_refine_resumes_only_with_the_single_critic(fake_llm, orchestrator):
+    session = orchestrator()
+
+    with pytest.raises(ManualOrchestratorException):
+        session.refine("Write a plan", critics=[Agent.CRITIC, "critic_2"], resume=True)
@@ -0,0 +1,121 @@
+import pytest
+
+from app.agents import AgentSession
+from app.constants import Agent, LLMModel
+from app.revisions import START, RevisionError, apply_edits, parse_edits, split_sections
+
+GENERATOR_MODEL, CRITIC_MODEL = LLMModel.GPT_4_1.value, LLMModel.GPT_5.value
+EDIT = "@@ REPLACE: # Budget\n# Budget\nThree engineers.\n"
+
+DRAFT = """Launch plan for the billing service.
+
+# Timeline
+Ship in Q3.
+
+# Risks
+Migration may slip.
+
+```python
+# not a heading
+```
+
+# Budget
+Two engineers.
+"""
+
+
+def test_sections_round_trip():
+    sections = split_sections(DRAFT)
+
+    assert [heading for heading, _ in sections] == [START, "# Timeline", "# Risks", "# Budget"]
+    assert "".join(text for _, text in sections) == DRAFT
+
+
+def test_edits_apply_to_sections():
+    edits = parse_edits(
+        "@@ REPLACE: # Risks\n# Risks\nMigration will slip, plan for it.\n"
+        "@@ INSERT AFTER: # Budget\n# Owners\nThe payments team.\n"
+        "@@ DELETE: (start)\n"
+    )
+
+    revised = apply_edits(DRAFT, edits)
+
+    assert revised == (
+        "# Timeline\nShip in Q3.\n\n# Risks\nMigration will slip, plan for it.\n\n"
+        "# Budget\nTwo engineers.\n\n# Owners\nThe payments team.\n"
+    )
+
+
+@pytest.mark.parametrize(
+    "reply",
+    [
+        "Sure, here are the edits:\n@@ DELETE: # Risks\n",
+        "@@ REPLACE: # Risks\n",
+        "@@ REPLACE: # Costs\n# Costs\nNone.\n",
+    ],
+)
+def test_bad_edits_are_rejected(reply):
+    with pytest.raises(RevisionError):
+        apply_edits(DRAFT, parse_edits(reply))
+
+
+def generator_thread(session) -> list[str]:
+    state = session.agents[Agent.GENERATOR].agent.get_state({"configurable": {"thread_id": "g"}})
+    return [message.text for message in state.values["messages"]]
+
+
+@pytest.fixture
+def revising(monkeypatch, orchestrator):
+    monkeypatch.setattr(AgentSession.settings, "REVISION_MODE", True)
+
+    def build():
+        session = orchestrator()
+        session.talk_to(Agent.GENERATOR, "Write a launch plan", thread_id="g")
+        session.talk_to(Agent.CRITIC, DRAFT, thread_id="c", context_from=Agent.GENERATOR)
+        return session
+
+    return build
+
+
+def test_revision_round_applies_edits(fake_llm, revising, metrics):
+    prompts = fake_llm({GENERATOR_MODEL: [DRAFT, EDIT], CRITIC_MODEL: ["Add staff."]})
+    session = revising()
+
+    revised = session.talk_to(Agent.GENERATOR, "Add staff.", thread_id="g", context_from=Agent.CRITIC)
+
+    assert revised == DRAFT.replace("Two engineers.", "Three engineers.")
+    # The generator saw the current draft and was asked for edits
+    assert DRAFT in prompts[-1][-1].text and "@@ REPLACE" in prompts[-1][-1].text
+    assert session.last_revision.edits == 1
+    assert metrics.counter_total("revisions_total", outcome="applied") == 1
+    # The edit turn is written to the thread once it applied
+    assert generator_thread(session)[2:] == [prompts[-1][-1].text, EDIT]
+
+
+def test_critic_can_review_the_diff(fake_llm, revising, monkeypatch):
+    prompts = fake_llm({GENERATOR_MODEL: [DRAFT, EDIT], CRITIC_MODEL: ["Add staff."]})
+    monkeypatch.setattr(AgentSession.settings, "REVISION_CRITIC_VIEW", "diff")
+    session = revising()
+    revised = session.talk_to(Agent.GENERATOR, "Add staff.", thread_id="g", context_from=Agent.CRITIC)
+
+    session.talk_to(Agent.CRITIC, revised, thread_id="c", context_from=Agent.GENERATOR)
+
+    sent = prompts[-1][-1].text
+    assert "-Two engineers.\n+Three engineers." in sent
+    assert "Ship in Q3." not in sent
+
+
+def test_edits_that_do_not_apply_fall_back_to_a_rewrite(fake_llm, revising, metrics):
+    rewrite = DRAFT.replace("Two engineers.", "Three engineers.")
+    prompts = fake_llm(
+        {GENERATOR_MODEL: [DRAFT, "@@ REPLACE: # Costs\n# Costs\nMore.\n", rewrite], CRITIC_MODEL: ["Add staff."]}
+    )
+    session = revising()
+
+    revised = session.talk_to(Agent.GENERATOR, "Add staff.", thread_id="g", context_from=Agent.CRITIC)
+
+    assert revised == rewrite
+    assert len(prompts) == 4
+    assert metrics.counter_total("revisions_total", outcome="fallback") == 1
+    # Only the rewrite is in the thread, not the edits that were thrown away
+    assert generator_thread(session) == ["Write a launch plan", DRAFT, prompts[-1][-1].text, rewrite]
@@ -0,0 +1,192 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from langchain.agents.middleware.types import ModelResponse
+from langchain.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from openai import RateLimitError
+
+from app.agents import AgentSession
+from app.constants import Agent
+from app.exceptions import ManualOrchestratorException
+from app.middleware import SchedulerMiddleware
+from app.scheduler import ModelLimiter, Priority, Scheduler, TokenBucket, retry_after
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def rate_limited(**headers: str) -> RateLimitError:
+    return RateLimitError("slow down", response=httpx.Response(429, request=REQUEST, headers=headers), body=None)
+
+
+@pytest.fixture
+def fake_backend(monkeypatch):
+    scheduler = Scheduler(rpm={}, tpm={}, max_concurrency=8)
+    monkeypatch.setattr("app.agents.get_scheduler", lambda: scheduler)
+    for name, value in {
+        "SCHEDULER_ENABLED": True,
+        "LLM_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_SECONDS": 0,
+        "FAKE_LLM_TOKENS_PER_SECOND": 0,
+        "FAKE_LLM_RETRY_AFTER_SECONDS": 0,
+        "SCHEDULER_BACKOFF_SECONDS": 0.001,
+    }.items():
+        monkeypatch.setattr(AgentSession.settings, name, value)
+    return scheduler
+
+
+def test_token_bucket_waits_for_refill():
+    now = [0.0]
+    bucket = TokenBucket(per_minute=60, clock=lambda: now[0])
+
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(2) == pytest.approx(2.0)
+    now[0] = 2.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    # An overestimate is given back
+    bucket.refund(10)
+    assert bucket.reserve(1) == 0.0
+
+
+def test_retry_after_headers():
+    assert retry_after(rate_limited(**{"retry-after-ms": "250"})) == 0.25
+    assert retry_after(rate_limited(**{"retry-after": "3"})) == 3.0
+    assert retry_after(rate_limited(**{"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after(rate_limited()) is None
+
+
+def test_interactive_calls_go_first():
+    limiter = ModelLimiter(max_concurrency=1)
+    order: list[str] = []
+
+    async def call(name: str, priority: Priority) -> None:
+        await limiter.acquire(priority)
+        order.append(name)
+        await asyncio.sleep(0)
+        limiter.release()
+
+    async def run() -> None:
+        await limiter.acquire()
+        tasks = [
+            asyncio.create_task(call("background", Priority.BACKGROUND)),
+            asyncio.create_task(call("interactive", Priority.INTERACTIVE)),
+        ]
+        await asyncio.sleep(0)
+        assert limiter.queued == 2
+        limiter.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+
+    assert order == ["interactive", "background"]
+
+
+def test_a_cancelled_waiter_leaves_the_queue_once():
+    limiter = ModelLimiter(max_concurrency=1)
+
+    async def run() -> None:
+        await limiter.acquire()
+        waiting = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        # Dispatched past the cancelled waiter before it gets to clean up after itself
+        limiter.release()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(run())
+
+    assert limiter.queued == 0
+    assert limiter.in_flight == 0
+
+
+def test_concurrency_backs_off_under_throttling_and_recovers():
+    limiter = ModelLimiter(max_concurrency=16)
+    epoch = limiter.epoch
+
+    # Simultaneous rejections are one congestion event
+    limiter.on_throttle(epoch)
+    limiter.on_throttle(epoch)
+    assert limiter.limit == 8
+
+    limiter.on_throttle(limiter.epoch)
+    assert limiter.limit == 4
+    for _ in range(20):
+        limiter.on_success()
+    assert limiter.limit > 6
+
+
+def test_goodput_against_a_provider_that_throttles():
+    limiter = ModelLimiter(max_concurrency=16)
+    middleware = SchedulerMiddleware({"gpt-5": limiter}, model="gpt-5", backoff_seconds=0.001, max_backoff_seconds=0.01)
+    in_flight = 0
+
+    # Rejects anything beyond 3 concurrent requests
+    async def provider(request):
+        nonlocal in_flight
+        if in_flight >= 3:
+            raise rate_limited(**{"retry-after-ms": "5"})
+        in_flight += 1
+        try:
+            await asyncio.sleep(0.01)
+            return ModelResponse(result=[AIMessage("ok")])
+        finally:
+            in_flight -= 1
+
+    async def run() -> list[ModelResponse]:
+        request = SimpleNamespace(model=None, system_prompt="", messages=[HumanMessage("hi")])
+        return await asyncio.gather(*(middleware.awrap_model_call(request, provider) for _ in range(20)))
+
+    responses = asyncio.run(run())
+
+    assert [response.result[0].text for response in responses] == ["ok"] * 20
+    assert limiter.limit < 16
+    assert limiter.in_flight == 0
+
+
+def test_reserved_tokens_are_settled_on_every_outcome():
+    limiter = ModelLimiter(tpm=6000, clock=lambda: 0.0)
+    middleware = SchedulerMiddleware({"gpt-5": limiter}, model="gpt-5")
+    request = SimpleNamespace(model=None, system_prompt="", messages=[HumanMessage("Write a haiku about the sea.")])
+    reply = AIMessage("Waves fold into foam.")
+
+    async def hang(request):
+        await asyncio.sleep(60)
+
+    async def answer(request):
+        return ModelResponse(result=[reply])
+
+    async def run() -> None:
+        call = asyncio.create_task(middleware.awrap_model_call(request, hang))
+        await asyncio.sleep(0)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        assert limiter.tokens.tokens == 6000
+        # Without usage metadata the reply is estimated like the prompt
+        await middleware.awrap_model_call(request, answer)
+
+    asyncio.run(run())
+
+    prompt = count_tokens_approximately([SystemMessage(""), *request.messages])
+    assert limiter.tokens.tokens == 6000 - prompt - count_tokens_approximately([reply])
+
+
+def test_orchestrator_retries_injected_rate_limits(fake_backend, monkeypatch, orchestrator, metrics):
+    monkeypatch.setattr(AgentSession.settings, "FAKE_LLM_FAILURE_RATE", 0.5)
+    session = orchestrator()
+
+    for i in range(5):
+        assert session.talk_to(Agent.GENERATOR, f"Draft {i}", thread_id=f"g{i}")
+
+    assert metrics.counter_total("model_call_retries_total", error="RateLimitError") > 0
+
+
+def test_exhausted_retries_surface_as_rate_limited(fake_backend, monkeypatch, orchestrator):
+    monkeypatch.setattr(AgentSession.settings, "FAKE_LLM_FAILURE_RATE", 1.0)
+    monkeypatch.setattr(AgentSession.settings, "SCHEDULER_MAX_RETRIES", 2)
+
+    with pytest.raises(ManualOrchestratorException, match="rate limited"):
+        orchestrator().talk_to(Agent.GENERATOR, "Draft", thread_id="g")
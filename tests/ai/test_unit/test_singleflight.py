@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from app.constants import Agent
+from app.exceptions import ManualOrchestratorException
+from app.runtime import run_sync
+from app.singleflight import SingleFlight
+
+
+def messages(orchestrator, agent_name, thread_id):
+    config = {"configurable": {"thread_id": thread_id}}
+    return run_sync(orchestrator.agents[agent_name].agent.aget_state(config)).values.get("messages", [])
+
+
+def test_a_double_submit_makes_one_call(fake_llm, orchestrator, metrics):
+    prompts = fake_llm(["A draft.", "Another draft."], latency=0.2)
+    first, second = orchestrator(), orchestrator()
+
+    async def submit_twice():
+        return await asyncio.gather(
+            first.atalk_to(Agent.GENERATOR, "Write it", thread_id="g"),
+            second.atalk_to(Agent.GENERATOR, "Write it", thread_id="g"),
+        )
+
+    assert run_sync(submit_twice()) == ["A draft.", "A draft."]
+    assert len(prompts) == 1
+    assert [message.text for message in messages(first, Agent.GENERATOR, "g")] == ["Write it", "A draft."]
+    assert second.drafts == {"g": "A draft."}
+    assert metrics.counter_total("coalesced_calls_total", agent=Agent.GENERATOR) == 1
+
+
+def test_a_streamed_request_joins_the_call_in_flight(fake_llm, orchestrator):
+    prompts = fake_llm(["A long streamed draft."], token_delay=0.02)
+    session = orchestrator()
+
+    async def submit_twice():
+        async def stream():
+            return [text async for text in session.astream_to(Agent.GENERATOR, "Write it", thread_id="g")]
+
+        async def talk():
+            # Once the stream has started
+            await asyncio.sleep(0.05)
+            return await session.atalk_to(Agent.GENERATOR, "Write it", thread_id="g")
+
+        return await asyncio.gather(stream(), talk())
+
+    streamed, joined = run_sync(submit_twice())
+
+    assert len(streamed) > 1
+    assert "".join(streamed) == joined == "A long streamed draft."
+    assert len(prompts) == 1
+
+
+def test_different_requests_on_a_thread_run_one_at_a_time(fake_llm, orchestrator):
+    prompts = fake_llm(["A draft.", "A second draft."], latency=0.1)
+    session = orchestrator()
+
+    async def submit_both():
+        return await asyncio.gather(
+            session.atalk_to(Agent.GENERATOR, "Write it", thread_id="g"),
+            session.atalk_to(Agent.GENERATOR, "Shorter", thread_id="g"),
+        )
+
+    run_sync(submit_both())
+
+    # The second call saw the first one's reply, and neither reply was lost
+    assert [message.text for message in prompts[1]][-3:] == ["Write it", "A draft.", "Shorter"]
+    assert [message.text for message in messages(session, Agent.GENERATOR, "g")] == [
+        "Write it",
+        "A draft.",
+        "Shorter",
+        "A second draft.",
+    ]
+
+
+def test_followers_get_the_leaders_error():
+    flights: SingleFlight[str] = SingleFlight()
+    key = SingleFlight.key("t", "input")
+
+    async def lead():
+        async with flights.join(key):
+            await asyncio.sleep(0.05)
+            raise ManualOrchestratorException("API key is invalid")
+
+    async def follow():
+        async with flights.join(key) as flight:
+            return flight.result()
+
+    async def run():
+        return await asyncio.gather(lead(), follow(), return_exceptions=True)
+
+    led, followed = run_sync(run())
+
+    assert isinstance(led, ManualOrchestratorException)
+    assert followed is led
+    assert len(flights) == 0
+
+
+def test_a_follower_takes_over_when_the_leader_is_cancelled():
+    flights: SingleFlight[str] = SingleFlight()
+    key = SingleFlight.key("t", "input")
+
+    async def call(result):
+        async with flights.join(key) as flight:
+            if flight.leader:
+                await asyncio.sleep(0.05)
+                flight.publish(result)
+            return flight.result()
+
+    async def run():
+        leader = asyncio.create_task(call("first"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(call("second"))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run_sync(run()) == "second"
+    assert len(flights) == 0
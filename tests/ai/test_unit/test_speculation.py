@@ -0,0 +1,98 @@
+import pytest
+from langchain.messages import AIMessage
+
+from app.agents import AgentSession
+from app.constants import Agent, LLMModel
+from app.runtime import run_sync
+
+GENERATOR_MODEL, CRITIC_MODEL = LLMModel.GPT_4_1.value, LLMModel.GPT_5.value
+
+
+def with_usage(text: str, tokens: int) -> AIMessage:
+    return AIMessage(text, usage_metadata={"input_tokens": tokens, "output_tokens": 0, "total_tokens": tokens})
+
+
+@pytest.fixture
+def speculative(monkeypatch, orchestrator):
+    monkeypatch.setattr(AgentSession.settings, "SPECULATION_ENABLED", True)
+    return orchestrator
+
+
+def snapshot(orchestrator, agent_name, thread_id):
+    config = {"configurable": {"thread_id": thread_id}}
+    return run_sync(orchestrator.agents[agent_name].agent.aget_state(config))
+
+
+def messages(orchestrator, agent_name, thread_id):
+    return snapshot(orchestrator, agent_name, thread_id).values.get("messages", [])
+
+
+def test_redirect_commits_the_staged_reply(fake_llm, speculative, metrics):
+    prompts = fake_llm({GENERATOR_MODEL: ["A draft."], CRITIC_MODEL: [with_usage("A critique.", 10)]})
+    session = speculative()
+    draft = session.talk_to(Agent.GENERATOR, "Write it", thread_id="g")
+
+    assert session.speculate(Agent.CRITIC, draft, thread_id="c", context_from=Agent.GENERATOR)
+    session.speculation.future.result()
+    # Staged, not written to the thread
+    assert messages(session, Agent.CRITIC, "c") == []
+
+    reply = session.talk_to(Agent.CRITIC, draft, thread_id="c", context_from=Agent.GENERATOR)
+
+    assert reply == "A critique."
+    # Served from the staged turn, without another model call
+    assert len(prompts) == 2
+    assert [message.type for message in messages(session, Agent.CRITIC, "c")] == ["human", "ai"]
+    assert snapshot(session, Agent.CRITIC, "c").next == ()
+    assert session.speculation_stats.hits == 1
+    assert session.speculation_stats.hit_rate == 1.0
+    assert metrics.counter_total("speculations_total", outcome="hit") == 1
+
+    # The committed turn is ordinary history for the next call
+    session.talk_to(Agent.CRITIC, "And now?", thread_id="c")
+    assert [message.text for message in prompts[-1]][-3:] == [prompts[1][-1].text, "A critique.", "And now?"]
+
+
+def test_stream_to_serves_the_staged_reply(fake_llm, speculative):
+    fake_llm({GENERATOR_MODEL: ["A draft."], CRITIC_MODEL: ["A critique."]})
+    session = speculative()
+    session.speculate(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR)
+
+    chunks = list(session.stream_to(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR))
+
+    assert chunks == ["A critique."]
+    assert session.speculation_stats.hits == 1
+
+
+def test_a_new_prompt_discards_the_speculation(fake_llm, speculative, metrics):
+    fake_llm({GENERATOR_MODEL: ["A draft."], CRITIC_MODEL: [with_usage("A critique.", 10)]})
+    session = speculative()
+    session.speculate(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR)
+    session.speculation.future.result()
+
+    session.talk_to(Agent.GENERATOR, "Try something else", thread_id="g")
+
+    assert session.speculation is None
+    assert messages(session, Agent.CRITIC, "c") == []
+    assert session.speculation_stats.discarded == 1
+    assert session.speculation_stats.wasted_tokens == 10
+    assert session.speculation_stats.hit_rate == 0.0
+    assert metrics.counter_total("speculative_wasted_tokens_total") == 10
+
+
+def test_speculation_stops_at_the_spend_cap(fake_llm, speculative, monkeypatch):
+    fake_llm({GENERATOR_MODEL: ["A draft."], CRITIC_MODEL: [with_usage("A critique.", 10)]})
+    monkeypatch.setattr(AgentSession.settings, "SPECULATION_MAX_TOKENS_PER_SESSION", 10)
+    session = speculative()
+
+    assert session.speculate(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR)
+    session.talk_to(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR)
+
+    assert not session.speculate(Agent.GENERATOR, "A critique.", thread_id="g", context_from=Agent.CRITIC)
+    assert session.speculation_stats.skipped == 1
+
+
+def test_speculation_is_off_by_default(fake_llm, orchestrator):
+    fake_llm(["A reply."])
+
+    assert not orchestrator().speculate(Agent.CRITIC, "A draft.", thread_id="c", context_from=Agent.GENERATOR)
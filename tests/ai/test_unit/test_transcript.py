@@ -0,0 +1,58 @@
+import pytest
+
+from app.constants import Agent
+from app.transcript import TranscriptCache, TranscriptEntry, get_transcript_cache, load, reference
+
+
+@pytest.fixture(autouse=True)
+def transcript_cache():
+    cache = get_transcript_cache()
+    cache.clear()
+    yield cache
+    cache.clear()
+
+
+def test_replies_are_referenced_and_reloaded_from_the_checkpointer(fake_llm, orchestrator, transcript_cache):
+    fake_llm(["First draft.", "Second draft."])
+    session = orchestrator()
+    entries = [TranscriptEntry(role="user", text="Go")]
+    for prompt in ("Go", "Again"):
+        reply = session.talk_to(Agent.GENERATOR, prompt, thread_id="g")
+        entries.append(reference(Agent.GENERATOR.value, "g", reply))
+
+    assert entries[1].text is None and entries[1].message_id
+    transcript_cache.clear()
+
+    assert load(entries) == ["Go", "First draft.", "Second draft."]
+    assert len(transcript_cache) == 2
+
+
+def test_replies_that_are_not_stored_as_is_stay_inline(fake_llm, orchestrator):
+    fake_llm(["A draft."])
+    session = orchestrator()
+    session.talk_to(Agent.GENERATOR, "Go", thread_id="g")
+
+    entry = reference(Agent.GENERATOR.value, "g", "A draft, with the edits applied.")
+
+    assert entry == TranscriptEntry(role="generator", text="A draft, with the edits applied.")
+
+
+def test_forks_resolve_their_parents_messages(fake_llm, orchestrator):
+    fake_llm(["A draft."])
+    session = orchestrator()
+    entry = reference(Agent.GENERATOR.value, "g", session.talk_to(Agent.GENERATOR, "Go", thread_id="g"))
+    fork = session.fork("g")
+    get_transcript_cache().clear()
+
+    assert load([TranscriptEntry(role=entry.role, thread_id=fork, message_id=entry.message_id)]) == ["A draft."]
+
+
+def test_cache_is_bounded_by_characters():
+    cache = TranscriptCache(max_chars=10)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    cache.get("a")
+    cache.put("c", "123")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "12345" and cache.get("c") == "123"
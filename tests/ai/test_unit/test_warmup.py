@@ -0,0 +1,34 @@
+from app.agents import AgentSession
+from app.constants import Agent, LLMModel
+from app.warmup import Prewarmer, prewarm
+
+
+def test_prewarmed_agents_are_the_ones_the_session_gets(fake_llm, orchestrator, agent_pool):
+    fake_llm(["A draft."])
+    prewarmer = Prewarmer(max_configurations=4)
+
+    prewarmer.submit(LLMModel.GPT_4_1, LLMModel.GPT_5, "sk-test").result()
+    warmed = {id(session) for _, session in agent_pool._entries.values()}
+    session = orchestrator()
+
+    assert len(agent_pool) == 2
+    assert {id(session.agents[Agent.GENERATOR]), id(session.agents[Agent.CRITIC])} == warmed
+
+
+def test_each_configuration_is_warmed_once(fake_llm, agent_pool):
+    fake_llm(["A draft."])
+    prewarmer = Prewarmer(max_configurations=1)
+
+    first = prewarmer.submit(LLMModel.GPT_4_1, LLMModel.GPT_5, "sk-test")
+    assert prewarmer.submit(LLMModel.GPT_4_1, LLMModel.GPT_5, "sk-test") is first
+    # Without a key only the imports and the checkpoint database are warmed
+    assert prewarmer.submit(LLMModel.GPT_4_1, LLMModel.GPT_5).result() is None
+    first.result()
+    assert prewarmer.submit(LLMModel.GPT_4_1, LLMModel.GPT_5, "sk-test") is not first
+
+
+def test_prewarm_can_be_turned_off(monkeypatch, agent_pool):
+    monkeypatch.setattr(AgentSession.settings, "AGENT_PREWARM_ENABLED", False)
+
+    assert prewarm(LLMModel.GPT_4_1, LLMModel.GPT_5, "sk-test") is None
+    assert len(agent_pool) == 0